@@ -0,0 +1,161 @@
+"""Offline benchmarks of the Monzo client against doubles.server.FakeMonzoServer.
+
+Measures throughput and per-request latency (using monzo.metrics.MetricsCollector)
+of the client's hot paths without touching the network:
+
+* pagination    - iterating over every transaction of an account
+* streaming     - the same, decoding each page incrementally as it arrives
+* fan-out       - fetching many balances concurrently
+* refresh-storm - many threads hitting an expired token at once
+* cache-hits    - repeated reads served by the response cache
+* coalescing    - many threads reading the same balance at once
+
+Run from the repository root:
+
+    python -m benchmarks.bench_client --latency 0.005 --transactions 5000
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+
+from doubles.server import ACCOUNT_ID, FakeMonzoServer
+from monzo.metrics import MetricsCollector
+
+
+def bench_pagination(server, args):
+    client = server.client(hooks=args.metrics)
+    count = sum(1 for _ in client.iter_transactions(ACCOUNT_ID, page_size=100))
+    assert count == len(server.transactions)
+    return count
+
+
+def bench_streaming(server, args):
+    client = server.client(hooks=args.metrics)
+    transactions = client.iter_transactions(ACCOUNT_ID, page_size=100, stream=True)
+    count = sum(1 for _ in transactions)
+    assert count == len(server.transactions)
+    return count
+
+
+def bench_fan_out(server, args):
+    client = server.client(hooks=args.metrics, pool_maxsize=args.concurrency)
+    account_ids = [ACCOUNT_ID] * args.requests
+    results = client.get_balances(account_ids, concurrency=args.concurrency)
+    assert all(result.error is None for result in results)
+    return len(results)
+
+
+def bench_refresh_storm(server, args):
+    client = server.client(hooks=args.metrics, pool_maxsize=args.concurrency)
+    client.whoami()
+    server.expire_token()
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(client.whoami()))
+        for _ in range(args.concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == args.concurrency
+    assert server.refreshes == 1, "expected a single refresh"
+    return len(results)
+
+
+def bench_cache_hits(server, args):
+    client = server.client(hooks=args.metrics, cache=True)
+    for _ in range(args.requests):
+        client.get_accounts()
+        client.get_pots()
+    assert server.requests == 2, "expected every read after the first to be cached"
+    return args.requests * 2
+
+
+def bench_coalescing(server, args):
+    client = server.client(
+        hooks=args.metrics, coalesce=True, pool_maxsize=args.concurrency
+    )
+    account_ids = [ACCOUNT_ID] * args.requests
+    results = client.get_balances(account_ids, concurrency=args.concurrency)
+    assert all(result.error is None for result in results)
+    return len(results)
+
+
+BENCHMARKS = {
+    "pagination": bench_pagination,
+    "streaming": bench_streaming,
+    "fan-out": bench_fan_out,
+    "refresh-storm": bench_refresh_storm,
+    "cache-hits": bench_cache_hits,
+    "coalescing": bench_coalescing,
+}
+
+
+def run(name, args):
+    """Runs one benchmark against a fresh server, returning its results."""
+    args.metrics = MetricsCollector()
+    with FakeMonzoServer(
+        transactions=args.transactions,
+        latency=args.latency,
+        page_size=100,
+        rate_limit_every=args.rate_limit_every,
+    ) as server:
+        started = time.perf_counter()
+        operations = BENCHMARKS[name](server, args)
+        elapsed = time.perf_counter() - started
+        http_requests = server.requests
+    requests = args.metrics.snapshot()["endpoints"]
+    latencies = [metrics["latency"] for metrics in requests.values()]
+    return {
+        "benchmark": name,
+        "operations": operations,
+        "http_requests": http_requests,
+        "seconds": round(elapsed, 4),
+        "operations_per_second": round(operations / elapsed, 1),
+        "p50": max((latency["p50"] or 0 for latency in latencies), default=0),
+        "p95": max((latency["p95"] or 0 for latency in latencies), default=0),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("benchmarks", nargs="*", default=sorted(BENCHMARKS))
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--transactions", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rate-limit-every", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    results = [run(name, args) for name in args.benchmarks]
+    if args.json:
+        json.dump(results, sys.stdout, indent=4)
+        sys.stdout.write("\n")
+        return
+    row = "{0:<15}{1:>12}{2:>10}{3:>10}{4:>12}{5:>9}{6:>9}"
+    print(
+        row.format(
+            "benchmark", "operations", "requests", "seconds", "ops/s", "p50", "p95"
+        )
+    )
+    for result in results:
+        print(
+            row.format(
+                result["benchmark"],
+                result["operations"],
+                result["http_requests"],
+                result["seconds"],
+                result["operations_per_second"],
+                result["p50"],
+                result["p95"],
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
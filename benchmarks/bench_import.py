@@ -0,0 +1,54 @@
+"""Import-time benchmark of the package's entry points.
+
+Each import runs in a fresh interpreter several times; the best time, less
+that of an interpreter which imports nothing, is reported. With `--max-ms`
+the script exits with an error when any import exceeds the budget, so it
+can guard cold start in CI.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_import --max-ms 50
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+STATEMENTS = (
+    "import monzo",
+    "import monzo.tokens",
+    "from monzo import Monzo",
+    "from monzo import MonzoOAuth2Client; MonzoOAuth2Client(None, None).session",
+)
+
+
+def best_time(statement, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.check_call([sys.executable, "-c", statement])
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    baseline = best_time("pass", args.repeat)
+    print("interpreter startup: {0:.1f} ms".format(baseline * 1000))
+    over_budget = []
+    for statement in STATEMENTS:
+        elapsed = (best_time(statement, args.repeat) - baseline) * 1000
+        print("{0:>8.1f} ms  {1}".format(elapsed, statement))
+        if args.max_ms is not None and elapsed > args.max_ms:
+            over_budget.append(statement)
+    if over_budget:
+        sys.exit("Over the {0} ms budget: {1}".format(args.max_ms, over_budget))
+
+
+if __name__ == "__main__":
+    main()
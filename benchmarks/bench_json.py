@@ -0,0 +1,66 @@
+"""Micro-benchmark of the JSON backends in monzo.codec.
+
+Compares decode (and encode) throughput of every installed backend on
+realistic `get_transactions` pages - 100 transactions with expanded merchants,
+as generated by doubles.server.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_json --pages 200
+"""
+
+import argparse
+import time
+
+from doubles.server import generate_transactions
+from monzo import codec
+
+
+def make_pages(count, page_size=100):
+    transactions = generate_transactions(count * page_size)
+    return [
+        codec.Backend()
+        .dumps({"transactions": transactions[i : i + page_size]})
+        .encode("utf-8")
+        for i in range(0, len(transactions), page_size)
+    ]
+
+
+def measure(function, pages, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for page in pages:
+            function(page)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    pages = make_pages(args.pages)
+    decoded = [codec.Backend().loads(page) for page in pages]
+    megabytes = sum(len(page) for page in pages) / 1e6
+    print("{0} pages of 100 transactions, {1:.1f} MB".format(len(pages), megabytes))
+    row = "{0:<10}{1:>14}{2:>14}{3:>14}"
+    print(row.format("backend", "decode MB/s", "pages/s", "encode MB/s"))
+    for name in codec.available_backends():
+        backend = codec.BACKENDS[name]()
+        decode = measure(backend.loads, pages, args.repeat)
+        encode = measure(backend.dumps, decoded, args.repeat)
+        print(
+            row.format(
+                name,
+                round(megabytes / decode, 1),
+                round(len(pages) / decode, 1),
+                round(megabytes / encode, 1),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -261,12 +261,13 @@ class Monzo(object):
             ]
         }
 
-    def deposit_into_pot(self, pot_id, account_id, amount_in_pennies):
+    def deposit_into_pot(self, pot_id, account_id, amount_in_pennies, dedupe_id=None):
         """Move money from an account into a pot. (https://monzo.com/docs/#deposit-into-a-pot)
 
             :param pot_id: The unique identifier for the pot to deposit the money to.
             :param account_id: The unique identifier for the account to move the money from.
             :param amount_in_pennies: The amount of money to move to the pot in pennies.
+            :param dedupe_id: A key unique to this move, which makes retrying it safe.
 
             :rtype: A dictionary containing information on the pot that was updated.
         """
@@ -285,12 +286,13 @@ class Monzo(object):
             "updated": "2018-04-04T16:55:11.037Z"
         }
 
-    def withdraw_from_pot(self, account_id, pot_id, amount_in_pennies):
+    def withdraw_from_pot(self, account_id, pot_id, amount_in_pennies, dedupe_id=None):
         """Move money from an account into a pot. (https://monzo.com/docs/#withdraw-from-a-pot)
 
             :param account_id: The unique identifier for the account to move the money to.
             :param pot_id: The unique identifier for the pot to withdraw the money from.
             :param amount_in_pennies: The amount of money to move to the pot in pennies.
+            :param dedupe_id: A key unique to this move, which makes retrying it safe.
 
             :rtype: A dictionary containing information on the pot that was updated.
         """
@@ -0,0 +1,47 @@
+"""A replacement for monzo.auth.MonzoOAuth2Client for testing purposes
+"""
+
+from urllib.parse import urlparse
+
+
+class MonzoOAuth2Client(object):
+    """A stubbed out OAuth client which answers requests from in-memory routes
+       and records every request made through it.
+
+       :param routes: A dictionary mapping an API path (e.g. "/balance") to a
+                      callable taking `(method, params, data)` and returning a response.
+    """
+
+    def __init__(self, routes=None):
+        self.routes = dict(routes or {})
+        self.requests = []
+
+    def make_request(self, url, data=None, method=None, **kwargs):
+        data = data or {}
+        method = method or ("POST" if data else "GET")
+        params = kwargs.get("params") or {}
+        path = "/" + urlparse(url).path.strip("/")
+        self.requests.append((method, path, params, data))
+        return self.routes[path](method, params, data)
+
+
+def paginated_transactions(transactions):
+    """Builds a "/transactions" route which pages through `transactions` the way
+       the Monzo API does, following `since` transaction id or timestamp cursors,
+       `before` timestamps and `limit`.
+    """
+
+    def route(method, params, data):
+        since, before = params.get("since"), params.get("before")
+        limit = params.get("limit") or 100
+        page = transactions
+        if since and since.startswith("tx_"):
+            ids = [transaction["id"] for transaction in page]
+            page = page[ids.index(since) + 1 :] if since in ids else page
+        elif since:
+            page = [t for t in page if t["created"] >= since]
+        if before:
+            page = [t for t in page if t["created"] < before]
+        return {"transactions": [dict(t) for t in page[:limit]]}
+
+    return route
@@ -0,0 +1,374 @@
+"""A local HTTP stand-in for api.monzo.com for testing and benchmarking purposes
+
+Unlike doubles/monzo.py, which replaces the `Monzo` class, this server lets the
+real `Monzo` and `MonzoOAuth2Client` talk HTTP, so pagination, retries, token
+refreshes and caching are all exercised. Point a client at it with:
+
+    server = FakeMonzoServer(transactions=500).start()
+    client = server.client()            # a Monzo wired to the server
+    ...
+    server.stop()
+"""
+
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from monzo.auth import MonzoOAuth2Client
+from monzo.monzo import Monzo
+
+ACCOUNT_ID = "acc_00009237aqC8c5umZmrRdh"
+POT_ID = "pot_00009237aqC8c5umZmrRdh"
+
+
+def generate_transactions(count, account_id=ACCOUNT_ID):
+    """Generates `count` realistic transactions, one a minute from 2019-01-01."""
+    categories = ("eating_out", "groceries", "transport", "shopping", "bills")
+    transactions = []
+    for i in range(count):
+        created = time.strftime(
+            "%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(1546300800 + i * 60)
+        )
+        merchant = "merch_{0:022d}".format(i % 50)
+        transactions.append(
+            {
+                "id": "tx_{0:022d}".format(i),
+                "account_id": account_id,
+                "amount": -(100 + (i * 37) % 5000),
+                "account_balance": 1000000 - i * 100,
+                "created": created,
+                "settled": created,
+                "currency": "GBP",
+                "local_amount": -(100 + (i * 37) % 5000),
+                "local_currency": "GBP",
+                "description": "MERCHANT {0} LONDON GBR".format(i % 50),
+                "category": categories[i % len(categories)],
+                "merchant": {
+                    "id": merchant,
+                    "group_id": "grp_{0:022d}".format(i % 50),
+                    "name": "Merchant {0}".format(i % 50),
+                    "category": categories[i % len(categories)],
+                    "logo": "https://example.com/{0}.png".format(merchant),
+                    "emoji": "",
+                    "created": "2018-01-01T00:00:00.000Z",
+                    "address": {
+                        "address": "{0} High Street".format(i % 50),
+                        "city": "London",
+                        "country": "GB",
+                        "latitude": 51.5,
+                        "longitude": -0.1,
+                        "postcode": "N1 3JD",
+                        "region": "Greater London",
+                    },
+                },
+                "metadata": {},
+                "notes": "",
+                "is_load": False,
+                "attachments": [],
+            }
+        )
+    return transactions
+
+
+class FakeMonzoServer(object):
+    """A threaded local HTTP server emulating the Monzo API.
+
+       :param transactions: The number of transactions to generate, or a list of them.
+       :param latency: Seconds each request is delayed by before it is answered.
+       :param page_size: The default (and maximum) number of transactions per page.
+       :param rate_limit_every: Answer every Nth API request with a 429 (0 disables this).
+       :param retry_after: The `Retry-After` header sent with a 429, in seconds.
+       :param token_lifetime: How many API requests an access token is accepted for
+                              before it expires and requests get a 401 (0 disables this).
+    """
+
+    def __init__(
+        self,
+        transactions=100,
+        latency=0.0,
+        page_size=100,
+        rate_limit_every=0,
+        retry_after=0,
+        token_lifetime=0,
+    ):
+        if isinstance(transactions, int):
+            transactions = generate_transactions(transactions)
+        self.transactions = transactions
+        self.latency = latency
+        self.page_size = page_size
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.token_lifetime = token_lifetime
+        self.pots = {POT_ID: {"id": POT_ID, "name": "Savings", "balance": 0}}
+        self.balance = 100000
+        self.webhooks = {}
+        self.dedupe_ids = set()
+        self.faults = []
+        self.lock = threading.Lock()
+        self.reset_stats()
+        self.tokens = {"access_0": 0}
+        self.token_generation = 0
+        self.httpd = None
+
+    def reset_stats(self):
+        """Resets the request counters."""
+        with self.lock:
+            self.requests = 0
+            self.requests_by_path = {}
+            self.rate_limited = 0
+            self.unauthorized = 0
+            self.refreshes = 0
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{0}".format(self.httpd.server_address[1])
+
+    @property
+    def access_token(self):
+        return "access_{0}".format(self.token_generation)
+
+    def start(self):
+        """Starts serving on a free local port in a background thread."""
+        # OAuth2Session refuses to send tokens over plain http otherwise
+        os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
+        server = self
+
+        class Handler(_Handler):
+            fake = server
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Stops the server."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def oauth_client(self, **kwargs):
+        """Builds a MonzoOAuth2Client with the current token, refreshing against this server."""
+        kwargs.setdefault("refresh_callback", None)
+        oauth = MonzoOAuth2Client(
+            "client_id",
+            "client_secret",
+            access_token=self.access_token,
+            refresh_token="refresh",
+            **kwargs,
+        )
+        oauth._refresh_token_url = self.url + "/oauth2/token"
+        return oauth
+
+    def client(self, **kwargs):
+        """Builds a Monzo client talking to this server."""
+        client = Monzo.from_oauth_session(self.oauth_client(**kwargs))
+        client.API_URL = self.url + "/"
+        return client
+
+    def authorize(self, header):
+        """Checks an Authorization header, expiring tokens after `token_lifetime` uses."""
+        token = (header or "").replace("Bearer ", "", 1)
+        with self.lock:
+            if token not in self.tokens:
+                return False
+            self.tokens[token] += 1
+            return not self.token_lifetime or self.tokens[token] <= self.token_lifetime
+
+    def expire_token(self):
+        """Expires the current access token, so the next request gets a 401."""
+        with self.lock:
+            self.tokens = {}
+
+    def fail_next(self, count=1, status=500, delay=0.0, apply=True):
+        """Makes the next `count` API requests fail, to exercise retries.
+
+           :param status: The status answered instead (None to answer normally, late).
+           :param delay: Seconds the answer is delayed by, e.g. past the client's timeout.
+           :param apply: Whether the request takes effect before failing, as when a
+                         response is lost after the server committed the write.
+        """
+        with self.lock:
+            self.faults.extend([(status, delay, apply)] * count)
+
+    def refresh(self):
+        with self.lock:
+            self.refreshes += 1
+            self.token_generation += 1
+            self.tokens[self.access_token] = 0
+            return {
+                "access_token": self.access_token,
+                "refresh_token": "refresh",
+                "expires_in": 21600,
+                "token_type": "Bearer",
+                "client_id": "client_id",
+                "user_id": "user_00009237aqC8c5umZmrRdh",
+            }
+
+    def route(self, method, path, query, form, headers):
+        """Answers an API request. Returns `(status, body, headers)`."""
+        segments = [segment for segment in path.split("/") if segment]
+        if method == "GET" and segments == ["ping", "whoami"]:
+            return 200, {"authenticated": True, "client_id": "client_id"}, {}
+        if method == "GET" and segments == ["accounts"]:
+            return self.etagged(
+                headers,
+                {
+                    "accounts": [
+                        {"id": ACCOUNT_ID, "description": "Peter Pan's Account"}
+                    ]
+                },
+            )
+        if method == "GET" and segments == ["balance"]:
+            return (
+                200,
+                {"balance": self.balance, "currency": "GBP", "spend_today": 0},
+                {},
+            )
+        if method == "GET" and segments == ["transactions"]:
+            return 200, {"transactions": self.page(query)}, {}
+        if segments[:1] == ["transactions"] and len(segments) == 2:
+            found = [t for t in self.transactions if t["id"] == segments[1]]
+            if not found:
+                return 404, {"message": "Transaction not found"}, {}
+            if method == "PATCH":
+                for key, value in form.items():
+                    found[0]["metadata"][key[len("metadata[") : -1]] = value
+            return 200, {"transaction": found[0]}, {}
+        if method == "GET" and segments == ["pots"]:
+            return self.etagged(headers, {"pots": list(self.pots.values())})
+        if method == "PUT" and segments[:1] == ["pots"] and len(segments) == 3:
+            return self.move(segments[1], segments[2], form)
+        if segments == ["webhooks"] and method == "GET":
+            return 200, {"webhooks": list(self.webhooks.values())}, {}
+        if segments == ["webhooks"] and method == "POST":
+            webhook_id = "webhook_{0:022d}".format(len(self.webhooks))
+            self.webhooks[webhook_id] = {"id": webhook_id, "url": form.get("url")}
+            return 200, {"webhook": self.webhooks[webhook_id]}, {}
+        if segments[:1] == ["webhooks"] and method == "DELETE":
+            self.webhooks.pop(segments[1], None)
+            return 200, {}, {}
+        if segments == ["attachment", "deregister"]:
+            return 200, {}, {}
+        return 404, {"message": "Not found"}, {}
+
+    def etagged(self, headers, body):
+        etag = '"{0}"'.format(hash(json.dumps(body, sort_keys=True)) & 0xFFFFFFFF)
+        if headers.get("If-None-Match") == etag:
+            return 304, None, {"ETag": etag}
+        return 200, body, {"ETag": etag}
+
+    def page(self, query):
+        since, before = query.get("since"), query.get("before")
+        limit = min(int(query.get("limit") or self.page_size), self.page_size)
+        transactions = self.transactions
+        if since and since.startswith("tx_"):
+            ids = [transaction["id"] for transaction in transactions]
+            transactions = transactions[ids.index(since) + 1 :] if since in ids else []
+        elif since:
+            transactions = [t for t in transactions if t["created"] >= since]
+        if before:
+            transactions = [t for t in transactions if t["created"] < before]
+        return transactions[:limit]
+
+    def move(self, pot_id, direction, form):
+        if pot_id not in self.pots:
+            return 404, {"message": "Pot not found"}, {}
+        with self.lock:
+            if form.get("dedupe_id") not in self.dedupe_ids:
+                self.dedupe_ids.add(form.get("dedupe_id"))
+                amount = int(form["amount"])
+                if direction == "withdraw":
+                    amount = -amount
+                self.pots[pot_id]["balance"] += amount
+                self.balance -= amount
+        return 200, self.pots[pot_id], {}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    fake = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_one_request_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode() if length else ""
+        return {key: values[-1] for key, values in parse_qs(body).items()}
+
+    def respond(self, status, body, headers=None):
+        payload = b"" if body is None else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def dispatch(self, method):
+        fake = self.fake
+        form = self.handle_one_request_body()
+        parsed = urlparse(self.path)
+        path = "/" + "/".join(segment for segment in parsed.path.split("/") if segment)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        if fake.latency:
+            time.sleep(fake.latency)
+
+        if path == "/oauth2/token":
+            return self.respond(200, fake.refresh())
+
+        with fake.lock:
+            fake.requests += 1
+            fake.requests_by_path[path] = fake.requests_by_path.get(path, 0) + 1
+            limited = (
+                fake.rate_limit_every and fake.requests % fake.rate_limit_every == 0
+            )
+            if limited:
+                fake.rate_limited += 1
+        if limited:
+            return self.respond(
+                429,
+                {"message": "Too many requests"},
+                {"Retry-After": str(fake.retry_after)},
+            )
+        if not fake.authorize(self.headers.get("Authorization")):
+            with fake.lock:
+                fake.unauthorized += 1
+            return self.respond(401, {"message": "Access token has expired"})
+        with fake.lock:
+            fault = fake.faults.pop(0) if fake.faults else None
+        if fault is None:
+            return self.respond(*fake.route(method, path, query, form, self.headers))
+        status, delay, apply = fault
+        response = (
+            fake.route(method, path, query, form, self.headers) if apply else None
+        )
+        time.sleep(delay)
+        if status is None and response is not None:
+            return self.respond(*response)
+        self.respond(status or 500, {"message": "Injected failure"})
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_PATCH(self):
+        self.dispatch("PATCH")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
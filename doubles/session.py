@@ -0,0 +1,57 @@
+"""A replacement for requests_oauthlib.OAuth2Session for testing purposes
+"""
+
+import json
+import threading
+
+
+class Response(object):
+    """A stubbed out HTTP response."""
+
+    def __init__(self, status_code=200, json=None, headers=None):
+        self.status_code = status_code
+        self._json = {} if json is None else json
+        self.headers = headers or {}
+
+    @property
+    def content(self):
+        return json.dumps(self._json).encode("utf-8")
+
+    def json(self):
+        return self._json
+
+
+class OAuth2Session(object):
+    """A stubbed out OAuth2 session which replays queued responses and records
+       every request made through it.
+
+       :param responses: Responses returned in order; the last one is repeated.
+       :param token: The initial token dictionary.
+    """
+
+    def __init__(self, responses=None, token=None):
+        self.responses = list(responses or [Response()])
+        self.requests = []
+        self.refreshes = 0
+        self.token = dict(token or {"access_token": "stubbed"})
+        self.token_updater = None
+        self._lock = threading.Lock()
+
+    @property
+    def access_token(self):
+        return self.token.get("access_token")
+
+    def request(self, method, url, **kwargs):
+        with self._lock:
+            self.requests.append((method, url, kwargs))
+            if len(self.responses) > 1:
+                return self.responses.pop(0)
+            return self.responses[0]
+
+    def refresh_token(self, token_url, **kwargs):
+        with self._lock:
+            self.refreshes += 1
+            self.token = dict(
+                self.token, access_token="refreshed_{0}".format(self.refreshes)
+            )
+            return self.token
@@ -3,8 +3,13 @@ from settings import get_environment_var
 
 client = Monzo(get_environment_var('ACCESS_TOKEN'))
 account_id = client.get_first_account()['id']
-transactions = client.get_transactions(account_id)['transactions']
-for transaction in transactions:
-     if transaction['attachments']:
-         for attachment in transaction['attachments']:
-            client.deregister_attachment(attachment['id'])
+# Attachments can be added to transactions of any age, so read every page
+# afresh rather than from a local store synced from its high-water mark
+attachment_ids = [
+    attachment['id']
+    for transaction in client.iter_transactions(account_id)
+    for attachment in transaction.get('attachments') or []
+]
+for result in client.deregister_attachments(attachment_ids, concurrency=16):
+    if result.error is not None:
+        print('Could not remove {0}: {1}'.format(result.item, result.error))
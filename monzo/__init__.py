@@ -1,2 +1,24 @@
-from monzo.monzo import Monzo
-from monzo.auth import MonzoOAuth2Client
+"""A Python wrapper for the Monzo API.
+
+`Monzo` and `MonzoOAuth2Client` are imported when first accessed, so
+`import monzo` (or importing a light module such as `monzo.tokens`) does not
+pay for the modules behind them.
+"""
+
+import importlib
+
+__all__ = ["Monzo", "MonzoOAuth2Client"]
+
+_LAZY = {"Monzo": "monzo.monzo", "MonzoOAuth2Client": "monzo.auth"}
+
+
+def __getattr__(name):
+    if name not in _LAZY:
+        raise AttributeError("module 'monzo' has no attribute {0!r}".format(name))
+    value = getattr(importlib.import_module(_LAZY[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
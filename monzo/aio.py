@@ -0,0 +1,411 @@
+"""An asyncio-native counterpart to `monzo.monzo.Monzo` and
+`monzo.auth.MonzoOAuth2Client`.
+
+The classes in this module mirror the endpoint surface of their synchronous
+counterparts, but every call is a coroutine sharing a single `aiohttp`
+connection pool, so one event loop can keep many requests in flight at once.
+
+This module requires the optional `aiohttp` dependency
+(`pip install monzo[async]`).
+"""
+
+import asyncio
+import time
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - exercised only without the extra
+    aiohttp = None
+
+from monzo import codec
+from monzo.auth import MonzoOAuth2Client, raise_for_status
+from monzo.errors import UnauthorizedError
+from monzo.utils import generate_dedupe_id, format_timestamp
+from monzo.const import (
+    CLIENT_SECRET,
+    ACCESS_TOKEN,
+    REFRESH_TOKEN,
+    EXPIRES_AT,
+)
+
+
+class AsyncMonzoOAuth2Client(object):
+    """An asyncio OAuth2 client to handle authentication of calls to the Monzo API.
+
+       :param client_id: Client id string as given by Monzo Developer website
+       :param client_secret: Client secret string as given by Monzo Developer website
+       :param access_token: String token needed to access Monzo API
+       :param refresh_token: String token used to refresh expired access token.
+       :param expires_at: Unix time representation of access token expiry
+       :param refresh_callback: Callback function for when access token is refreshed
+       :param session: An existing `aiohttp.ClientSession` to share between clients
+       :param limit: The maximum number of simultaneous connections in the pool
+       :param limit_per_host: The maximum number of simultaneous connections per host
+    """
+
+    _refresh_token_url = MonzoOAuth2Client._refresh_token_url
+
+    def __init__(
+        self,
+        client_id,
+        client_secret,
+        access_token=None,
+        refresh_token=None,
+        expires_at=None,
+        refresh_callback=None,
+        session=None,
+        limit=100,
+        limit_per_host=0,
+        **kwargs,
+    ):
+        if aiohttp is None:
+            raise ImportError(
+                "AsyncMonzoOAuth2Client requires aiohttp: pip install monzo[async]"
+            )
+
+        self.client_id, self.client_secret = client_id, client_secret
+        self.token = {}
+        if access_token:
+            self.token[ACCESS_TOKEN] = access_token
+        if refresh_token:
+            self.token[REFRESH_TOKEN] = refresh_token
+        if expires_at:
+            self.token[EXPIRES_AT] = expires_at
+
+        self.refresh_callback = refresh_callback
+        self.timeout = kwargs.get("timeout", None)
+        self._session = session
+        self._owns_session = session is None
+        self._limit, self._limit_per_host = limit, limit_per_host
+        self._lock = None
+
+    @property
+    def session(self):
+        """The `aiohttp.ClientSession` holding the shared connection pool.
+           It is created lazily, as `aiohttp` requires a running event loop.
+        """
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self._limit, limit_per_host=self._limit_per_host
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    @property
+    def _refresh_lock(self):
+        """Serialises token refreshes, so concurrent requests share one refresh."""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def close(self):
+        """Closes the connection pool, if it was created by this client."""
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+        self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def make_request(self, url, data=None, method=None, **kwargs):
+        """
+        Builds and makes the OAuth2 Request, catches errors
+        https://docs.monzo.com/#errors
+        """
+        if self.timeout is not None and "timeout" not in kwargs:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=self.timeout)
+        if kwargs.get("params"):
+            kwargs["params"] = {
+                key: str(value)
+                for key, value in kwargs["params"].items()
+                if value is not None
+            }
+
+        data = data or {}
+        method = method or ("POST" if data else "GET")
+
+        access_token = self.token.get(ACCESS_TOKEN)
+        try:
+            return await self._request(method, url, data=data, **kwargs)
+        except UnauthorizedError:
+            if not self.token.get(REFRESH_TOKEN):
+                raise
+            async with self._refresh_lock:
+                if self.token.get(ACCESS_TOKEN) == access_token:
+                    await self.refresh_token()
+            return await self._request(method, url, data=data, **kwargs)
+
+    async def _request(self, method, url, **kwargs):
+        headers = {"Authorization": "Bearer {0}".format(self.token.get(ACCESS_TOKEN))}
+        async with self.session.request(
+            method, url, headers=headers, **kwargs
+        ) as response:
+            return self.validate_response(
+                response.status, codec.loads(await response.read()), response.headers
+            )
+
+    async def refresh_token(self):
+        """Obtains a new access_token from the refresh token.
+
+           :rtype: A Dictionary representation of the authentication token.
+        """
+        data = {
+            "grant_type": "refresh_token",
+            "refresh_token": self.token.get(REFRESH_TOKEN),
+        }
+        auth = aiohttp.BasicAuth(self.client_id, self.client_secret)
+        async with self.session.post(
+            self._refresh_token_url, data=data, auth=auth
+        ) as response:
+            token = self.validate_response(
+                response.status, codec.loads(await response.read())
+            )
+
+        if "expires_in" in token:
+            token[EXPIRES_AT] = time.time() + int(token["expires_in"])
+        self.token = token
+        token = dict(token, **{CLIENT_SECRET: self.client_secret})
+
+        if self.refresh_callback:
+            self.refresh_callback(token)
+
+        return token
+
+    def validate_response(self, status_code, json_response, headers=None):
+        """Validate the response and raises any appropriate errors.
+           https://docs.monzo.com/#errors
+
+           :param status_code: The HTTP status code of the response
+           :param json_response: The decoded body of the response
+           :param headers: The headers of the response
+           :rtype: A Dictionary representation of the response, if no errors occured.
+        """
+        if status_code == 200:
+            return json_response
+        raise_for_status(status_code, json_response, headers)
+
+
+class AsyncMonzo(object):
+    """The asyncio representation of Monzo's API endpoints.
+
+       Every endpoint method is a coroutine with the same arguments and return
+       value as its counterpart on `monzo.monzo.Monzo`.
+
+       :param access_token: The access token to authorise API calls.
+    """
+
+    API_URL = "https://api.monzo.com/"  #: (str): A representation of the current Monzo api url.
+
+    def __init__(self, access_token, **kwargs):
+        """Starts an OAuth session with just an access token
+           This will fail once the token expires,
+           for a longer-lived session use AsyncMonzo.from_oauth_session()
+
+           :param access_token: A valid access token from https://developers.monzo.com/
+        """
+        self.oauth_session = AsyncMonzoOAuth2Client(
+            None, None, access_token=access_token, **kwargs
+        )
+
+    @classmethod
+    def from_oauth_session(cls, oauth):
+        """Inserts an existing AsyncMonzoOAuth2Client into this AsyncMonzo object
+
+           :param oauth: The AsyncMonzoOAuth2Client to be used by the newly created object.
+           :rtype: A new AsyncMonzo object
+        """
+        new_monzo = cls.__new__(cls)
+        new_monzo.oauth_session = oauth
+        return new_monzo
+
+    async def close(self):
+        """Closes the underlying connection pool."""
+        await self.oauth_session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def whoami(self):
+        """Gives information about an access token. (https://monzo.com/docs/#authenticating-requests)
+
+           :rtype: A Dictionary representation of the authentication status.
+        """
+        url = "{0}/ping/whoami".format(self.API_URL)
+        return await self.oauth_session.make_request(url)
+
+    async def get_accounts(self):
+        """Get all accounts that belong to a user. (https://monzo.com/docs/#list-accounts)
+
+           :rtype: A Collection of accounts for a user.
+        """
+        url = "{0}/accounts".format(self.API_URL)
+        return await self.oauth_session.make_request(url)
+
+    async def get_first_account(self):
+        """Gets the first account for a user.
+
+           :rtype: A Dictionary representation of the first account belonging to a user, if it exists.
+        """
+        accounts = await self.get_accounts()
+        if len(accounts["accounts"]) <= 0:
+            raise LookupError("There are no accounts associated with this user.")
+        return accounts["accounts"][0]
+
+    async def get_transactions(self, account_id, before=None, since=None, limit=None):
+        """Get all transactions of a given account. (https://monzo.com/docs/#list-transactions)
+
+           :param account_id: The unique identifier for the account which the transactions belong to.
+           :param before: A datetime representing the time of the earliest transaction to return (Can't take transaction id as input)
+           :param since: A datetime representing the time of the earliest transaction to return. (Can also take a transaction id)
+           :param limit: The maximum number of transactions to return (Max = 100)
+           :rtype: A collection of transaction objects for specific user.
+        """
+        url = "{0}/transactions".format(self.API_URL)
+        params = {
+            "expand[]": "merchant",
+            "account_id": account_id,
+            "before": format_timestamp(before),
+            "since": format_timestamp(since),
+            "limit": limit,
+        }
+        return await self.oauth_session.make_request(url, params=params)
+
+    async def iter_transactions(
+        self, account_id, since=None, before=None, page_size=100
+    ):
+        """Lazily iterate over all transactions of a given account, oldest first.
+           See `monzo.monzo.Monzo.iter_transactions`.
+
+           :param account_id: The unique identifier for the account which the transactions belong to.
+           :param since: A datetime or transaction id to start iterating from.
+           :param before: A datetime representing the time to stop iterating at.
+           :param page_size: The number of transactions to request per page, from 1 to 100.
+           :rtype: An asynchronous generator of transaction objects.
+        """
+        if not 1 <= page_size <= 100:
+            raise ValueError("page_size must be between 1 and 100.")
+        while True:
+            response = await self.get_transactions(
+                account_id, before=before, since=since, limit=page_size
+            )
+            transactions = response["transactions"]
+            for transaction in transactions:
+                yield transaction
+            if len(transactions) < page_size:
+                return
+            since = transactions[-1]["id"]
+
+    async def get_transaction(self, transaction_id):
+        """Retrieve data for a specific transaction. (https://docs.monzo.com/#retrieve-transaction)
+
+           :param transaction_id: The unique identifier for the transaction for which data should be retrieved for.
+           :rtype: A dictionary containing the data for the specified transaction_id.
+        """
+        url = "{0}/transactions/{1}".format(self.API_URL, transaction_id)
+        return await self.oauth_session.make_request(url)
+
+    async def get_balance(self, account_id):
+        """Gets the balance of a given account. (https://monzo.com/docs/#read-balance)
+
+           :param account_id: The unique identifier for the account which the balance belong to.
+           :rtype: Dictionary representation of the current account balance.
+        """
+        url = "{0}/balance".format(self.API_URL)
+        params = {"account_id": account_id}
+        return await self.oauth_session.make_request(url, params=params)
+
+    async def get_webhooks(self, account_id):
+        """Gets the webhooks of a given account. (https://monzo.com/docs/#list-webhooks)
+
+           :param account_id: The unique identifier for the account which the webhooks belong to.
+           :rtype: A collection of webhooks that belong to an account.
+        """
+        url = "{0}/webhooks".format(self.API_URL)
+        params = {"account_id": account_id}
+        return await self.oauth_session.make_request(url, params=params)
+
+    async def delete_webhook(self, webhook_id):
+        """Deletes the a specified webhook. (https://monzo.com/docs/#deleting-a-webhook)
+
+           :param webhook_id: The unique identifier for the webhook to delete.
+           :rtype: An empty Dictionary, if the deletion was successful.
+        """
+        url = "{0}/webhooks/{1}".format(self.API_URL, webhook_id)
+        return await self.oauth_session.make_request(url, method="DELETE")
+
+    async def delete_all_webhooks(self, account_id):
+        """Removes all webhooks associated with the specified account, if it exists.
+           The deletions are issued concurrently.
+
+           :param account_id: The unique identifier for the account which all webhooks will be removed from.
+           :rtype: None
+        """
+        webhooks = await self.get_webhooks(account_id)
+        await asyncio.gather(
+            *(self.delete_webhook(webhook["id"]) for webhook in webhooks["webhooks"])
+        )
+
+    async def register_webhook(self, webhook_url, account_id):
+        """Registers a webhook. (https://monzo.com/docs/#registering-a-webhook)
+
+           :param webhook_url: The webhook url to register.
+           :param account_id: The unique identifier for the account to register the webhook.
+           :rtype: Registers a webhook to an account.
+        """
+        url = "{0}/webhooks".format(self.API_URL)
+        data = {"account_id": account_id, "url": webhook_url}
+        return await self.oauth_session.make_request(url, data=data)
+
+    async def get_pots(self):
+        """Get all pots for a user. (https://monzo.com/docs/#list-pots)
+
+           :rtype: A collection of pots for a user.
+        """
+        url = "{0}/pots".format(self.API_URL)
+        return await self.oauth_session.make_request(url)
+
+    async def deposit_into_pot(
+        self, pot_id, account_id, amount_in_pennies, dedupe_id=None
+    ):
+        """Move money from an account into a pot. (https://monzo.com/docs/#deposit-into-a-pot)
+
+           :param pot_id: The unique identifier for the pot to deposit the money to.
+           :param account_id: The unique identifier for the account to move the money from.
+           :param amount_in_pennies: The amount of money to move to the pot in pennies.
+           :param dedupe_id: A key unique to this deposit, which makes retrying it safe.
+                             Reuse it when retrying the same deposit (Default: a new random key)
+           :rtype: A dictionary containing information on the pot that was updated.
+        """
+        url = "{0}/pots/{1}/deposit".format(self.API_URL, pot_id)
+        data = {
+            "source_account_id": account_id,
+            "amount": amount_in_pennies,
+            "dedupe_id": dedupe_id or generate_dedupe_id(),
+        }
+        return await self.oauth_session.make_request(url, data=data, method="PUT")
+
+    async def withdraw_from_pot(
+        self, account_id, pot_id, amount_in_pennies, dedupe_id=None
+    ):
+        """Move money from a pot into an account. (https://monzo.com/docs/#withdraw-from-a-pot)
+
+           :param account_id: The unique identifier for the account to move the money to.
+           :param pot_id: The unique identifier for the pot to withdraw the money from.
+           :param amount_in_pennies: The amount of money to move to the pot in pennies.
+           :param dedupe_id: A key unique to this withdrawal, which makes retrying it safe.
+                             Reuse it when retrying the same withdrawal (Default: a new random key)
+           :rtype: A dictionary containing information on the pot that was updated.
+        """
+        url = "{0}/pots/{1}/withdraw".format(self.API_URL, pot_id)
+        data = {
+            "destination_account_id": account_id,
+            "amount": amount_in_pennies,
+            "dedupe_id": dedupe_id or generate_dedupe_id(),
+        }
+        return await self.oauth_session.make_request(url, data=data, method="PUT")
@@ -0,0 +1,203 @@
+"""Rolling spend aggregates over a local transaction store.
+
+This module contains the class `SpendAnalytics`, which keeps daily, monthly,
+category and merchant totals in a table alongside the transactions of a
+`monzo.store.TransactionStore`. It subscribes to the store, so every upsert -
+whether from `Monzo.sync_transactions` or a `monzo.webhooks.WebhookReceiver`
+writing through to the store - adds the contribution of new transactions and
+replaces that of updated ones in the same database transaction. Queries then
+read a handful of precomputed buckets rather than every transaction.
+
+    store = TransactionStore()
+    analytics = SpendAnalytics(store)
+    client.sync_transactions(account_id, store=store)
+    analytics.by_category(account_id)
+"""
+
+from monzo import codec
+
+DIMENSIONS = ("day", "month", "category", "merchant")
+
+#: (str): The category bucket of uncategorised transactions.
+UNCATEGORISED = "uncategorised"
+NO_MERCHANT = ""  #: (str): The merchant bucket of transactions without a merchant.
+
+
+def buckets(transaction):
+    """Gets the buckets a transaction counts towards.
+
+       :param transaction: A transaction object.
+       :rtype: A list of `(dimension, bucket, label)` tuples.
+    """
+    created = transaction["created"]
+    merchant = transaction.get("merchant")
+    if isinstance(merchant, dict):
+        merchant_id, merchant_name = merchant.get("id"), merchant.get("name")
+    else:
+        merchant_id, merchant_name = merchant, None
+    return [
+        ("day", created[:10], None),
+        ("month", created[:7], None),
+        ("category", transaction.get("category") or UNCATEGORISED, None),
+        ("merchant", merchant_id or NO_MERCHANT, merchant_name),
+    ]
+
+
+def _counts(transaction):
+    """Whether a transaction counts towards the totals. Declined transactions
+       never moved any money, so they are left out."""
+    return not transaction.get("decline_reason") and transaction.get("amount")
+
+
+class SpendAnalytics(object):
+    """Daily, monthly, category and merchant totals of the transactions in a store.
+
+       Every bucket holds the number of transactions, their net `total` and the
+       money out (`spend`, a positive number) and in (`income`), all in minor
+       units, per currency.
+
+       :param store: The monzo.store.TransactionStore to aggregate.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS spend_aggregates (
+            account_id TEXT NOT NULL,
+            dimension TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            currency TEXT NOT NULL,
+            label TEXT,
+            count INTEGER NOT NULL,
+            total INTEGER NOT NULL,
+            spend INTEGER NOT NULL,
+            income INTEGER NOT NULL,
+            PRIMARY KEY (account_id, dimension, bucket, currency)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, store):
+        self.store = store
+        with store.lock, store.connection:
+            exists = store.connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'spend_aggregates'"
+            ).fetchone()
+            store.connection.executescript(self.SCHEMA)
+            if not exists:
+                self._rebuild(store.connection)
+            store.subscribe(self._on_upsert)
+
+    def rebuild(self):
+        """Recomputes every aggregate from the stored transactions."""
+        with self.store.lock, self.store.connection:
+            self._rebuild(self.store.connection)
+
+    def _rebuild(self, connection):
+        connection.execute("DELETE FROM spend_aggregates")
+        rows = connection.execute("SELECT account_id, data FROM transactions")
+        changes = {}
+        for account_id, data in rows:
+            self._add(changes, account_id, codec.loads(data), 1)
+        self._apply(connection, changes)
+
+    def _on_upsert(self, connection, account_id, replaced, transactions):
+        changes = {}
+        latest = {transaction["id"]: transaction for transaction in transactions}
+        for transaction_id, transaction in latest.items():
+            if transaction_id in replaced:
+                previous = replaced[transaction_id]
+                self._add(changes, previous.get("account_id", account_id), previous, -1)
+            self._add(changes, account_id, transaction, 1)
+        self._apply(connection, changes)
+
+    @staticmethod
+    def _add(changes, account_id, transaction, sign):
+        """Adds (sign=1) or removes (sign=-1) a transaction's contribution to `changes`."""
+        if not _counts(transaction):
+            return
+        amount = transaction["amount"]
+        currency = transaction.get("currency") or ""
+        for dimension, bucket, label in buckets(transaction):
+            key = (account_id, dimension, bucket, currency)
+            change = changes.setdefault(key, [label, 0, 0, 0, 0])
+            change[0] = change[0] or label
+            change[1] += sign
+            change[2] += sign * amount
+            change[3] += sign * max(-amount, 0)
+            change[4] += sign * max(amount, 0)
+
+    @staticmethod
+    def _apply(connection, changes):
+        connection.executemany(
+            "INSERT INTO spend_aggregates VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (account_id, dimension, bucket, currency) DO UPDATE SET "
+            "label = COALESCE(excluded.label, label), "
+            "count = count + excluded.count, "
+            "total = total + excluded.total, "
+            "spend = spend + excluded.spend, "
+            "income = income + excluded.income",
+            [key + tuple(change) for key, change in changes.items()],
+        )
+        connection.execute("DELETE FROM spend_aggregates WHERE count <= 0")
+
+    def totals(self, account_id, dimension, since=None, before=None, currency=None):
+        """Gets the aggregates of an account along one dimension.
+
+           :param account_id: The unique identifier for the account.
+           :param dimension: One of "day", "month", "category" or "merchant".
+           :param since: The earliest bucket to return, e.g. "2019-01-01" for days.
+           :param before: The bucket to stop before.
+           :param currency: Only return totals in this currency.
+           :rtype: A list of dictionaries, ordered by bucket.
+        """
+        if dimension not in DIMENSIONS:
+            raise ValueError(
+                "Unknown dimension {0!r}, expected one of {1}".format(
+                    dimension, ", ".join(DIMENSIONS)
+                )
+            )
+        query = (
+            "SELECT bucket, currency, label, count, total, spend, income "
+            "FROM spend_aggregates WHERE account_id = ? AND dimension = ?"
+        )
+        args = [account_id, dimension]
+        for condition, value in (
+            ("bucket >= ?", since),
+            ("bucket < ?", before),
+            ("currency = ?", currency),
+        ):
+            if value is not None:
+                query += " AND " + condition
+                args.append(value)
+        query += " ORDER BY bucket, currency"
+        with self.store.lock:
+            rows = self.store.connection.execute(query, args).fetchall()
+        names = ("bucket", "currency", "label", "count", "total", "spend", "income")
+        return [dict(zip(names, row)) for row in rows]
+
+    def daily(self, account_id, since=None, before=None, currency=None):
+        """Gets the totals of each day ("YYYY-MM-DD"). See `totals`."""
+        return self.totals(account_id, "day", since, before, currency)
+
+    def monthly(self, account_id, since=None, before=None, currency=None):
+        """Gets the totals of each month ("YYYY-MM"). See `totals`."""
+        return self.totals(account_id, "month", since, before, currency)
+
+    def by_category(self, account_id, currency=None):
+        """Gets the totals of each category. See `totals`."""
+        return self.totals(account_id, "category", currency=currency)
+
+    def by_merchant(self, account_id, currency=None):
+        """Gets the totals of each merchant id, labelled with the merchant's name
+           where it was expanded. See `totals`."""
+        return self.totals(account_id, "merchant", currency=currency)
+
+    def top(self, account_id, dimension, limit=10, currency=None):
+        """Gets the buckets with the most spend.
+
+           :param account_id: The unique identifier for the account.
+           :param dimension: One of "day", "month", "category" or "merchant".
+           :param limit: The maximum number of buckets to return.
+           :param currency: Only return totals in this currency.
+           :rtype: A list of dictionaries, biggest spend first.
+        """
+        totals = self.totals(account_id, dimension, currency=currency)
+        return sorted(totals, key=lambda row: row["spend"], reverse=True)[:limit]
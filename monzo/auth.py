@@ -5,13 +5,23 @@ and used under the Apache2 license: https://www.apache.org/licenses/LICENSE-2.0
 
 Original code may be found at: https://github.com/orcasgit/python-fitbit
 
+requests, requests_oauthlib and oauthlib are only imported when the first
+session or adapter is created, so importing this module stays cheap.
 """
 
-from requests.auth import HTTPBasicAuth
-from requests_oauthlib import OAuth2Session
-from oauthlib.oauth2 import TokenExpiredError
+import threading
+import time
+from functools import partial
 
+from monzo import codec
 from monzo.utils import save_token_to_file, load_token_from_file
+from monzo.ratelimit import backoff_delay, parse_retry_after
+from monzo.cache import ResponseCache
+from monzo.coalesce import RequestCoalescer
+from monzo.retry import RetryPolicy
+from monzo.metrics import endpoint_template
+from monzo.streaming import CHUNK_SIZE, iter_json_array
+from monzo.tokens import is_expiring
 from monzo.errors import (
     BadRequestError,
     UnauthorizedError,
@@ -30,11 +40,65 @@ from monzo.const import (
     REFRESH_TOKEN,
     EXPIRES_AT,
     MONZO_CACHE_FILE,
+    AUTHORIZE_ENDPOINT,
 )
 
 
+ERRORS_BY_STATUS_CODE = {
+    400: BadRequestError,
+    401: UnauthorizedError,
+    403: ForbiddenError,
+    404: PageNotFoundError,
+    405: MethodNotAllowedError,
+    406: NotAcceptibleError,
+    429: TooManyRequestsError,
+    500: InternalServerError,
+    504: GatewayTimeoutError,
+}  #: (dict): Maps documented Monzo API status codes to the errors they raise.
+
+
+def raise_for_status(status_code, json_response, headers=None):
+    """Raises the error documented for an unsuccessful Monzo API status code.
+       https://docs.monzo.com/#errors
+
+       :param status_code: The HTTP status code of the response
+       :param json_response: The decoded body of the response
+       :param headers: The headers of the response, used to read `Retry-After`
+    """
+    if status_code == 429:
+        retry_after = parse_retry_after((headers or {}).get("Retry-After"))
+        raise TooManyRequestsError(json_response["message"], retry_after=retry_after)
+    error = ERRORS_BY_STATUS_CODE.get(status_code)
+    if error is not None:
+        raise error(json_response["message"])
+
+
+def create_adapter(
+    pool_connections=10, pool_maxsize=10, max_retries=0, pool_block=False
+):
+    """Creates an HTTP adapter holding a pool of keep-alive connections.
+       Pass the same adapter to many clients (e.g. one per customer token)
+       so that they share connections instead of each paying for its own
+       TLS handshake.
+
+       :param pool_connections: The number of hosts to keep connection pools for
+       :param pool_maxsize: The maximum number of connections kept per host
+       :param max_retries: Retries for failed connections, as an int or urllib3 `Retry`
+       :param pool_block: Whether to block when no connection is free, rather than open a new one
+       :rtype: A requests.adapters.HTTPAdapter
+    """
+    from requests.adapters import HTTPAdapter
+
+    return HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=max_retries,
+        pool_block=pool_block,
+    )
+
+
 class MonzoOAuth2Client(object):
-    AUTHORIZE_ENDPOINT = "https://auth.monzo.com"
+    AUTHORIZE_ENDPOINT = AUTHORIZE_ENDPOINT
     API_ENDPOINT = "https://api.monzo.com"
     API_VERSION = 1
 
@@ -70,9 +134,47 @@ class MonzoOAuth2Client(object):
             :param expires_at: Unix time representation of access token expiry
             :param refresh_callback: Callback function for when access token is refreshed
             :param redirect_uri: URL to which user is redirected to after authentication by Monzo
+
+        Optional keyword arguments:
+
+            :param timeout: Timeout in seconds passed to every request
+            :param rate_limiter: A monzo.ratelimit.TokenBucket throttling outgoing requests,
+                                 which may be shared between clients and threads
+            :param rate_limit_retries: How many times a request answered with a 429 is
+                                       retried, with jittered exponential backoff (Default 3)
+            :param adapter: An HTTP adapter from create_adapter() to send requests through,
+                            which may be shared between clients to share connections
+            :param pool_connections: The number of hosts to keep connection pools for
+            :param pool_maxsize: The maximum number of connections kept per host
+            :param pool_block: Whether to block when no pooled connection is free
+            :param max_retries: Retries for failed connections made by the adapter
+            :param keep_alive: Whether to keep connections open between requests (Default True)
+            :param cache: A monzo.cache.ResponseCache for GET responses, or True for the defaults
+            :param write_retry: A monzo.retry.RetryPolicy applied to writes made with
+                                `idempotent=True`, or True for the defaults
+            :param coalesce: A monzo.coalesce.RequestCoalescer sharing the responses of identical
+                             concurrent GET requests, or True for a new one
+            :param token_store: A monzo.tokenstore.TokenStore to load the token from (when no
+                                access_token is given) and save refreshed tokens to, in
+                                place of refresh_callback. Refreshes are coordinated
+                                through the store's lock.
+            :param hooks: A monzo.metrics.Hooks object (or a list of them) notified as requests
+                          start, finish and are retried and as the token is refreshed
+            :param refresh_margin: Seconds before `expires_at` to refresh the token (Default 60)
+            :param max_refresh_attempts: How many times one request may refresh the token
+                                         after being rejected as unauthorized (Default 1)
         """
 
         self.client_id, self.client_secret = client_id, client_secret
+        self.token_store = kwargs.get("token_store", None)
+        if self.token_store is not None:
+            refresh_callback = self.token_store.save
+            if not access_token:
+                stored = self.token_store.load() or {}
+                access_token = stored.get(ACCESS_TOKEN)
+                refresh_token = refresh_token or stored.get(REFRESH_TOKEN)
+                expires_at = expires_at or stored.get(EXPIRES_AT)
+
         token = {}
         if access_token:
             token[ACCESS_TOKEN] = access_token
@@ -81,13 +183,73 @@ class MonzoOAuth2Client(object):
         if expires_at:
             token[EXPIRES_AT] = expires_at
 
-        self.session = OAuth2Session(
-            client_id,
-            token_updater=refresh_callback,
-            token=token,
-            redirect_uri=redirect_uri,
-        )
+        # The session and adapter are created on first use, see `session`
+        self._session_options = {
+            "token_updater": refresh_callback,
+            "token": token,
+            "redirect_uri": redirect_uri,
+        }
+        self._pool_options = {
+            key: kwargs[key]
+            for key in ("pool_connections", "pool_maxsize", "pool_block", "max_retries")
+            if key in kwargs
+        }
+        self._keep_alive = kwargs.get("keep_alive", True)
+        self._session = None
+        self._adapter = kwargs.get("adapter", None)
+        self._session_lock = threading.Lock()
+
         self.timeout = kwargs.get("timeout", None)
+        self.rate_limiter = kwargs.get("rate_limiter", None)
+        self.rate_limit_retries = kwargs.get("rate_limit_retries", 3)
+        self.cache = kwargs.get("cache", None)
+        if self.cache is True:
+            self.cache = ResponseCache()
+        self.write_retry = kwargs.get("write_retry", None)
+        if self.write_retry is True:
+            self.write_retry = RetryPolicy()
+        self.coalescer = kwargs.get("coalesce", None)
+        if self.coalescer is True:
+            self.coalescer = RequestCoalescer()
+        self.refresh_margin = kwargs.get("refresh_margin", 60)
+        self.max_refresh_attempts = kwargs.get("max_refresh_attempts", 1)
+        self._refresh_lock = threading.Lock()
+        hooks = kwargs.get("hooks", None) or []
+        self.hooks = list(hooks) if isinstance(hooks, (list, tuple)) else [hooks]
+
+    @property
+    def session(self):
+        """The requests_oauthlib.OAuth2Session requests are made with, created
+        (importing the transport libraries) when it is first used."""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    @session.setter
+    def session(self, session):
+        self._session = session
+
+    @property
+    def adapter(self):
+        """The HTTP adapter mounted on the session, if one was given or pool
+        options were set, otherwise None."""
+        if self._adapter is None and self._pool_options:
+            self._adapter = create_adapter(**self._pool_options)
+        return self._adapter
+
+    def _create_session(self):
+        from requests_oauthlib import OAuth2Session
+
+        session = OAuth2Session(self.client_id, **self._session_options)
+        adapter = self.adapter
+        if adapter is not None:
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        if not self._keep_alive:
+            session.headers["Connection"] = "close"
+        return session
 
     @classmethod
     def from_json(cls, filename=MONZO_CACHE_FILE, refresh_callback=save_token_to_file):
@@ -106,20 +268,43 @@ class MonzoOAuth2Client(object):
         expires_at = token.get(EXPIRES_AT)
 
         # Check if file contains information for a valid OAuth session
-        if access_token or all(client_id, client_secret):
-            return MonzoOAuth2Client(
+        if access_token or all((client_id, client_secret)):
+            return cls(
                 client_id,
                 client_secret,
                 access_token=access_token,
                 refresh_token=refresh_token,
                 expires_at=expires_at,
-                refresh_cb=refresh_callback,
+                refresh_callback=refresh_callback,
             )
 
-    def make_request(self, url, data=None, method=None, **kwargs):
+    @classmethod
+    def from_token_store(
+        cls, token_store, client_id=None, client_secret=None, **kwargs
+    ):
+        """Loads a MonzoOAuth2Client object whose token is kept in a token store.
+           Refreshed tokens are saved back to the store.
+
+           :param token_store: A monzo.tokenstore.TokenStore holding the token
+           :param client_id: Client id string, if it is not kept with the token
+           :param client_secret: Client secret string, if it is not kept with the token
+           :rtype: MonzoOAuth2Client object using the stored token
+        """
+        token = token_store.load() or {}
+        return cls(
+            client_id or token.get(CLIENT_ID),
+            client_secret or token.get(CLIENT_SECRET),
+            token_store=token_store,
+            **kwargs,
+        )
+
+    def make_request(self, url, data=None, method=None, idempotent=False, **kwargs):
         """
         Builds and makes the OAuth2 Request, catches errors
         https://docs.monzo.com/#errors
+
+        Set `idempotent` for writes which are safe to replay (e.g. because they
+        carry a `dedupe_id`) to retry them according to `write_retry`.
         """
         if self.timeout is not None and "timeout" not in kwargs:
             kwargs["timeout"] = self.timeout
@@ -127,16 +312,169 @@ class MonzoOAuth2Client(object):
         data = data or {}
         method = method or ("POST" if data else "GET")
 
-        try:
-            response = self.validate_response(
-                self.session.request(method, url, data=data, **kwargs)
+        if method == "GET" and self.coalescer is not None:
+            return self.coalescer.call(
+                url,
+                kwargs.get("params"),
+                partial(self._make_request, url, data, method, **kwargs),
             )
+        if idempotent and method != "GET" and self.write_retry is not None:
+            endpoint = endpoint_template(url)
+            return self.write_retry.call(
+                partial(self._make_request, url, data, method, **kwargs),
+                method=method,
+                endpoint=endpoint,
+                key=data.get("dedupe_id"),
+                on_retry=partial(self._emit, "request_retried", method, endpoint),
+            )
+        return self._make_request(url, data, method, **kwargs)
 
-        except (UnauthorizedError, TokenExpiredError) as e:
-            self.refresh_token()
-            response = self.make_request(url, data=data, method=method, **kwargs)
+    def _make_request(self, url, data, method, **kwargs):
+        if self.cache is not None:
+            return self._make_cached_request(url, data, method, **kwargs)
+        return self._send(method, url, data, **kwargs)[1]
 
-        return response
+    def stream_request(self, url, key, **kwargs):
+        """
+        Makes a GET request to a list endpoint and incrementally decodes the
+        array under `key` in its response, yielding items as they arrive.
+        Streamed requests bypass the response cache and coalescing.
+
+            :param url: The url of the list endpoint.
+            :param key: The top level key of the array, e.g. "transactions".
+            :rtype: A generator of the decoded items.
+        """
+        if self.timeout is not None and "timeout" not in kwargs:
+            kwargs["timeout"] = self.timeout
+
+        response, _ = self._send("GET", url, {}, stream=True, **kwargs)
+        try:
+            for item in iter_json_array(response.iter_content(CHUNK_SIZE), key):
+                yield item
+        finally:
+            response.close()
+
+    def _make_cached_request(self, url, data, method, **kwargs):
+        """Answers GET requests from the response cache where possible, and
+        invalidates cached responses made stale by any other request.
+        """
+        if method != "GET":
+            try:
+                return self._send(method, url, data, **kwargs)[1]
+            finally:
+                self.cache.invalidate(url)
+
+        params = kwargs.get("params")
+        cached, etag = self.cache.lookup(url, params)
+        if cached is not None:
+            return cached
+
+        headers = kwargs.get("headers")
+        if etag is not None:
+            kwargs["headers"] = dict(headers or {}, **{"If-None-Match": etag})
+        response, json_response = self._send(method, url, data, **kwargs)
+        if response.status_code == 304:
+            cached = self.cache.revalidate(url, params)
+            if cached is not None:
+                return cached
+            kwargs["headers"] = headers
+            response, json_response = self._send(method, url, data, **kwargs)
+        return self.cache.store(
+            url, params, json_response, response.headers.get("ETag")
+        )
+
+    def _send(self, method, url, data, **kwargs):
+        """Sends a request, refreshing the token and retrying rate limited
+        requests as needed.
+
+            :rtype: A Tuple of the response and its validated, decoded body
+                    (None for a 304 Not Modified response, or a successful
+                    `stream=True` request whose body is left unread).
+        """
+        from oauthlib.oauth2 import TokenExpiredError
+
+        endpoint = endpoint_template(url) if self.hooks else None
+        attempt = refreshes = 0
+        while True:
+            self._refresh_token_if_expiring()
+            access_token = self.session.access_token
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            self._emit("request_started", method, endpoint)
+            started, status_code = time.perf_counter(), None
+            try:
+                response = self.session.request(method, url, data=data, **kwargs)
+                status_code = response.status_code
+                json_response = None
+                streamed = kwargs.get("stream") and response.status_code == 200
+                if response.status_code != 304 and not streamed:
+                    json_response = self.validate_response(response)
+
+            except (UnauthorizedError, TokenExpiredError) as e:
+                self._emit_finished(method, endpoint, status_code, started, e)
+                if refreshes >= self.max_refresh_attempts:
+                    raise
+                refreshes += 1
+                self._emit("request_retried", method, endpoint, refreshes, e)
+                self._refresh_token_once(access_token)
+                continue
+
+            except TooManyRequestsError as e:
+                self._emit_finished(method, endpoint, status_code, started, e)
+                if self.rate_limiter is not None:
+                    self.rate_limiter.throttle()
+                if attempt >= self.rate_limit_retries:
+                    raise
+                time.sleep(backoff_delay(attempt, retry_after=e.retry_after))
+                attempt += 1
+                self._emit("request_retried", method, endpoint, attempt, e)
+                continue
+
+            except Exception as e:
+                self._emit_finished(method, endpoint, status_code, started, e)
+                raise
+
+            self._emit_finished(method, endpoint, status_code, started)
+            if self.rate_limiter is not None:
+                self.rate_limiter.relax()
+            return response, json_response
+
+    def _emit(self, event, *args):
+        """Calls the method named `event` on every instrumentation hook."""
+        for hook in self.hooks:
+            getattr(hook, event)(*args)
+
+    def _emit_finished(self, method, endpoint, status_code, started, error=None):
+        if self.hooks:
+            duration = time.perf_counter() - started
+            self._emit(
+                "request_finished", method, endpoint, status_code, duration, error
+            )
+
+    def _refresh_token_once(self, stale_access_token):
+        """Refreshes the token, unless another thread already replaced
+        `stale_access_token` while this one waited for the lock, so that
+        concurrent callers share a single refresh.
+        """
+        with self._refresh_lock:
+            if self.session.access_token != stale_access_token:
+                return
+            if self.token_store is None:
+                self.refresh_token()
+                return
+            with self.token_store.lock():
+                # Another process sharing the store may have refreshed already
+                stored = self.token_store.load() or {}
+                if stored.get(ACCESS_TOKEN) not in (None, stale_access_token):
+                    self.session.token = stored
+                else:
+                    self.refresh_token()
+
+    def _refresh_token_if_expiring(self):
+        """Proactively refreshes a token which expires within `refresh_margin`."""
+        token = self.session.token
+        if is_expiring(token, self.refresh_margin):
+            self._refresh_token_once(token.get(ACCESS_TOKEN))
 
     def authorize_token_url(self, redirect_uri=None, **kwargs):
         """Step 1: Return the URL the user needs to go to in order to grant us
@@ -184,10 +522,14 @@ class MonzoOAuth2Client(object):
 
             :rtype: A Dictionary representation of the authentication token.
         """
+        from requests.auth import HTTPBasicAuth
+
+        started = time.perf_counter()
         token = self.session.refresh_token(
-            MonzoOAuth2Client._refresh_token_url,
+            self._refresh_token_url,
             auth=HTTPBasicAuth(self.client_id, self.client_secret),
         )
+        self._emit("token_refreshed", time.perf_counter() - started)
 
         token.update({CLIENT_SECRET: self.client_secret})
 
@@ -203,24 +545,7 @@ class MonzoOAuth2Client(object):
            :param response: The response to validate
            :rtype: A Dictionary representation of the response, if no errors occured.
         """
-        json_response = response.json()
+        json_response = codec.loads(response.content)
         if response.status_code == 200:
             return json_response
-        if response.status_code == 400:
-            raise BadRequestError(json_response["message"])
-        if response.status_code == 401:
-            raise UnauthorizedError(json_response["message"])
-        if response.status_code == 403:
-            raise ForbiddenError(json_response["message"])
-        if response.status_code == 404:
-            raise PageNotFoundError(json_response["message"])
-        if response.status_code == 405:
-            raise MethodNotAllowedError(json_response["message"])
-        if response.status_code == 406:
-            raise NotAcceptibleError(json_response["message"])
-        if response.status_code == 429:
-            raise TooManyRequestsError(json_response["message"])
-        if response.status_code == 500:
-            raise InternalServerError(json_response["message"])
-        if response.status_code == 504:
-            raise GatewayTimeoutError(json_response["message"])
+        raise_for_status(response.status_code, json_response, response.headers)
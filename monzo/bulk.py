@@ -0,0 +1,43 @@
+"""Helpers to fan a call out over many items concurrently.
+
+This module contains `run_concurrently`, which `Monzo`'s bulk endpoints use to
+issue one request per item on a bounded thread pool, collecting a
+`BulkResult` for every item instead of stopping at the first failure.
+"""
+
+from collections import namedtuple
+
+DEFAULT_CONCURRENCY = 8  #: (int): The default number of requests kept in flight.
+
+BulkResult = namedtuple("BulkResult", ["item", "result", "error"])
+BulkResult.__doc__ = """The outcome of one call made by `run_concurrently`.
+
+   :param item: The item the call was made for.
+   :param result: The value returned by the call, or None if it failed.
+   :param error: The exception raised by the call, or None if it succeeded.
+"""
+
+
+def run_concurrently(function, items, concurrency=DEFAULT_CONCURRENCY):
+    """Calls `function` once per item with at most `concurrency` calls in flight.
+
+       :param function: A callable taking a single item.
+       :param items: An iterable of items.
+       :param concurrency: The maximum number of calls made at the same time.
+       :rtype: A list of BulkResult, in the same order as `items`.
+    """
+
+    def call(item):
+        try:
+            return BulkResult(item, function(item), None)
+        except Exception as error:
+            return BulkResult(item, None, error)
+
+    items = list(items)
+    if concurrency <= 1 or len(items) <= 1:
+        return [call(item) for item in items]
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(items))) as executor:
+        return list(executor.map(call, items))
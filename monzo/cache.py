@@ -0,0 +1,136 @@
+"""An opt-in cache for responses from read endpoints of the Monzo API.
+
+This module contains the class `ResponseCache`, which `MonzoOAuth2Client`
+consults for GET requests when constructed with `cache=...`. Entries expire
+after a per-endpoint TTL, are evicted least recently used first, are
+revalidated with `If-None-Match` when the server sent an `ETag`, and are
+invalidated when the client writes to a related resource.
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from monzo.utils import endpoint_path
+
+DEFAULT_TTLS = {
+    "/ping/whoami": 300,
+    "/accounts": 300,
+    "/pots": 30,
+    "/webhooks": 300,
+}  #: (dict): Seconds a response stays fresh, by endpoint path. Others are not cached.
+
+INVALIDATES = {
+    "pots": ("pots", "balance", "transactions"),
+    "transactions": ("transactions", "balance"),
+    "attachment": ("transactions",),
+    "webhooks": ("webhooks",),
+}  #: (dict): The resources whose cached responses a write to a resource makes stale.
+
+CacheEntry = namedtuple("CacheEntry", ["response", "etag", "expires_at"])
+
+
+class ResponseCache(object):
+    """A thread-safe LRU cache of decoded GET responses.
+
+       :param ttls: Seconds a response stays fresh, by endpoint path (Defaults to DEFAULT_TTLS)
+       :param default_ttl: Seconds a response from any other endpoint stays fresh (Default 0, not cached)
+       :param max_size: The maximum number of responses kept.
+    """
+
+    def __init__(self, ttls=None, default_ttl=0, max_size=256):
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def ttl(self, path):
+        """The number of seconds a response from `path` stays fresh."""
+        return self.ttls.get(path, self.default_ttl)
+
+    @staticmethod
+    def key(url, params=None):
+        """Builds the cache key of a request from its url and query parameters."""
+        params = tuple(
+            sorted(
+                (name, str(value))
+                for name, value in (params or {}).items()
+                if value is not None
+            )
+        )
+        return endpoint_path(url), params
+
+    def lookup(self, url, params=None):
+        """Looks up a cached response.
+
+           :rtype: A `(response, etag)` tuple. `response` is a copy of the cached
+                   response if it is still fresh, otherwise None; `etag` is the
+                   ETag to revalidate a stale response with, if there is one.
+        """
+        key = self.key(url, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, None
+            self._entries.move_to_end(key)
+            if entry.expires_at > time.monotonic():
+                self.hits += 1
+                return copy.deepcopy(entry.response), None
+            self.misses += 1
+            if entry.etag is None:
+                del self._entries[key]
+            return None, entry.etag
+
+    def store(self, url, params, response, etag=None):
+        """Caches a response if its endpoint has a TTL.
+
+           :rtype: A copy of `response`, safe for the caller to modify.
+        """
+        key = self.key(url, params)
+        ttl = self.ttl(key[0])
+        if ttl > 0:
+            with self._lock:
+                self._entries[key] = CacheEntry(
+                    copy.deepcopy(response), etag, time.monotonic() + ttl
+                )
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return response
+
+    def revalidate(self, url, params=None):
+        """Marks a cached response fresh again after the server answered 304.
+
+           :rtype: A copy of the cached response, or None if it has since been evicted.
+        """
+        key = self.key(url, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries[key] = entry._replace(
+                expires_at=time.monotonic() + self.ttl(key[0])
+            )
+            return copy.deepcopy(entry.response)
+
+    def invalidate(self, url):
+        """Drops every cached response made stale by a write to `url`."""
+        resource = endpoint_path(url).split("/")[1]
+        stale = INVALIDATES.get(resource, (resource,))
+        with self._lock:
+            for key in list(self._entries):
+                if key[0].split("/")[1] in stale:
+                    del self._entries[key]
+
+    def clear(self):
+        """Drops every cached response."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,205 @@
+"""Change detection for transactions which are updated after they are created.
+
+This module contains the class `ChangeTracker`, which keeps a content hash of
+every transaction in a `monzo.store.TransactionStore` in a table alongside it.
+`sync()` re-fetches only a recent window - the last `window` of transactions,
+back to the oldest one still pending settlement - compares what comes back
+against the hashes, and writes just the transactions which changed. Every
+upsert of the store (including webhook write-through) is classified as a
+`created`, `updated` or `settled` Change, which is passed to subscribers.
+
+    tracker = ChangeTracker(store, window=timedelta(days=3))
+    tracker.subscribe(print)
+    for change in tracker.sync(client, account_id):
+        ...
+
+Changes to transactions older than the window are not noticed by `sync()`;
+use `Monzo.backfill_transactions` and `store.upsert` to re-check those.
+"""
+
+import hashlib
+import json
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from monzo import codec
+from monzo.utils import format_timestamp, to_utc
+
+CREATED = "created"
+UPDATED = "updated"
+SETTLED = "settled"
+
+Change = namedtuple("Change", ["kind", "account_id", "transaction", "previous"])
+Change.__doc__ = """A transaction which was created, updated or settled.
+
+`previous` is the stored version it replaced, or None when it is new."""
+
+
+def content_hash(transaction):
+    """Hashes the content of a transaction, independent of the order of its keys.
+
+       :param transaction: A transaction object.
+       :rtype: A hex digest string.
+    """
+    content = json.dumps(
+        transaction, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+    )
+    return hashlib.sha1(content.encode()).hexdigest()
+
+
+def is_pending(transaction):
+    """Whether a transaction may still settle: it is neither settled nor declined.
+
+       :param transaction: A transaction object.
+       :rtype: A boolean.
+    """
+    return not transaction.get("settled") and not transaction.get("decline_reason")
+
+
+class ChangeTracker(object):
+    """Tracks changes to the transactions of a store.
+
+       :param store: The monzo.store.TransactionStore to track.
+       :param window: A timedelta of how far back `sync()` always re-checks.
+       :param pending_window: A timedelta of how far back `sync()` re-checks pending
+                              transactions, until they settle (None to not re-check them).
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS transaction_hashes (
+            id TEXT PRIMARY KEY,
+            account_id TEXT NOT NULL,
+            created TEXT NOT NULL,
+            pending INTEGER NOT NULL,
+            hash TEXT NOT NULL
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS transaction_hashes_pending
+            ON transaction_hashes (account_id, pending, created);
+    """
+
+    def __init__(
+        self, store, window=timedelta(days=2), pending_window=timedelta(days=30)
+    ):
+        self.store = store
+        self.window = window
+        self.pending_window = pending_window
+        self.subscribers = []
+        self._changes = []
+        with store.lock, store.connection:
+            exists = store.connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'transaction_hashes'"
+            ).fetchone()
+            store.connection.executescript(self.SCHEMA)
+            if not exists:
+                self._rebuild(store.connection)
+            store.subscribe(self._on_upsert)
+
+    def subscribe(self, subscriber):
+        """Registers a callable given every Change, inside the store's database
+           transaction which writes it.
+
+           :param subscriber: A callable taking a Change.
+        """
+        with self.store.lock:
+            self.subscribers.append(subscriber)
+
+    def _rebuild(self, connection):
+        connection.execute("DELETE FROM transaction_hashes")
+        rows = connection.execute("SELECT account_id, data FROM transactions")
+        connection.executemany(
+            "INSERT INTO transaction_hashes VALUES (?, ?, ?, ?, ?)",
+            [self._row(account_id, codec.loads(data)) for account_id, data in rows],
+        )
+
+    @staticmethod
+    def _row(account_id, transaction):
+        return (
+            transaction["id"],
+            account_id,
+            transaction["created"],
+            int(is_pending(transaction)),
+            content_hash(transaction),
+        )
+
+    def _on_upsert(self, connection, account_id, replaced, transactions):
+        rows, changes = [], []
+        for transaction in transactions:
+            row = self._row(account_id, transaction)
+            previous = replaced.get(transaction["id"])
+            rows.append(row)
+            if previous is None:
+                changes.append(Change(CREATED, account_id, transaction, None))
+            elif content_hash(previous) != row[4]:
+                settled = is_pending(previous) and transaction.get("settled")
+                kind = SETTLED if settled else UPDATED
+                changes.append(Change(kind, account_id, transaction, previous))
+        connection.executemany(
+            "INSERT OR REPLACE INTO transaction_hashes VALUES (?, ?, ?, ?, ?)", rows
+        )
+        for change in changes:
+            for subscriber in self.subscribers:
+                subscriber(change)
+        self._changes = changes
+
+    def _hashes(self, transaction_ids):
+        hashes = {}
+        for i in range(0, len(transaction_ids), 500):
+            chunk = transaction_ids[i : i + 500]
+            hashes.update(
+                self.store.connection.execute(
+                    "SELECT id, hash FROM transaction_hashes WHERE id IN ({0})".format(
+                        ", ".join("?" * len(chunk))
+                    ),
+                    chunk,
+                ).fetchall()
+            )
+        return hashes
+
+    def window_start(self, account_id, now=None):
+        """Gets the time `sync()` re-checks an account from: the start of the window,
+           the oldest pending transaction within `pending_window` or the newest stored
+           transaction, whichever is earliest.
+
+           :param account_id: The unique identifier for the account.
+           :param now: The current time as a datetime (Defaults to now)
+           :rtype: An RFC 3339 string, or None when nothing is stored yet.
+        """
+        now = to_utc(now or datetime.now(timezone.utc))
+        with self.store.lock:
+            newest = self.store.high_water_mark(account_id)
+            if newest is None:
+                return None
+            since = min(format_timestamp(now - self.window), newest[0])
+            if self.pending_window is not None:
+                pending = self.store.connection.execute(
+                    "SELECT MIN(created) FROM transaction_hashes "
+                    "WHERE account_id = ? AND pending = 1 AND created >= ?",
+                    (account_id, format_timestamp(now - self.pending_window)),
+                ).fetchone()[0]
+                if pending is not None:
+                    since = min(since, pending)
+        return since
+
+    def sync(self, client, account_id, now=None):
+        """Re-fetches the recent window of an account's transactions and writes those
+           which are new or changed to the store.
+
+           :param client: A Monzo client.
+           :param account_id: The unique identifier for the account to sync.
+           :param now: The current time as a datetime (Defaults to now)
+           :rtype: A list of Change, in the order the transactions were fetched.
+        """
+        since = self.window_start(account_id, now)
+        fetched = list(client.iter_transactions(account_id, since=since))
+        with self.store.lock:
+            hashes = self._hashes([transaction["id"] for transaction in fetched])
+            changed = [
+                transaction
+                for transaction in fetched
+                if hashes.get(transaction["id"]) != content_hash(transaction)
+            ]
+            if not changed:
+                return []
+            self.store.upsert(account_id, changed)
+            changes, self._changes = self._changes, []
+        return changes
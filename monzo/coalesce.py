@@ -0,0 +1,119 @@
+"""Coalescing of identical in-flight reads.
+
+This module contains the class `RequestCoalescer`, which `MonzoOAuth2Client`
+uses for GET requests when constructed with `coalesce=...`. While a GET
+request is in flight, identical requests (same url and query parameters)
+made by other threads wait for it and share its response instead of making
+their own HTTP call.
+"""
+
+import copy
+import threading
+
+from monzo.cache import ResponseCache
+from monzo.metrics import endpoint_template
+
+
+class _Call(object):
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = self.error = None
+        self.followers = 0
+
+
+class CoalesceStats(object):
+    """How many calls of one endpoint were made and how many reached the API."""
+
+    __slots__ = ("calls", "upstream")
+
+    def __init__(self):
+        self.calls = self.upstream = 0
+
+    @property
+    def saved(self):
+        """The number of calls answered by sharing another call's response."""
+        return self.calls - self.upstream
+
+    def to_dict(self):
+        return {"calls": self.calls, "upstream": self.upstream, "saved": self.saved}
+
+
+class RequestCoalescer(object):
+    """Shares the response of an in-flight GET request with identical requests
+       made while it is in flight. Only requests which overlap in time are
+       coalesced, so callers never see a response older than their call.
+
+       Statistics are kept per endpoint template, such as "/transactions/{id}".
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def call(self, url, params, function):
+        """Calls `function` to make a request, unless an identical request is
+           already in flight, in which case waits for and shares its result.
+
+           :param url: The url of the request.
+           :param params: The query parameters of the request.
+           :param function: A callable making the request and returning its decoded response.
+           :rtype: The decoded response. Callers sharing a response each get their own copy.
+        """
+        key = ResponseCache.key(url, params)
+        with self._lock:
+            stats = self._stats.setdefault(endpoint_template(url), CoalesceStats())
+            stats.calls += 1
+            call = self._in_flight.get(key)
+            leader = call is None
+            if leader:
+                call = self._in_flight[key] = _Call()
+                stats.upstream += 1
+            else:
+                call.followers += 1
+
+        if leader:
+            try:
+                call.result = function()
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._in_flight[key]
+                call.done.set()
+            # Once it is out of `_in_flight` no more followers can join. If any
+            # did, `call.result` stays untouched for them to copy, since callers
+            # may add to the response (e.g. `next_page`) after it is returned.
+            if call.followers:
+                return copy.deepcopy(call.result)
+            return call.result
+
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result)
+
+    @property
+    def saved(self):
+        """The total number of calls answered by sharing another call's response."""
+        with self._lock:
+            return sum(stats.saved for stats in self._stats.values())
+
+    def stats(self):
+        """Gets the calls made, calls which reached the API and calls saved by endpoint.
+
+           :rtype: A Dictionary of `{"calls", "upstream", "saved"}` dictionaries by endpoint.
+        """
+        with self._lock:
+            return {
+                endpoint: stats.to_dict()
+                for endpoint, stats in sorted(self._stats.items())
+            }
+
+    def reset_stats(self):
+        """Discards the statistics collected so far."""
+        with self._lock:
+            self._stats = {}
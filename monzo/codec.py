@@ -0,0 +1,143 @@
+"""A pluggable JSON codec.
+
+Every JSON body and file the package decodes or encodes goes through `loads`
+and `dumps` in this module. They use the fastest backend installed, in order
+of preference orjson, ujson and finally the standard library's json, which is
+always available. The backend is picked (and imported) on first use.
+Install the optional extra with `pip install monzo[fast]` to get orjson, or
+pick a backend explicitly with `set_backend`.
+"""
+
+import json
+
+
+class Backend(object):
+    """A JSON backend built on the standard library."""
+
+    name = "json"
+
+    def loads(self, data):
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return json.loads(data)
+
+    def dumps(self, obj, pretty=False):
+        if pretty:
+            return json.dumps(obj, sort_keys=True, indent=4)
+        return json.dumps(obj, separators=(",", ":"))
+
+
+class OrjsonBackend(Backend):
+    """A JSON backend built on orjson."""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self.orjson = orjson
+
+    def loads(self, data):
+        return self.orjson.loads(data)
+
+    def dumps(self, obj, pretty=False):
+        # Like the standard library, accept non-string keys such as status codes
+        option = self.orjson.OPT_NON_STR_KEYS
+        if pretty:
+            option |= self.orjson.OPT_SORT_KEYS | self.orjson.OPT_INDENT_2
+        return self.orjson.dumps(obj, option=option).decode("utf-8")
+
+
+class UjsonBackend(Backend):
+    """A JSON backend built on ujson."""
+
+    name = "ujson"
+
+    def __init__(self):
+        import ujson
+
+        self.ujson = ujson
+
+    def loads(self, data):
+        return self.ujson.loads(data)
+
+    def dumps(self, obj, pretty=False):
+        if pretty:
+            return self.ujson.dumps(obj, sort_keys=True, indent=4)
+        return self.ujson.dumps(obj)
+
+
+BACKENDS = {
+    "orjson": OrjsonBackend,
+    "ujson": UjsonBackend,
+    "json": Backend,
+}  #: (dict): The backends by name, in order of preference.
+
+
+def available_backends():
+    """Lists the names of the backends which can be used, in order of preference.
+
+       :rtype: A list of backend names.
+    """
+    names = []
+    for name, backend in BACKENDS.items():
+        try:
+            backend()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+
+def set_backend(name=None):
+    """Selects the backend used by `loads` and `dumps`.
+
+       :param name: "orjson", "ujson" or "json", or None for the fastest installed.
+       :rtype: The selected Backend.
+    """
+    global _backend
+    if name is None:
+        for backend in BACKENDS.values():
+            try:
+                _backend = backend()
+            except ImportError:
+                continue
+            return _backend
+    if name not in BACKENDS:
+        raise ValueError(
+            "Unknown JSON backend {0!r}, expected one of {1}".format(
+                name, ", ".join(BACKENDS)
+            )
+        )
+    _backend = BACKENDS[name]()
+    return _backend
+
+
+def get_backend():
+    """Gets the backend used by `loads` and `dumps`.
+
+       :rtype: A Backend
+    """
+    return _backend or set_backend()
+
+
+def loads(data):
+    """Decodes JSON.
+
+       :param data: A JSON document as bytes or str.
+       :rtype: The decoded object.
+    """
+    return (_backend or set_backend()).loads(data)
+
+
+def dumps(obj, pretty=False):
+    """Encodes an object as JSON.
+
+       :param obj: The object to encode.
+       :param pretty: Indent the output and sort keys, for files read by people.
+       :rtype: A str
+    """
+    return (_backend or set_backend()).dumps(obj, pretty)
+
+
+_backend = None
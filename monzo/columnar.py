@@ -0,0 +1,100 @@
+"""Columnar export of transactions to NumPy arrays.
+
+This module contains `to_columns`, which turns an iterable of transactions
+(dictionaries or monzo.models.Transaction objects) into one array per field,
+so that sums, group-bys and time bucketing can run vectorised. Amounts are
+int64 arrays, timestamps datetime64[ms] arrays and low-cardinality strings are
+dictionary-encoded, which maps directly onto Arrow dictionary arrays
+(`pyarrow.DictionaryArray.from_arrays(column.codes, column.categories)`).
+
+This module requires the optional `numpy` dependency
+(`pip install monzo[columnar]`).
+"""
+
+from collections import namedtuple
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover - exercised only without the extra
+    numpy = None
+
+from monzo.models import Model
+
+INTEGER_FIELDS = ("amount", "account_balance")
+TIMESTAMP_FIELDS = ("created", "settled")
+DICTIONARY_FIELDS = ("currency", "category", "merchant")
+
+
+class DictionaryColumn(namedtuple("DictionaryColumn", ["codes", "categories"])):
+    """A dictionary-encoded column: an int32 array of `codes` indexing into an
+       array of distinct `categories`. Missing values have the code -1.
+    """
+
+    __slots__ = ()
+
+    def decode(self):
+        """Expands the column back into an object array of values.
+
+           :rtype: A numpy array of the original values (None where missing).
+        """
+        values = numpy.append(self.categories, None)
+        return values[self.codes]
+
+
+def _field(transaction, name):
+    if isinstance(transaction, Model):
+        if name in TIMESTAMP_FIELDS:
+            return getattr(transaction, "_" + name)
+        value = getattr(transaction, name)
+    else:
+        value = transaction.get(name)
+    if name == "merchant" and value is not None and not isinstance(value, str):
+        value = value["id"] if isinstance(value, dict) else value.id
+    return value
+
+
+def to_columns(transactions):
+    """Converts transactions into a dictionary of NumPy columns.
+
+       :param transactions: An iterable of transaction dictionaries or Transaction models.
+       :rtype: A dictionary mapping "id" to an object array, "amount" and
+               "account_balance" to int64 arrays, "created" and "settled" to
+               datetime64[ms] arrays (NaT where missing) and "currency",
+               "category" and "merchant" (the merchant id) to DictionaryColumns.
+    """
+    if numpy is None:
+        raise ImportError("to_columns requires numpy: pip install monzo[columnar]")
+
+    ids = []
+    integers = {name: [] for name in INTEGER_FIELDS}
+    timestamps = {name: [] for name in TIMESTAMP_FIELDS}
+    codes = {name: [] for name in DICTIONARY_FIELDS}
+    dictionaries = {name: {} for name in DICTIONARY_FIELDS}
+
+    for transaction in transactions:
+        ids.append(_field(transaction, "id"))
+        for name in INTEGER_FIELDS:
+            integers[name].append(_field(transaction, name) or 0)
+        for name in TIMESTAMP_FIELDS:
+            value = _field(transaction, name)
+            timestamps[name].append(value.rstrip("Z") if value else "NaT")
+        for name in DICTIONARY_FIELDS:
+            value = _field(transaction, name)
+            if value is None:
+                codes[name].append(-1)
+            else:
+                codes[name].append(
+                    dictionaries[name].setdefault(value, len(dictionaries[name]))
+                )
+
+    columns = {"id": numpy.array(ids, dtype=object)}
+    for name in INTEGER_FIELDS:
+        columns[name] = numpy.array(integers[name], dtype=numpy.int64)
+    for name in TIMESTAMP_FIELDS:
+        columns[name] = numpy.array(timestamps[name], dtype="datetime64[ms]")
+    for name in DICTIONARY_FIELDS:
+        columns[name] = DictionaryColumn(
+            numpy.array(codes[name], dtype=numpy.int32),
+            numpy.array(list(dictionaries[name]), dtype=object),
+        )
+    return columns
@@ -4,4 +4,7 @@ ACCESS_TOKEN = "access_token"
 REFRESH_TOKEN = "refresh_token"
 EXPIRES_AT = "expires_at"
 
+AUTHORIZE_ENDPOINT = "https://auth.monzo.com"
+
 MONZO_CACHE_FILE = "monzo.json"
+MONZO_STORE_FILE = "monzo.sqlite3"
@@ -33,6 +33,10 @@ class TooManyRequestsError(Exception):
     """An error to be raised when an application is exceeding its rate limit.
     Back off, buddy. :p"""
 
+    def __init__(self, message=None, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
 
 class InternalServerError(Exception):
     """An error with Monzo's servers."""
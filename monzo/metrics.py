@@ -0,0 +1,257 @@
+"""Instrumentation hooks for requests made by `MonzoOAuth2Client`.
+
+This module contains the class `Hooks`, whose methods the client calls as
+requests start, finish (successfully or not) and are retried and as tokens
+are refreshed, and `MetricsCollector`, a built-in implementation keeping
+per-endpoint latency histograms and counters in process. Pass hooks with
+`MonzoOAuth2Client(hooks=[...])` (or `Monzo(access_token, hooks=[...])`).
+"""
+
+import bisect
+import re
+import threading
+
+from monzo import codec
+from monzo.utils import endpoint_path
+
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)  #: (tuple): Upper bounds in seconds of the latency histogram buckets.
+
+_ID_SEGMENT = re.compile(r"^[a-z]+_[0-9A-Za-z]+$")
+
+
+def endpoint_template(url):
+    """Reduces a url to its endpoint, replacing Monzo object ids with "{id}",
+       e.g. "https://api.monzo.com//pots/pot_0000/deposit" becomes "/pots/{id}/deposit".
+    """
+    return "/".join(
+        "{id}" if _ID_SEGMENT.match(segment) else segment
+        for segment in endpoint_path(url).split("/")
+    )
+
+
+class Hooks(object):
+    """The base class of instrumentation hooks. Every method does nothing, so
+       subclasses only override the events they are interested in.
+
+       `endpoint` arguments are endpoint templates such as "/pots/{id}/deposit".
+    """
+
+    def request_started(self, method, endpoint):
+        """Called before an HTTP request is sent."""
+
+    def request_finished(self, method, endpoint, status_code, duration, error=None):
+        """Called once per HTTP request sent, after its response is received and
+           validated or it fails.
+
+           :param status_code: The HTTP status code, or None if no response was received.
+           :param duration: Seconds between sending the request and it finishing.
+           :param error: The error raised for the request, if any - either one from
+                         `monzo.errors` for an unsuccessful status code, or a transport error.
+        """
+
+    def request_retried(self, method, endpoint, attempt, error):
+        """Called before a request is retried after `error`.
+
+           :param attempt: The number of the retry, starting at 1.
+        """
+
+    def token_refreshed(self, duration):
+        """Called after the access token is refreshed.
+
+           :param duration: Seconds the refresh took.
+        """
+
+
+class Histogram(object):
+    """A fixed-bucket histogram of observed values."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Estimates a quantile as the upper bound of the bucket containing it.
+
+           :rtype: The bound in seconds, infinity if it lies beyond the last bucket,
+                   or None if nothing has been observed.
+        """
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(
+                zip([str(b) for b in self.buckets] + ["+Inf"], self.counts)
+            ),
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+        }
+
+
+class EndpointMetrics(object):
+    """The latency histogram and counters of one endpoint."""
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.statuses = {}
+        self.errors = {}
+        self.retries = 0
+
+    def to_dict(self):
+        return {
+            "requests": self.latency.count,
+            "statuses": dict(self.statuses),
+            "errors": dict(self.errors),
+            "retries": self.retries,
+            "latency": self.latency.to_dict(),
+        }
+
+
+class MetricsCollector(Hooks):
+    """Thread-safe in-process collector of per-endpoint latency histograms,
+       status code, error and retry counters, and token refresh statistics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Discards everything collected so far."""
+        with self._lock:
+            self.endpoints = {}
+            self.in_flight = 0
+            self.refreshes = Histogram()
+
+    def _endpoint(self, method, endpoint):
+        key = "{0} {1}".format(method, endpoint)
+        if key not in self.endpoints:
+            self.endpoints[key] = EndpointMetrics()
+        return self.endpoints[key]
+
+    def request_started(self, method, endpoint):
+        with self._lock:
+            self.in_flight += 1
+
+    def request_finished(self, method, endpoint, status_code, duration, error=None):
+        with self._lock:
+            self.in_flight -= 1
+            metrics = self._endpoint(method, endpoint)
+            metrics.latency.observe(duration)
+            if status_code is not None:
+                metrics.statuses[status_code] = metrics.statuses.get(status_code, 0) + 1
+            if error is not None:
+                name = type(error).__name__
+                metrics.errors[name] = metrics.errors.get(name, 0) + 1
+
+    def request_retried(self, method, endpoint, attempt, error):
+        with self._lock:
+            self._endpoint(method, endpoint).retries += 1
+
+    def token_refreshed(self, duration):
+        with self._lock:
+            self.refreshes.observe(duration)
+
+    def snapshot(self):
+        """Takes a snapshot of everything collected so far.
+
+           :rtype: A Dictionary of plain values, safe to serialise.
+        """
+        with self._lock:
+            return {
+                "endpoints": {
+                    key: metrics.to_dict()
+                    for key, metrics in sorted(self.endpoints.items())
+                },
+                "in_flight": self.in_flight,
+                "token_refreshes": self.refreshes.to_dict(),
+            }
+
+    def dump(self, fp=None):
+        """Serialises a snapshot as JSON.
+
+           :param fp: An optional file object to write the JSON to.
+           :rtype: The JSON string.
+        """
+        dumped = codec.dumps(self.snapshot(), pretty=True)
+        if fp is not None:
+            fp.write(dumped)
+        return dumped
+
+    def prometheus(self):
+        """Exports the collected metrics in the Prometheus text exposition format.
+
+           :rtype: A string.
+        """
+        snapshot = self.snapshot()
+        lines = []
+        for key, metrics in snapshot["endpoints"].items():
+            method, endpoint = key.split(" ", 1)
+            labels = 'method="{0}",endpoint="{1}"'.format(method, endpoint)
+            cumulative = 0
+            for bound, count in metrics["latency"]["buckets"].items():
+                cumulative += count
+                lines.append(
+                    'monzo_request_duration_seconds_bucket{{{0},le="{1}"}} {2}'.format(
+                        labels, bound, cumulative
+                    )
+                )
+            lines.append(
+                "monzo_request_duration_seconds_sum{{{0}}} {1}".format(
+                    labels, metrics["latency"]["sum"]
+                )
+            )
+            lines.append(
+                "monzo_request_duration_seconds_count{{{0}}} {1}".format(
+                    labels, metrics["latency"]["count"]
+                )
+            )
+            for status, count in sorted(metrics["statuses"].items()):
+                lines.append(
+                    'monzo_responses_total{{{0},status="{1}"}} {2}'.format(
+                        labels, status, count
+                    )
+                )
+            for error, count in sorted(metrics["errors"].items()):
+                lines.append(
+                    'monzo_errors_total{{{0},error="{1}"}} {2}'.format(
+                        labels, error, count
+                    )
+                )
+            lines.append(
+                "monzo_retries_total{{{0}}} {1}".format(labels, metrics["retries"])
+            )
+        lines.append(
+            "monzo_token_refreshes_total {0}".format(
+                snapshot["token_refreshes"]["count"]
+            )
+        )
+        return "\n".join(lines) + "\n"
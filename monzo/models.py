@@ -0,0 +1,228 @@
+"""Compact models for Monzo API payloads.
+
+The endpoints of `monzo.monzo.Monzo` return decoded JSON dictionaries. The
+classes in this module are an optional, memory-friendly alternative for
+holding many objects at once: they use `__slots__` rather than a per-instance
+`__dict__`, intern strings which repeat across objects (currencies,
+categories, account and merchant ids) and only parse timestamps when they
+are first accessed.
+
+Fields which are not listed in a model's `__slots__` are dropped.
+"""
+
+import sys
+from datetime import datetime
+
+
+def _intern(value):
+    """Interns a string so repeated values share one object."""
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
+def parse_timestamp(value):
+    """Parses an RFC 3339 timestamp from the Monzo API into an aware datetime.
+
+       :param value: A string such as "2015-08-22T12:20:18Z", or None/"".
+       :rtype: A datetime, or None if `value` is empty.
+    """
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _timestamp(name):
+    """Builds a property which parses the raw `_<name>` slot on first access and
+       keeps the result in the `_<name>_at` slot."""
+    raw, parsed = "_" + name, "_" + name + "_at"
+
+    def getter(self):
+        value = getattr(self, parsed)
+        if value is None and getattr(self, raw):
+            value = parse_timestamp(getattr(self, raw))
+            setattr(self, parsed, value)
+        return value
+
+    return property(getter, doc="The `{0}` timestamp as a datetime.".format(name))
+
+
+class Model(object):
+    """The base class of all models. Subclasses list their fields in `FIELDS`;
+       fields named in `TIMESTAMPS` are stored raw and parsed lazily, and fields
+       named in `INTERNED` are interned."""
+
+    __slots__ = ()
+    FIELDS = ()
+    TIMESTAMPS = ()
+    INTERNED = ()
+
+    def __init__(self, **fields):
+        for name in self.FIELDS:
+            value = fields.get(name)
+            if name in self.INTERNED:
+                value = _intern(value)
+            if name in self.TIMESTAMPS:
+                setattr(self, "_" + name, value)
+                setattr(self, "_" + name + "_at", None)
+            else:
+                setattr(self, name, value)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Builds a model from a decoded API dictionary.
+
+           :param data: The dictionary returned by the API.
+           :rtype: A new model object.
+        """
+        return cls(**data)
+
+    def to_dict(self):
+        """Converts the model back to a dictionary shaped like the API's.
+
+           :rtype: A Dictionary representation of the model.
+        """
+        data = {}
+        for name in self.FIELDS:
+            if name in self.TIMESTAMPS:
+                data[name] = getattr(self, "_" + name)
+            else:
+                value = getattr(self, name)
+                data[name] = value.to_dict() if isinstance(value, Model) else value
+        return data
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return "{0}(id={1!r})".format(type(self).__name__, getattr(self, "id", None))
+
+
+def _slots(fields, timestamps):
+    slots = [name for name in fields if name not in timestamps]
+    for name in timestamps:
+        slots.extend(("_" + name, "_" + name + "_at"))
+    return tuple(slots)
+
+
+class Merchant(Model):
+    """A merchant, as expanded on transactions with `expand[]=merchant`."""
+
+    FIELDS = (
+        "id",
+        "group_id",
+        "name",
+        "category",
+        "logo",
+        "emoji",
+        "address",
+        "created",
+    )
+    TIMESTAMPS = ("created",)
+    INTERNED = ("id", "group_id", "name", "category", "logo", "emoji")
+    __slots__ = _slots(FIELDS, TIMESTAMPS)
+    created = _timestamp("created")
+
+
+class Transaction(Model):
+    """A transaction. (https://docs.monzo.com/#transactions)
+
+       `merchant` is a Merchant when the merchant was expanded, otherwise the
+       merchant id string (or None).
+    """
+
+    FIELDS = (
+        "id",
+        "account_id",
+        "amount",
+        "currency",
+        "local_amount",
+        "local_currency",
+        "account_balance",
+        "description",
+        "category",
+        "merchant",
+        "notes",
+        "metadata",
+        "attachments",
+        "is_load",
+        "decline_reason",
+        "created",
+        "settled",
+    )
+    TIMESTAMPS = ("created", "settled")
+    INTERNED = (
+        "account_id",
+        "currency",
+        "local_currency",
+        "description",
+        "category",
+        "merchant",
+        "decline_reason",
+    )
+    __slots__ = _slots(FIELDS, TIMESTAMPS)
+    created = _timestamp("created")
+    settled = _timestamp("settled")
+
+    @classmethod
+    def from_dict(cls, data, merchants=None):
+        """Builds a transaction from a decoded API dictionary.
+
+           :param data: The transaction dictionary returned by the API.
+           :param merchants: An optional dictionary of Merchant objects by id, used to
+                             share one Merchant between all transactions which reference it.
+           :rtype: A new Transaction object.
+        """
+        merchant = data.get("merchant")
+        if isinstance(merchant, dict):
+            if merchants is None:
+                merchant = Merchant.from_dict(merchant)
+            else:
+                if merchant["id"] not in merchants:
+                    merchants[merchant["id"]] = Merchant.from_dict(merchant)
+                merchant = merchants[merchant["id"]]
+        return cls(**dict(data, merchant=merchant))
+
+
+class Account(Model):
+    """An account. (https://docs.monzo.com/#accounts)"""
+
+    FIELDS = ("id", "description", "type", "currency", "closed", "created")
+    TIMESTAMPS = ("created",)
+    INTERNED = ("id", "type", "currency")
+    __slots__ = _slots(FIELDS, TIMESTAMPS)
+    created = _timestamp("created")
+
+
+class Pot(Model):
+    """A pot. (https://docs.monzo.com/#pots)"""
+
+    FIELDS = (
+        "id",
+        "name",
+        "style",
+        "type",
+        "balance",
+        "currency",
+        "deleted",
+        "created",
+        "updated",
+    )
+    TIMESTAMPS = ("created", "updated")
+    INTERNED = ("id", "style", "type", "currency")
+    __slots__ = _slots(FIELDS, TIMESTAMPS)
+    created = _timestamp("created")
+    updated = _timestamp("updated")
+
+
+class Balance(Model):
+    """The balance of an account. (https://docs.monzo.com/#balance)"""
+
+    FIELDS = ("balance", "total_balance", "currency", "spend_today")
+    INTERNED = ("currency",)
+    __slots__ = FIELDS
+
+    def __repr__(self):
+        return "Balance(balance={0!r}, currency={1!r})".format(
+            self.balance, self.currency
+        )
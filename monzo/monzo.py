@@ -5,11 +5,19 @@ HTTP calls to Monzo's API endpoints.
 """
 
 from monzo.auth import MonzoOAuth2Client
-from datetime import datetime
+from monzo.bulk import DEFAULT_CONCURRENCY, run_concurrently
+from monzo.models import Transaction
+from monzo.utils import (
+    generate_dedupe_id,
+    format_timestamp,
+    split_time_windows,
+    to_utc,
+)
+from datetime import datetime, timedelta, timezone
 from functools import partial
+from operator import itemgetter
 
-import string
-import random
+import threading
 
 
 class Monzo(object):
@@ -25,27 +33,31 @@ class Monzo(object):
        :param access_token: The access token to authorise API calls.
     """
 
-    API_URL = (
-        "https://api.monzo.com/"
-    )  #: (str): A representation of the current Monzo api url.
+    API_URL = "https://api.monzo.com/"  #: (str): A representation of the current Monzo api url.
 
-    def __init__(self, access_token):
+    def __init__(self, access_token, store=None, **kwargs):
         """Starts an OAuth session with just an access token
            This will fail once the token expires,
            for a longer-lived session use Monzo.from_oauth_session()
 
            :param access_token: A valid access token from https://developers.monzo.com/
+           :param store: An optional monzo.store.TransactionStore used by sync_transactions()
+           :param kwargs: Transport options passed on to MonzoOAuth2Client (e.g. `adapter`)
         """
-        self.oauth_session = MonzoOAuth2Client(None, None, access_token=access_token)
+        self.oauth_session = MonzoOAuth2Client(
+            None, None, access_token=access_token, **kwargs
+        )
+        self.store = store
 
     @classmethod
-    def from_oauth_session(cls, oauth):
+    def from_oauth_session(cls, oauth, store=None):
         """Inserts an existing MonzoOAuth2Client into this Monzo object
 
             :param oauth: The MonzoOAuth2Client to be used by the newly created Monzo object.
+            :param store: An optional monzo.store.TransactionStore used by sync_transactions()
             :rtype: A new Monzo object
         """
-        new_monzo = cls(None)
+        new_monzo = cls(None, store=store)
         new_monzo.oauth_session = oauth
         return new_monzo
 
@@ -88,10 +100,8 @@ class Monzo(object):
            :param limit: The maximum number of transactions to return (Max = 100)
            :rtype: A collection of transaction objects for specific user.
         """
-        if isinstance(before, datetime):
-            before = before.isoformat() + "Z"
-        if isinstance(since, datetime):
-            since = since.isoformat() + "Z"
+        before = format_timestamp(before)
+        since = format_timestamp(since)
         url = "{0}/transactions".format(self.API_URL)
         params = {
             "expand[]": "merchant",
@@ -101,7 +111,7 @@ class Monzo(object):
             "limit": limit,
         }
         response = self.oauth_session.make_request(url, params=params)
-        if any([before, since, limit]):
+        if any([before, since, limit]) and response["transactions"]:
             last_transaction_id = response["transactions"][-1]["id"]
             next_page = partial(
                 self.get_transactions,
@@ -114,6 +124,150 @@ class Monzo(object):
 
         return response
 
+    def iter_transactions(
+        self,
+        account_id,
+        since=None,
+        before=None,
+        page_size=100,
+        as_models=False,
+        stream=False,
+    ):
+        """Lazily iterate over all transactions of a given account, oldest first.
+
+           Pages of `page_size` transactions are fetched as the iterator is
+           consumed, following the `since` cursor from the last transaction of
+           each page, so only one page is held in memory at a time.
+
+           :param account_id: The unique identifier for the account which the transactions belong to.
+           :param since: A datetime or transaction id to start iterating from.
+           :param before: A datetime representing the time to stop iterating at.
+           :param page_size: The number of transactions to request per page, from 1 to 100.
+           :param as_models: Yield compact monzo.models.Transaction objects instead of dictionaries.
+           :param stream: Decode each page incrementally as it arrives, so only one
+                          transaction rather than one page is held in memory at a time.
+           :rtype: A generator of transaction objects.
+        """
+        if not 1 <= page_size <= 100:
+            raise ValueError("page_size must be between 1 and 100.")
+        merchants = {}
+        while True:
+            if stream:
+                transactions = self._stream_transactions(
+                    account_id, before=before, since=since, limit=page_size
+                )
+            else:
+                transactions = self.get_transactions(
+                    account_id, before=before, since=since, limit=page_size
+                )["transactions"]
+            count = 0
+            for transaction in transactions:
+                count += 1
+                since = transaction["id"]
+                if as_models:
+                    yield Transaction.from_dict(transaction, merchants)
+                else:
+                    yield transaction
+            if count < page_size:
+                return
+
+    def _stream_transactions(self, account_id, before=None, since=None, limit=None):
+        """Streams one page of transactions, see `get_transactions`.
+
+           :rtype: A generator of transaction objects.
+        """
+        url = "{0}/transactions".format(self.API_URL)
+        params = {
+            "expand[]": "merchant",
+            "account_id": account_id,
+            "before": format_timestamp(before),
+            "since": format_timestamp(since),
+            "limit": limit,
+        }
+        return self.oauth_session.stream_request(url, "transactions", params=params)
+
+    def backfill_transactions(
+        self,
+        account_id,
+        since,
+        before=None,
+        window=timedelta(days=30),
+        workers=4,
+        progress=None,
+    ):
+        """Fetch the full transaction history of an account in parallel.
+
+           `[since, before)` is split into windows of length `window` which are
+           paginated concurrently on a pool of `workers` threads. Transactions
+           are yielded sorted by `created`, with duplicates where two windows
+           meet removed by transaction id.
+
+           :param account_id: The unique identifier for the account which the transactions belong to.
+           :param since: A datetime representing the start of the history to fetch.
+           :param before: A datetime representing the end of the history to fetch (Defaults to now)
+           :param window: A timedelta giving the length of each time window.
+           :param workers: The maximum number of windows to fetch at the same time.
+           :param progress: Optional callable, called with `(completed, total)` windows as each one finishes.
+           :rtype: A generator of transaction objects.
+        """
+        # Windows are split in naive UTC, whatever the timezone of the bounds
+        before = to_utc(before or datetime.now(timezone.utc))
+        windows = split_time_windows(to_utc(since), before, window)
+        completed = [0]
+        lock = threading.Lock()
+
+        def fetch_window(bounds):
+            transactions = list(
+                self.iter_transactions(account_id, since=bounds[0], before=bounds[1])
+            )
+            transactions.sort(key=itemgetter("created"))
+            if progress is not None:
+                with lock:
+                    completed[0] += 1
+                    progress(completed[0], len(windows))
+            return transactions
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = [executor.submit(fetch_window, bounds) for bounds in windows]
+        try:
+            previous_ids = set()
+            for future in futures:
+                transactions = future.result()
+                for transaction in transactions:
+                    if transaction["id"] not in previous_ids:
+                        yield transaction
+                previous_ids = {transaction["id"] for transaction in transactions}
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def sync_transactions(self, account_id, store=None):
+        """Fetches transactions newer than the store's high-water mark and upserts them.
+
+           :param account_id: The unique identifier for the account to sync.
+           :param store: The monzo.store.TransactionStore to sync into (Defaults to `self.store`)
+           :rtype: The number of transactions written to the store.
+        """
+        store = store or self.store
+        if store is None:
+            raise ValueError("sync_transactions requires a TransactionStore.")
+
+        high_water_mark = store.high_water_mark(account_id)
+        since = high_water_mark[1] if high_water_mark else None
+
+        synced, batch = 0, []
+        for transaction in self.iter_transactions(account_id, since=since):
+            batch.append(transaction)
+            if len(batch) >= 100:
+                synced += store.upsert(account_id, batch)
+                batch = []
+        if batch:
+            synced += store.upsert(account_id, batch)
+        return synced
+
     def get_transaction(self, transaction_id):
         """Retrieve data for a specific transaction. (https://docs.monzo.com/#retrieve-transaction)
            :param transaction_id: The unique identifier for the transaction for which data should be retrieved for.
@@ -135,6 +289,15 @@ class Monzo(object):
         response = self.oauth_session.make_request(url, params=params)
         return response
 
+    def get_balances(self, account_ids, concurrency=DEFAULT_CONCURRENCY):
+        """Gets the balances of many accounts concurrently.
+
+           :param account_ids: An iterable of unique identifiers for the accounts.
+           :param concurrency: The maximum number of requests made at the same time.
+           :rtype: A list of monzo.bulk.BulkResult, one per account id.
+        """
+        return run_concurrently(self.get_balance, account_ids, concurrency)
+
     def get_webhooks(self, account_id):
         """Gets the webhooks of a given account. (https://monzo.com/docs/#list-webhooks)
 
@@ -168,15 +331,16 @@ class Monzo(object):
         response = self.oauth_session.make_request(url, method="DELETE")
         return response
 
-    def delete_all_webhooks(self, account_id):
+    def delete_all_webhooks(self, account_id, concurrency=DEFAULT_CONCURRENCY):
         """Removes all webhooks associated with the specified account, if it exists.
 
            :param account_id: The unique identifier for the account which all webhooks will be removed from.
-           :rtype: None
+           :param concurrency: The maximum number of deletions made at the same time.
+           :rtype: A list of monzo.bulk.BulkResult, one per webhook id.
         """
         webhooks = self.get_webhooks(account_id)
-        for webhook in webhooks["webhooks"]:
-            self.delete_webhook(webhook["id"])
+        webhook_ids = [webhook["id"] for webhook in webhooks["webhooks"]]
+        return run_concurrently(self.delete_webhook, webhook_ids, concurrency)
 
     def register_webhook(self, webhook_url, account_id):
         """Registers a webhook. (https://monzo.com/docs/#registering-a-webhook)
@@ -220,6 +384,15 @@ class Monzo(object):
         response = self.oauth_session.make_request(url, data=data)
         return response
 
+    def deregister_attachments(self, attachment_ids, concurrency=DEFAULT_CONCURRENCY):
+        """Removes many previously attached images concurrently.
+
+            :param attachment_ids: An iterable of unique identifiers for the attachments to deregister.
+            :param concurrency: The maximum number of deregistrations made at the same time.
+            :rtype: A list of monzo.bulk.BulkResult, one per attachment id.
+        """
+        return run_concurrently(self.deregister_attachment, attachment_ids, concurrency)
+
     def create_feed_item(self, account_id, feed_type, url, params):
         """Creates a feed item. (https://monzo.com/docs/#create-feed-item)
 
@@ -255,44 +428,50 @@ class Monzo(object):
         response = self.oauth_session.make_request(url)
         return response
 
-    def deposit_into_pot(self, pot_id, account_id, amount_in_pennies):
+    def deposit_into_pot(self, pot_id, account_id, amount_in_pennies, dedupe_id=None):
         """Move money from an account into a pot. (https://monzo.com/docs/#deposit-into-a-pot)
 
             :param pot_id: The unique identifier for the pot to deposit the money to.
             :param account_id: The unique identifier for the account to move the money from.
             :param amount_in_pennies: The amount of money to move to the pot in pennies.
+            :param dedupe_id: A key unique to this deposit, which makes retrying it safe.
+                              Reuse it when retrying the same deposit (Default: a new random key)
 
             :rtype: A dictionary containing information on the pot that was updated.
         """
         url = "{0}/pots/{1}/deposit".format(self.API_URL, pot_id)
-        unique_string = "".join(random.choice(string.ascii_letters) for i in range(15))
         data = {
             "source_account_id": account_id,
             "amount": amount_in_pennies,
-            "dedupe_id": unique_string,
+            "dedupe_id": dedupe_id or generate_dedupe_id(),
         }
 
-        response = self.oauth_session.make_request(url, data=data, method="PUT")
+        response = self.oauth_session.make_request(
+            url, data=data, method="PUT", idempotent=True
+        )
         return response
 
-    def withdraw_from_pot(self, account_id, pot_id, amount_in_pennies):
+    def withdraw_from_pot(self, account_id, pot_id, amount_in_pennies, dedupe_id=None):
         """Move money from an account into a pot. (https://monzo.com/docs/#withdraw-from-a-pot)
 
             :param account_id: The unique identifier for the account to move the money to.
             :param pot_id: The unique identifier for the pot to withdraw the money from.
             :param amount_in_pennies: The amount of money to move to the pot in pennies.
+            :param dedupe_id: A key unique to this withdrawal, which makes retrying it safe.
+                              Reuse it when retrying the same withdrawal (Default: a new random key)
 
             :rtype: A dictionary containing information on the pot that was updated.
         """
         url = "{0}/pots/{1}/withdraw".format(self.API_URL, pot_id)
-        unique_string = "".join(random.choice(string.ascii_letters) for i in range(15))
         data = {
             "destination_account_id": account_id,
             "amount": amount_in_pennies,
-            "dedupe_id": unique_string,
+            "dedupe_id": dedupe_id or generate_dedupe_id(),
         }
 
-        response = self.oauth_session.make_request(url, data=data, method="PUT")
+        response = self.oauth_session.make_request(
+            url, data=data, method="PUT", idempotent=True
+        )
         return response
 
     def update_transaction_metadata(self, transaction_id, key, value):
@@ -304,9 +483,25 @@ class Monzo(object):
         """
         url = "{0}/transactions/{1}".format(self.API_URL, transaction_id)
         data = {"metadata[" + key + "]": value}
-        response = self.oauth_session.make_request(url, data=data, method="PATCH")
+        # Setting a key to a value is idempotent, so it is safe to retry
+        response = self.oauth_session.make_request(
+            url, data=data, method="PATCH", idempotent=True
+        )
         return response
 
+    def update_transactions_metadata(self, updates, concurrency=DEFAULT_CONCURRENCY):
+        """Update metadata key value pairs for many transactions concurrently.
+
+           :param updates: An iterable of `(transaction_id, key, value)` tuples.
+           :param concurrency: The maximum number of updates made at the same time.
+           :rtype: A list of monzo.bulk.BulkResult, one per update tuple.
+        """
+        return run_concurrently(
+            lambda update: self.update_transaction_metadata(*update),
+            updates,
+            concurrency,
+        )
+
     def update_transaction_notes(self, transaction_id, notes):
         """Update notes for a given transaction. (https://monzo.com/docs/#annotate-transaction)
            :param transaction_id: The unique identifier for the transaction for which notes should be updated.
@@ -0,0 +1,254 @@
+"""A pool of clients for many users' tokens sharing one transport.
+
+This module contains the class `MonzoClientPool`, for services holding the
+OAuth tokens of many users in a token store with `for_user()` (such as
+`monzo.tokenstore.SQLiteTokenStore`). Clients are built on demand for the
+users who are active, share a single HTTP adapter (so the number of open
+sockets is bounded by the adapter's pool size, not the number of users), and
+the least recently used are dropped once `max_clients` is exceeded or they
+have been idle for `idle_timeout` seconds. Tokens are only loaded and
+refreshed when a user's client is used.
+
+Work for many users is scheduled fairly with `submit()`: users with pending
+work take turns, so one user with a long queue cannot starve the others.
+
+    pool = MonzoClientPool(SQLiteTokenStore("tokens.sqlite3"), client_id, client_secret)
+    futures = [pool.submit(user_id, Monzo.get_accounts) for user_id in pool.users()]
+"""
+
+import threading
+import time
+from collections import OrderedDict, deque
+
+from monzo.auth import MonzoOAuth2Client, create_adapter
+from monzo.monzo import Monzo
+
+
+class MonzoClientPool(object):
+    """Multiplexes the clients of many users over one shared HTTP adapter.
+
+       :param token_store: A token store with `for_user(user_id)` and `users()`, such
+                           as monzo.tokenstore.SQLiteTokenStore.
+       :param client_id: Client id string, if it is not kept with the tokens.
+       :param client_secret: Client secret string, if it is not kept with the tokens.
+       :param max_clients: The maximum number of users' clients kept at once.
+       :param idle_timeout: Seconds after which an unused client is dropped (None to keep
+                            clients until evicted by `max_clients`).
+       :param workers: The number of threads running submitted work.
+       :param per_user_concurrency: The maximum number of one user's tasks running at once.
+       :param adapter: The shared HTTP adapter (Defaults to one made by `create_adapter`
+                       with `pool_maxsize=workers`).
+       :param client_kwargs: Other options passed on to every MonzoOAuth2Client
+                             (e.g. `timeout`, `rate_limiter`, `hooks`). `cache` and
+                             `coalesce` may only be True, so that every user gets their
+                             own: responses are keyed by url and parameters alone, and
+                             a shared instance would hand one user's accounts to another.
+    """
+
+    def __init__(
+        self,
+        token_store,
+        client_id=None,
+        client_secret=None,
+        max_clients=256,
+        idle_timeout=300,
+        workers=8,
+        per_user_concurrency=1,
+        adapter=None,
+        **client_kwargs,
+    ):
+        for option in ("cache", "coalesce"):
+            if client_kwargs.get(option) not in (None, False, True):
+                raise ValueError(
+                    "{0} must be True or False in a pool; a shared instance would "
+                    "share responses between users".format(option)
+                )
+        self.token_store = token_store
+        self.client_id, self.client_secret = client_id, client_secret
+        self.max_clients = max_clients
+        self.idle_timeout = idle_timeout
+        self.workers = workers
+        self.per_user_concurrency = per_user_concurrency
+        self.adapter = adapter or create_adapter(pool_maxsize=workers)
+        self.client_kwargs = client_kwargs
+        self.evictions = 0
+
+        self._clients = OrderedDict()  # user_id -> (Monzo, last used)
+        self._clients_lock = threading.Lock()
+
+        self._condition = threading.Condition()
+        self._queues = {}
+        self._ready = deque()
+        self._ready_set = set()
+        self._running = {}
+        self._threads = []
+        self._shutdown = False
+
+    def users(self):
+        """Lists the users with a stored token.
+
+           :rtype: A list of user ids.
+        """
+        return self.token_store.users()
+
+    def add_user(self, user_id, token):
+        """Stores the token of a new (or re-authorised) user, dropping any client
+           built with their previous token.
+
+           :param user_id: The user's id.
+           :param token: A Dictionary representation of the user's token.
+        """
+        self.token_store.for_user(user_id).save(token)
+        with self._clients_lock:
+            self._clients.pop(user_id, None)
+
+    def client(self, user_id):
+        """Gets the client of a user, building it if it is not pooled.
+
+           :param user_id: The user's id.
+           :rtype: A Monzo object using the user's token and the shared adapter.
+        """
+        now = time.monotonic()
+        with self._clients_lock:
+            if user_id in self._clients:
+                client = self._clients.pop(user_id)[0]
+            else:
+                client = self._create_client(user_id)
+            self._clients[user_id] = (client, now)
+            self._evict(now)
+        return client
+
+    def _create_client(self, user_id):
+        oauth = MonzoOAuth2Client.from_token_store(
+            self.token_store.for_user(user_id),
+            self.client_id,
+            self.client_secret,
+            adapter=self.adapter,
+            **self.client_kwargs,
+        )
+        return Monzo.from_oauth_session(oauth)
+
+    def _evict(self, now):
+        # Clients are only dropped, never closed: closing a session would
+        # close the adapter it shares with every other client.
+        while len(self._clients) > self.max_clients:
+            self._clients.popitem(last=False)
+            self.evictions += 1
+        if self.idle_timeout is None:
+            return
+        while self._clients:
+            user_id, (_, last_used) = next(iter(self._clients.items()))
+            if now - last_used <= self.idle_timeout:
+                break
+            del self._clients[user_id]
+            self.evictions += 1
+
+    def __len__(self):
+        with self._clients_lock:
+            return len(self._clients)
+
+    def submit(self, user_id, function, *args, **kwargs):
+        """Schedules `function(client, *args, **kwargs)` to run with a user's client.
+
+           Users with pending work take turns: after one task of a user runs,
+           every other user with pending work gets a turn before their next.
+
+           :param user_id: The user's id.
+           :param function: A callable taking the user's Monzo client first, such as
+                            `Monzo.get_accounts`.
+           :rtype: A concurrent.futures.Future of the function's result.
+        """
+        from concurrent.futures import Future
+
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit work to a pool which is shut down")
+            self._queues.setdefault(user_id, deque()).append(
+                (future, function, args, kwargs)
+            )
+            self._schedule(user_id)
+            if len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        return future
+
+    def map(self, function, user_ids):
+        """Runs `function(client)` for many users, scheduled fairly.
+
+           :param function: A callable taking a user's Monzo client.
+           :param user_ids: An iterable of user ids.
+           :rtype: A Dictionary of results (or the errors raised) by user id.
+        """
+        futures = {user_id: self.submit(user_id, function) for user_id in user_ids}
+        results = {}
+        for user_id, future in futures.items():
+            error = future.exception()
+            results[user_id] = error if error is not None else future.result()
+        return results
+
+    def _schedule(self, user_id):
+        """Queues a user for a turn, if they have pending work and may run more.
+           Must be called with the condition held."""
+        if (
+            user_id not in self._ready_set
+            and self._queues.get(user_id)
+            and self._running.get(user_id, 0) < self.per_user_concurrency
+        ):
+            self._ready.append(user_id)
+            self._ready_set.add(user_id)
+            self._condition.notify()
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._ready:
+                    if self._shutdown:
+                        return
+                    self._condition.wait()
+                user_id = self._ready.popleft()
+                self._ready_set.discard(user_id)
+                future, function, args, kwargs = self._queues[user_id].popleft()
+                self._running[user_id] = self._running.get(user_id, 0) + 1
+                self._schedule(user_id)
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function(self.client(user_id), *args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+
+            with self._condition:
+                self._running[user_id] -= 1
+                if not self._running[user_id]:
+                    del self._running[user_id]
+                queue = self._queues.get(user_id)
+                if queue is not None and not queue and user_id not in self._running:
+                    del self._queues[user_id]
+                self._schedule(user_id)
+
+    def shutdown(self, wait=True):
+        """Stops the worker threads once all submitted work has run.
+
+           :param wait: Whether to wait for the submitted work to finish.
+        """
+        with self._condition:
+            self._shutdown = True
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def close(self):
+        """Shuts down the workers, drops every client and closes the shared adapter."""
+        self.shutdown()
+        with self._clients_lock:
+            self._clients.clear()
+        self.adapter.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,107 @@
+"""Client-side rate limiting and backoff for calls to the Monzo API.
+
+This module contains the class `TokenBucket`, which throttles outgoing
+requests and adapts its rate whenever the API answers with a 429, and the
+function `backoff_delay` which computes jittered exponential retry delays.
+"""
+
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+BACKOFF_BASE = 0.5  #: (float): The delay in seconds before the first retry.
+BACKOFF_CAP = 30.0  #: (float): The maximum delay in seconds between retries.
+
+
+class TokenBucket(object):
+    """A thread-safe token bucket which adapts its rate to the server's limit.
+
+       Every request takes one token; tokens are refilled at `rate` per second up
+       to `capacity`. When the server still answers with a 429, `throttle()`
+       halves the rate, and every successful request nudges it back up towards
+       the configured maximum, so throughput settles just under the real limit.
+
+       Share one instance between clients (and threads) to apply a common limit.
+
+       :param rate: The maximum number of requests per second.
+       :param capacity: The largest burst of requests allowed (Defaults to `rate`)
+       :param min_rate: The lowest rate `throttle()` may reduce to (Defaults to `rate / 20`)
+    """
+
+    def __init__(self, rate, capacity=None, min_rate=None):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = float(min_rate) if min_rate else self.max_rate / 20
+        self.capacity = float(capacity) if capacity else max(self.max_rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Blocks until a token is available and takes it."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttle(self):
+        """Halves the rate after the server reported too many requests."""
+        with self._lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+
+    def relax(self):
+        """Additively raises the rate back towards the maximum after a success."""
+        with self._lock:
+            if self.rate < self.max_rate:
+                self._refill()
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+def backoff_delay(attempt, retry_after=None, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Computes the delay before retrying a request, using "full jitter"
+       exponential backoff. A `Retry-After` value from the server is honoured
+       as the minimum delay.
+
+       :param attempt: The number of retries already made (starting at 0).
+       :param retry_after: Seconds the server asked us to wait, if any.
+       :rtype: The delay in seconds.
+    """
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+def parse_retry_after(value):
+    """Parses a `Retry-After` header, given in seconds or as an HTTP date.
+
+       :param value: The header value, or None.
+       :rtype: The number of seconds to wait, or None if it cannot be parsed.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
@@ -0,0 +1,222 @@
+"""Rebalancing of pots against target rules.
+
+This module contains the class `Rebalancer`, which takes one snapshot of an
+account's balance and pots, works out the transfers bringing every pot within
+its rule (moving each pot at most once, in a single direction) and runs them:
+withdrawals first, concurrently, then the deposits they fund. Every transfer
+carries a `dedupe_id` derived from the plan, so with `write_retry` enabled on
+the client a transfer which is retried is still applied at most once. Plans
+can be inspected without moving any money by running with `dry_run=True`.
+
+    rebalancer = Rebalancer([target(bills_pot, 50000), PotRule(savings_pot, 0, 200000)],
+                            reserve=10000, sweep_pot_id=savings_pot)
+    result = rebalancer.run(client, account_id, dry_run=True)
+    result.plan.transfers
+
+To sweep the accounts of many users, run it through a `monzo.pool.MonzoClientPool`.
+"""
+
+import hashlib
+from collections import OrderedDict, namedtuple
+from functools import partial
+
+from monzo.bulk import DEFAULT_CONCURRENCY, run_concurrently
+from monzo.utils import generate_dedupe_id
+
+DEPOSIT = "deposit"
+WITHDRAW = "withdraw"
+
+PotRule = namedtuple("PotRule", ["pot_id", "minimum", "maximum"])
+PotRule.__new__.__defaults__ = (None, None)
+PotRule.__doc__ = """Keeps a pot's balance between `minimum` and `maximum` pennies.
+
+Either bound may be None. Rules are applied in order, so when the account
+cannot fund every pot the earlier rules are topped up first."""
+
+Snapshot = namedtuple("Snapshot", ["account_id", "balance", "pots"])
+Snapshot.__doc__ = """An account's balance and the balances of its pots, in pennies."""
+
+Transfer = namedtuple("Transfer", ["pot_id", "direction", "amount", "dedupe_id"])
+Transfer.__doc__ = """A move of `amount` pennies into or out of (`direction`) a pot."""
+
+RebalancePlan = namedtuple(
+    "RebalancePlan", ["account_id", "transfers", "available", "shortfall"]
+)
+RebalancePlan.__doc__ = """The transfers rebalancing an account, withdrawals first.
+
+`available` is the balance left above the reserve once they are made, and
+`shortfall` the pennies the rules wanted deposited which could not be funded."""
+
+RebalanceResult = namedtuple("RebalanceResult", ["plan", "results", "skipped"])
+RebalanceResult.__doc__ = """The outcome of running a plan.
+
+`results` holds a monzo.bulk.BulkResult for every transfer made, and `skipped`
+the deposits which were not made because a withdrawal funding them failed."""
+
+
+def target(pot_id, amount):
+    """A rule keeping a pot at exactly `amount` pennies.
+
+       :rtype: A PotRule.
+    """
+    return PotRule(pot_id, amount, amount)
+
+
+class Rebalancer(object):
+    """Plans and runs the transfers bringing pots within their rules.
+
+       :param rules: An iterable of PotRule, in order of priority.
+       :param reserve: Pennies always left in the account.
+       :param sweep_pot_id: A pot receiving whatever is left above the reserve once
+                            the rules are met, up to the pot's own maximum, if any.
+       :param concurrency: The maximum number of transfers made at the same time.
+    """
+
+    def __init__(
+        self, rules, reserve=0, sweep_pot_id=None, concurrency=DEFAULT_CONCURRENCY
+    ):
+        self.rules = list(rules)
+        for rule in self.rules:
+            if (
+                rule.minimum is not None
+                and rule.maximum is not None
+                and rule.minimum > rule.maximum
+            ):
+                raise ValueError(
+                    "The minimum of pot {0} is above its maximum".format(rule.pot_id)
+                )
+        self.reserve = reserve
+        self.sweep_pot_id = sweep_pot_id
+        self.concurrency = concurrency
+
+    def snapshot(self, client, account_id):
+        """Reads an account's balance and its pots' balances.
+
+           :param client: A Monzo client.
+           :param account_id: The unique identifier for the account.
+           :rtype: A Snapshot.
+        """
+        balance = client.get_balance(account_id)["balance"]
+        pots = OrderedDict(
+            (pot["id"], pot["balance"])
+            for pot in client.get_pots()["pots"]
+            if not pot.get("deleted")
+        )
+        return Snapshot(account_id, balance, pots)
+
+    def plan(self, snapshot, run_id=None):
+        """Works out the transfers rebalancing a snapshot.
+
+           :param snapshot: A Snapshot, as read by `snapshot()`.
+           :param run_id: A key for this run (e.g. the date of a nightly sweep). Planning
+                          the same snapshot with the same run_id gives the same
+                          dedupe ids (Default: a new random key)
+           :rtype: A RebalancePlan.
+        """
+        for pot_id in [rule.pot_id for rule in self.rules] + [self.sweep_pot_id]:
+            if pot_id is not None and pot_id not in snapshot.pots:
+                raise ValueError("Pot {0} is not in the snapshot".format(pot_id))
+
+        deltas = OrderedDict()
+        available = snapshot.balance - self.reserve
+        for rule in self.rules:
+            if rule.maximum is None:
+                continue
+            excess = snapshot.pots[rule.pot_id] - rule.maximum
+            if excess > 0:
+                deltas[rule.pot_id] = -excess
+                available += excess
+
+        shortfall = 0
+        for rule in self.rules:
+            if rule.minimum is None:
+                continue
+            needed = rule.minimum - snapshot.pots[rule.pot_id]
+            if needed > 0:
+                amount = min(needed, max(available, 0))
+                shortfall += needed - amount
+                available -= amount
+                if amount:
+                    deltas[rule.pot_id] = amount
+
+        if self.sweep_pot_id is not None and available > 0:
+            delta = deltas.get(self.sweep_pot_id, 0)
+            sweep = available
+            maxima = [
+                rule.maximum
+                for rule in self.rules
+                if rule.pot_id == self.sweep_pot_id and rule.maximum is not None
+            ]
+            if maxima:
+                room = min(maxima) - snapshot.pots[self.sweep_pot_id] - delta
+                sweep = min(sweep, max(room, 0))
+            deltas[self.sweep_pot_id] = delta + sweep
+            available -= sweep
+
+        run_id = run_id or generate_dedupe_id()
+        transfers = [
+            self._transfer(run_id, snapshot.account_id, pot_id, delta)
+            for pot_id, delta in deltas.items()
+            if delta
+        ]
+        transfers.sort(key=lambda transfer: transfer.direction != WITHDRAW)
+        return RebalancePlan(snapshot.account_id, transfers, available, shortfall)
+
+    @staticmethod
+    def _transfer(run_id, account_id, pot_id, delta):
+        direction = DEPOSIT if delta > 0 else WITHDRAW
+        key = ":".join([run_id, account_id, pot_id, direction, str(abs(delta))])
+        dedupe_id = "rebalance_" + hashlib.sha1(key.encode()).hexdigest()[:24]
+        return Transfer(pot_id, direction, abs(delta), dedupe_id)
+
+    def execute(self, client, plan):
+        """Makes the transfers of a plan: the withdrawals concurrently, then as many of
+           the deposits as the account can fund, concurrently.
+
+           :param client: A Monzo client, ideally with `write_retry` enabled.
+           :param plan: A RebalancePlan.
+           :rtype: A RebalanceResult.
+        """
+        move = partial(self._move, client, plan.account_id)
+        withdrawals = [t for t in plan.transfers if t.direction == WITHDRAW]
+        deposits = [t for t in plan.transfers if t.direction == DEPOSIT]
+
+        results = run_concurrently(move, withdrawals, self.concurrency)
+        # Deposits are funded by what was in the account plus what the
+        # withdrawals actually moved out of pots
+        funds = plan.available + sum(t.amount for t in deposits)
+        funds -= sum(result.item.amount for result in results if result.error)
+        funded, skipped = [], []
+        for deposit in deposits:
+            if deposit.amount <= funds:
+                funded.append(deposit)
+                funds -= deposit.amount
+            else:
+                skipped.append(deposit)
+
+        results += run_concurrently(move, funded, self.concurrency)
+        return RebalanceResult(plan, results, skipped)
+
+    @staticmethod
+    def _move(client, account_id, transfer):
+        if transfer.direction == DEPOSIT:
+            return client.deposit_into_pot(
+                transfer.pot_id, account_id, transfer.amount, transfer.dedupe_id
+            )
+        return client.withdraw_from_pot(
+            account_id, transfer.pot_id, transfer.amount, transfer.dedupe_id
+        )
+
+    def run(self, client, account_id, dry_run=False, run_id=None):
+        """Snapshots an account, plans its transfers and (unless `dry_run`) makes them.
+
+           :param client: A Monzo client.
+           :param account_id: The unique identifier for the account.
+           :param dry_run: Whether to only plan the transfers.
+           :param run_id: A key for this run, see `plan()`.
+           :rtype: A RebalanceResult, with no results when `dry_run` is set.
+        """
+        plan = self.plan(self.snapshot(client, account_id), run_id)
+        if dry_run:
+            return RebalanceResult(plan, [], [])
+        return self.execute(client, plan)
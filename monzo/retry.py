@@ -0,0 +1,116 @@
+"""Bounded retries of idempotent writes.
+
+This module contains the class `RetryPolicy`, which `MonzoOAuth2Client`
+applies to writes made with `idempotent=True` when constructed with
+`write_retry=...`. Such writes (pot deposits and withdrawals, which carry a
+`dedupe_id`, and metadata updates) are safe to replay: every attempt of one
+operation sends the same body, so Monzo applies it at most once. Attempts
+which fail with an `InternalServerError`, a `GatewayTimeoutError` or a
+timeout or connection error are retried with jittered exponential backoff,
+within a maximum number of attempts and a deadline, and the outcome of every
+operation is recorded.
+"""
+
+import threading
+import time
+from collections import deque, namedtuple
+
+from monzo.errors import GatewayTimeoutError, InternalServerError
+from monzo.ratelimit import backoff_delay
+
+WriteOutcome = namedtuple(
+    "WriteOutcome", ["method", "endpoint", "key", "attempts", "error", "duration"]
+)
+WriteOutcome.__doc__ = """The outcome of one idempotent write.
+
+`key` is the operation's `dedupe_id` (if it had one), `attempts` the number
+of requests made and `error` the error finally raised, or None on success."""
+
+
+class RetryPolicy(object):
+    """Retries idempotent writes which fail transiently.
+
+       :param max_attempts: The maximum number of requests made for one operation.
+       :param base: The delay in seconds before the first retry.
+       :param cap: The maximum delay in seconds between retries.
+       :param deadline: Seconds after which no further attempt is started.
+       :param history: The number of recent outcomes kept in `outcomes`.
+       :param on_outcome: An optional callable given each WriteOutcome, e.g. to log it.
+    """
+
+    RETRY_ON = (InternalServerError, GatewayTimeoutError)
+
+    def __init__(
+        self,
+        max_attempts=4,
+        base=0.5,
+        cap=10.0,
+        deadline=30.0,
+        history=100,
+        on_outcome=None,
+    ):
+        self.max_attempts = max_attempts
+        self.base, self.cap = base, cap
+        self.deadline = deadline
+        self.on_outcome = on_outcome
+        self.outcomes = deque(maxlen=history)
+        self.succeeded = self.failed = self.retries = 0
+        self._lock = threading.Lock()
+
+    def is_retryable(self, error):
+        """Whether an attempt which raised `error` may be retried.
+
+           :rtype: A boolean.
+        """
+        from requests.exceptions import ConnectionError as RequestsConnectionError
+        from requests.exceptions import Timeout
+
+        return isinstance(error, self.RETRY_ON + (RequestsConnectionError, Timeout))
+
+    def call(self, function, method=None, endpoint=None, key=None, on_retry=None):
+        """Calls `function` until it succeeds, fails with an error which is not
+           retryable, or runs out of attempts or time.
+
+           :param function: A callable making one attempt of the write.
+           :param method: The HTTP method, recorded in the outcome.
+           :param endpoint: The endpoint, recorded in the outcome.
+           :param key: The operation's idempotency key, recorded in the outcome.
+           :param on_retry: An optional callable given `(attempt, error)` before each retry.
+           :rtype: The result of the successful attempt.
+        """
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = function()
+            except Exception as e:
+                delay = backoff_delay(attempt - 1, base=self.base, cap=self.cap)
+                if (
+                    attempt >= self.max_attempts
+                    or not self.is_retryable(e)
+                    or time.monotonic() - started + delay > self.deadline
+                ):
+                    self._record(method, endpoint, key, attempt, e, started)
+                    raise
+                with self._lock:
+                    self.retries += 1
+                if on_retry is not None:
+                    on_retry(attempt, e)
+                time.sleep(delay)
+                continue
+            self._record(method, endpoint, key, attempt, None, started)
+            return result
+
+    def _record(self, method, endpoint, key, attempts, error, started):
+        outcome = WriteOutcome(
+            method, endpoint, key, attempts, error, time.monotonic() - started
+        )
+        with self._lock:
+            self.outcomes.append(outcome)
+            if error is None:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+        if self.on_outcome is not None:
+            self.on_outcome(outcome)
@@ -0,0 +1,252 @@
+"""Full-text and faceted search over a local transaction store.
+
+This module contains the class `TransactionSearch`, which keeps a SQLite FTS5
+index of the description, merchant name, notes, metadata and category of the
+transactions in a `monzo.store.TransactionStore`, alongside a table of their
+facets (created time, amount, category and merchant). It subscribes to the
+store, so transactions are indexed as they are upserted, and queries combine a
+full-text match with facet filters using indexes rather than scanning every
+transaction.
+
+    search = TransactionSearch(store)
+    search.search(account_id, "coffee", category="eating_out", max_amount=-500)
+    search.facets(account_id, "category", text="pret")
+"""
+
+import re
+
+from monzo import codec
+
+DOCS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS transaction_search_docs (
+        docid INTEGER PRIMARY KEY,
+        id TEXT NOT NULL UNIQUE,
+        account_id TEXT NOT NULL,
+        created TEXT NOT NULL,
+        amount INTEGER,
+        category TEXT,
+        merchant TEXT
+    );
+    CREATE INDEX IF NOT EXISTS transaction_search_docs_created
+        ON transaction_search_docs (account_id, created);
+    CREATE INDEX IF NOT EXISTS transaction_search_docs_category
+        ON transaction_search_docs (account_id, category, amount);
+    CREATE INDEX IF NOT EXISTS transaction_search_docs_merchant
+        ON transaction_search_docs (account_id, merchant);
+"""
+
+INDEX_SCHEMA = """
+    CREATE VIRTUAL TABLE IF NOT EXISTS transaction_search USING fts5(
+        description, merchant, notes, metadata, category,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    );
+"""
+
+FACETS = ("category", "merchant")
+
+
+def match_query(text):
+    """Turns free text into an FTS5 query matching every word as a prefix, so
+       user input cannot inject FTS5 syntax.
+
+       :param text: The text searched for.
+       :rtype: An FTS5 query string, or None if the text has no words.
+    """
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        return None
+    return " ".join('"{0}"*'.format(word) for word in words)
+
+
+def _merchant_name(transaction):
+    merchant = transaction.get("merchant")
+    if isinstance(merchant, dict):
+        return merchant.get("name") or merchant.get("id")
+    return merchant or None
+
+
+class TransactionSearch(object):
+    """A full-text and faceted search index over the transactions of a store.
+
+       :param store: The monzo.store.TransactionStore to index.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        with store.lock, store.connection:
+            exists = store.connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'transaction_search'"
+            ).fetchone()
+            store.connection.executescript(DOCS_SCHEMA + INDEX_SCHEMA)
+            if not exists:
+                self._rebuild(store.connection)
+            store.subscribe(self._on_upsert)
+
+    def rebuild(self):
+        """Re-indexes every stored transaction."""
+        with self.store.lock, self.store.connection:
+            self._rebuild(self.store.connection)
+
+    def _rebuild(self, connection):
+        connection.execute("DELETE FROM transaction_search")
+        connection.execute("DELETE FROM transaction_search_docs")
+        rows = connection.execute("SELECT account_id, data FROM transactions")
+        for account_id, data in rows.fetchall():
+            self._index(connection, account_id, codec.loads(data))
+
+    def _on_upsert(self, connection, account_id, replaced, transactions):
+        for transaction in transactions:
+            self._index(connection, account_id, transaction)
+
+    @staticmethod
+    def _index(connection, account_id, transaction):
+        merchant = _merchant_name(transaction)
+        facets = (
+            account_id,
+            transaction["created"],
+            transaction.get("amount"),
+            transaction.get("category"),
+            merchant,
+        )
+        row = connection.execute(
+            "SELECT docid FROM transaction_search_docs WHERE id = ?",
+            (transaction["id"],),
+        ).fetchone()
+        if row is None:
+            docid = connection.execute(
+                "INSERT INTO transaction_search_docs "
+                "(id, account_id, created, amount, category, merchant) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (transaction["id"],) + facets,
+            ).lastrowid
+        else:
+            docid = row[0]
+            connection.execute(
+                "UPDATE transaction_search_docs SET account_id = ?, created = ?, "
+                "amount = ?, category = ?, merchant = ? WHERE docid = ?",
+                facets + (docid,),
+            )
+            connection.execute(
+                "DELETE FROM transaction_search WHERE rowid = ?", (docid,)
+            )
+        metadata = transaction.get("metadata") or {}
+        connection.execute(
+            "INSERT INTO transaction_search "
+            "(rowid, description, merchant, notes, metadata, category) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                docid,
+                transaction.get("description") or "",
+                merchant or "",
+                transaction.get("notes") or "",
+                " ".join(str(value) for value in metadata.values()),
+                transaction.get("category") or "",
+            ),
+        )
+
+    @staticmethod
+    def _filters(
+        account_id,
+        text,
+        category=None,
+        merchant=None,
+        min_amount=None,
+        max_amount=None,
+        since=None,
+        before=None,
+    ):
+        """Builds the FROM and WHERE clauses of a query, and their arguments."""
+        query = match_query(text)
+        if query is None:
+            clauses = "FROM transaction_search_docs d WHERE d.account_id = ?"
+            args = [account_id]
+        else:
+            # CROSS JOIN makes SQLite run the full-text match once and look up
+            # the facets of each match, rather than match every transaction
+            clauses = (
+                "FROM transaction_search CROSS JOIN transaction_search_docs d "
+                "ON d.docid = transaction_search.rowid "
+                "WHERE transaction_search MATCH ? AND d.account_id = ?"
+            )
+            args = [query, account_id]
+        for condition, value in (
+            ("d.category = ?", category),
+            ("d.merchant = ?", merchant),
+            ("d.amount >= ?", min_amount),
+            ("d.amount <= ?", max_amount),
+            ("d.created >= ?", since),
+            ("d.created < ?", before),
+        ):
+            if value is not None:
+                clauses += " AND " + condition
+                args.append(value)
+        return clauses, args, query is not None
+
+    def search(self, account_id, text=None, limit=50, offset=0, **filters):
+        """Searches the transactions of an account.
+
+           :param account_id: The unique identifier for the account.
+           :param text: Words to find in the description, merchant name, notes, metadata
+                        or category. Each word matches as a prefix.
+           :param limit: The maximum number of transactions to return.
+           :param offset: The number of matching transactions to skip.
+           :param category: Only return transactions in this category.
+           :param merchant: Only return transactions at this merchant (by name, or id
+                            when the merchant was not expanded).
+           :param min_amount: The smallest amount to return, in minor units (spending
+                              is negative).
+           :param max_amount: The largest amount to return, in minor units.
+           :param since: An RFC 3339 string of the earliest `created` time to return.
+           :param before: An RFC 3339 string of the `created` time to stop before.
+           :rtype: A list of transaction objects, best match first when searching for
+                   text, otherwise newest first.
+        """
+        clauses, args, ranked = self._filters(account_id, text, **filters)
+        order = "rank" if ranked else "d.created DESC, d.id DESC"
+        with self.store.lock:
+            ids = [
+                row[0]
+                for row in self.store.connection.execute(
+                    "SELECT d.id {0} ORDER BY {1} LIMIT ? OFFSET ?".format(
+                        clauses, order
+                    ),
+                    args + [limit, offset],
+                )
+            ]
+            stored = self.store.get_transactions(ids)
+        return [stored[transaction_id] for transaction_id in ids]
+
+    def count(self, account_id, text=None, **filters):
+        """Counts the transactions of an account matching a search. See `search`.
+
+           :rtype: The number of matching transactions.
+        """
+        clauses, args, _ = self._filters(account_id, text, **filters)
+        with self.store.lock:
+            return self.store.connection.execute(
+                "SELECT COUNT(*) {0}".format(clauses), args
+            ).fetchone()[0]
+
+    def facets(self, account_id, facet, text=None, limit=20, **filters):
+        """Counts the transactions matching a search by category or merchant.
+
+           :param account_id: The unique identifier for the account.
+           :param facet: One of "category" or "merchant".
+           :param text: Words to search for, see `search`.
+           :param limit: The maximum number of values to return.
+           :rtype: A list of `(value, count)` tuples, most frequent first.
+        """
+        if facet not in FACETS:
+            raise ValueError(
+                "Unknown facet {0!r}, expected one of {1}".format(
+                    facet, ", ".join(FACETS)
+                )
+            )
+        clauses, args, _ = self._filters(account_id, text, **filters)
+        with self.store.lock:
+            rows = self.store.connection.execute(
+                "SELECT d.{0}, COUNT(*) AS matches {1} GROUP BY d.{0} "
+                "ORDER BY matches DESC, d.{0} LIMIT ?".format(facet, clauses),
+                args + [limit],
+            ).fetchall()
+        return [tuple(row) for row in rows]
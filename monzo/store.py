@@ -0,0 +1,193 @@
+"""A persistent local cache of transactions.
+
+This module contains the class `TransactionStore` which keeps transactions in
+a SQLite database, indexed on account, `created` and `id`, so that repeated
+runs only need to fetch what is newer than the stored high-water mark.
+Other modules (such as monzo.analytics) can `subscribe` to upserts to keep
+derived tables in the same database up to date.
+"""
+
+import sqlite3
+import threading
+
+from monzo import codec
+from monzo.const import MONZO_STORE_FILE
+
+
+class TransactionStore(object):
+    """A SQLite-backed store of transaction objects.
+
+       :param path: Path to the SQLite database file (or ":memory:").
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS transactions (
+            id TEXT PRIMARY KEY,
+            account_id TEXT NOT NULL,
+            created TEXT NOT NULL,
+            amount INTEGER,
+            currency TEXT,
+            category TEXT,
+            settled TEXT,
+            data TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS transactions_account_created
+            ON transactions (account_id, created, id);
+    """
+
+    def __init__(self, path=MONZO_STORE_FILE):
+        self.path = path
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.RLock()
+        self.listeners = []
+        with self.lock, self.connection:
+            self.connection.executescript(self.SCHEMA)
+
+    def close(self):
+        """Closes the underlying database connection."""
+        self.connection.close()
+
+    def subscribe(self, listener):
+        """Registers a listener called on every upsert, inside the same database
+           transaction, so derived tables never disagree with the stored transactions.
+
+           :param listener: A callable taking `(connection, account_id, replaced, transactions)`,
+                            where `replaced` is a dictionary of the previously stored versions
+                            of the upserted transactions by id.
+        """
+        with self.lock:
+            self.listeners.append(listener)
+
+    def _stored(self, transaction_ids):
+        """Loads the stored versions of transactions, by id."""
+        stored = {}
+        for i in range(0, len(transaction_ids), 500):
+            chunk = transaction_ids[i : i + 500]
+            rows = self.connection.execute(
+                "SELECT id, data FROM transactions WHERE id IN ({0})".format(
+                    ", ".join("?" * len(chunk))
+                ),
+                chunk,
+            ).fetchall()
+            stored.update((row[0], codec.loads(row[1])) for row in rows)
+        return stored
+
+    def upsert(self, account_id, transactions):
+        """Inserts transactions, replacing any stored transaction with the same id.
+
+           :param account_id: The unique identifier for the account which the transactions belong to.
+           :param transactions: An iterable of transaction objects.
+           :rtype: The number of transactions written.
+        """
+        transactions = list(transactions)
+        rows = [
+            (
+                transaction["id"],
+                account_id,
+                transaction["created"],
+                transaction.get("amount"),
+                transaction.get("currency"),
+                transaction.get("category"),
+                transaction.get("settled") or None,
+                codec.dumps(transaction),
+            )
+            for transaction in transactions
+        ]
+        with self.lock, self.connection:
+            replaced = {}
+            if self.listeners:
+                replaced = self._stored([row[0] for row in rows])
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            for listener in self.listeners:
+                listener(self.connection, account_id, replaced, transactions)
+        return len(rows)
+
+    def high_water_mark(self, account_id):
+        """Gets the most recently created stored transaction of an account.
+
+           :param account_id: The unique identifier for the account.
+           :rtype: A `(created, id)` tuple, or None if no transactions are stored.
+        """
+        with self.lock:
+            return self.connection.execute(
+                "SELECT created, id FROM transactions WHERE account_id = ? "
+                "ORDER BY created DESC, id DESC LIMIT 1",
+                (account_id,),
+            ).fetchone()
+
+    def get_transaction(self, transaction_id):
+        """Retrieve a stored transaction.
+
+           :param transaction_id: The unique identifier for the transaction.
+           :rtype: The transaction object, or None if it is not stored.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT data FROM transactions WHERE id = ?", (transaction_id,)
+            ).fetchone()
+        return codec.loads(row[0]) if row else None
+
+    def get_transactions(self, transaction_ids):
+        """Retrieve many stored transactions at once.
+
+           :param transaction_ids: An iterable of unique identifiers for the transactions.
+           :rtype: A Dictionary of transaction objects by id, without the ids which are not stored.
+        """
+        with self.lock:
+            return self._stored(list(transaction_ids))
+
+    def transactions(self, account_id, since=None, before=None):
+        """Iterate over the stored transactions of an account, oldest first.
+
+           :param account_id: The unique identifier for the account.
+           :param since: An RFC 3339 string of the earliest `created` time to return.
+           :param before: An RFC 3339 string of the `created` time to stop before.
+           :rtype: A generator of transaction objects.
+        """
+        query = "SELECT data FROM transactions WHERE account_id = ?"
+        args = [account_id]
+        if since is not None:
+            query += " AND created >= ?"
+            args.append(since)
+        if before is not None:
+            query += " AND created < ?"
+            args.append(before)
+        query += " ORDER BY created, id"
+        with self.lock:
+            rows = self.connection.execute(query, args).fetchall()
+        for row in rows:
+            yield codec.loads(row[0])
+
+    def to_columns(self, account_id, since=None, before=None):
+        """Exports the stored transactions of an account as NumPy columns.
+           See monzo.columnar.to_columns.
+
+           :param account_id: The unique identifier for the account.
+           :param since: An RFC 3339 string of the earliest `created` time to export.
+           :param before: An RFC 3339 string of the `created` time to stop before.
+           :rtype: A dictionary of columns.
+        """
+        from monzo.columnar import to_columns
+
+        return to_columns(self.transactions(account_id, since=since, before=before))
+
+    def count(self, account_id=None):
+        """Counts the stored transactions, optionally of just one account.
+
+           :param account_id: The unique identifier for the account.
+           :rtype: The number of stored transactions.
+        """
+        with self.lock:
+            if account_id is None:
+                row = self.connection.execute(
+                    "SELECT COUNT(*) FROM transactions"
+                ).fetchone()
+            else:
+                row = self.connection.execute(
+                    "SELECT COUNT(*) FROM transactions WHERE account_id = ?",
+                    (account_id,),
+                ).fetchone()
+        return row[0]
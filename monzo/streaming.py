@@ -0,0 +1,111 @@
+"""Incremental decoding of JSON list responses.
+
+List endpoints such as `/transactions` answer with an object holding one
+large array, e.g. `{"transactions": [{...}, {...}]}`. `iter_json_array`
+decodes the items of that array one at a time as the body arrives, so a
+caller sees the first item before the whole body is downloaded and only one
+item (rather than the whole page) is held in memory at a time.
+"""
+
+import codecs
+import json
+
+CHUNK_SIZE = 16 * 1024  #: (int): Bytes read from the socket at a time.
+
+_WHITESPACE = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+class _Buffer(object):
+    """Text read so far from an iterable of byte chunks, consumed from the left."""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.position = 0
+        self.exhausted = False
+
+    def fill(self):
+        """Reads another chunk. Returns False once the body is exhausted."""
+        if self.exhausted:
+            return False
+        if self.position:
+            self.text, self.position = self.text[self.position :], 0
+        for chunk in self.chunks:
+            if chunk:
+                self.text += self.decoder.decode(chunk)
+                return True
+        self.text += self.decoder.decode(b"", final=True)
+        self.exhausted = True
+        return False
+
+    def peek(self):
+        """Skips whitespace and returns the next character, or "" at the end."""
+        while True:
+            while (
+                self.position < len(self.text)
+                and self.text[self.position] in _WHITESPACE
+            ):
+                self.position += 1
+            if self.position < len(self.text):
+                return self.text[self.position]
+            if not self.fill():
+                return ""
+
+    def expect(self, characters):
+        character = self.peek()
+        if character not in characters or not character:
+            raise ValueError(
+                "Expected one of {0!r} in the JSON body, got {1!r}".format(
+                    characters, character
+                )
+            )
+        self.position += 1
+        return character
+
+    def value(self):
+        """Decodes the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.position)
+                # A value running to the end of the buffer (such as a number)
+                # may continue in the next chunk
+                if end < len(self.text) or self.exhausted:
+                    self.position = end
+                    return value
+            except ValueError:
+                if self.exhausted:
+                    raise
+            self.fill()
+
+
+def iter_json_array(chunks, key):
+    """Incrementally decodes the items of the array under `key` in a JSON object.
+
+       :param chunks: An iterable of byte chunks of the JSON body, such as
+                      `response.iter_content(CHUNK_SIZE)`.
+       :param key: The top level key of the array.
+       :rtype: A generator of the decoded items.
+    """
+    buffer = _Buffer(chunks)
+    buffer.expect("{")
+    if buffer.peek() == "}":
+        return
+    while True:
+        name = buffer.value()
+        buffer.expect(":")
+        if name != key:
+            buffer.value()
+        else:
+            buffer.expect("[")
+            if buffer.peek() == "]":
+                buffer.position += 1
+            else:
+                while True:
+                    yield buffer.value()
+                    if buffer.expect(",]") == "]":
+                        break
+        if buffer.expect(",}") == "}":
+            return
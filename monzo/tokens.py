@@ -0,0 +1,98 @@
+"""Lightweight helpers for OAuth tokens and authorization URLs.
+
+This module only depends on the standard library and `monzo.utils`, so
+short-lived scripts which just need to build an authorization URL, read the
+code from a redirect or check a stored token can import it without loading
+requests and requests_oauthlib. Use `MonzoOAuth2Client` to exchange codes for
+tokens and to make requests.
+"""
+
+import random
+import string
+import time
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from monzo.const import AUTHORIZE_ENDPOINT, EXPIRES_AT, REFRESH_TOKEN
+from monzo.utils import load_token_from_file, save_token_to_file
+
+load_token = load_token_from_file
+save_token = save_token_to_file
+
+
+def generate_state(length=30):
+    """Generates a random `state` to protect the authorization flow against CSRF.
+
+       :param length: The number of characters.
+       :rtype: A string.
+    """
+    rand = random.SystemRandom()
+    return "".join(
+        rand.choice(string.ascii_letters + string.digits) for _ in range(length)
+    )
+
+
+def authorization_url(client_id, redirect_uri, state=None):
+    """Builds the URL the user visits to grant access, the same one as
+       `MonzoOAuth2Client.authorize_token_url`.
+
+       :param client_id: Client id string as given by Monzo Developer website
+       :param redirect_uri: The url Monzo redirects the user to with the code.
+       :param state: The state to send, or None to generate one.
+       :rtype: A Tuple consisting of the authentication url and the state token.
+    """
+    state = state or generate_state()
+    query = urlencode(
+        [
+            ("response_type", "code"),
+            ("client_id", client_id),
+            ("redirect_uri", redirect_uri),
+            ("state", state),
+        ]
+    )
+    return "{0}?{1}".format(AUTHORIZE_ENDPOINT, query), state
+
+
+def parse_redirect(url, state=None):
+    """Reads the authorization code from the url Monzo redirected the user to.
+
+       :param url: The redirect url, including its query string.
+       :param state: The state sent with the authorization url, to check it against.
+       :rtype: The authorization code, to pass to `MonzoOAuth2Client.fetch_access_token`.
+    """
+    query = {key: values[0] for key, values in parse_qs(urlparse(url).query).items()}
+    if "error" in query:
+        raise ValueError(
+            "Authorization failed: {0}".format(
+                query.get("error_description", query["error"])
+            )
+        )
+    if state is not None and query.get("state") != state:
+        raise ValueError("The redirect's state does not match the one sent.")
+    if "code" not in query:
+        raise ValueError("The redirect has no authorization code.")
+    return query["code"]
+
+
+def expires_in(token, now=None):
+    """The number of seconds until a token expires.
+
+       :param token: A Dictionary representation of the token.
+       :rtype: Seconds (negative once expired), or None if the expiry is unknown.
+    """
+    expires_at = token.get(EXPIRES_AT)
+    if not expires_at:
+        return None
+    return float(expires_at) - (time.time() if now is None else now)
+
+
+def is_expiring(token, margin=60, now=None):
+    """Whether a token expires within `margin` seconds and can be refreshed.
+
+       :param token: A Dictionary representation of the token.
+       :param margin: Seconds before expiry a token counts as expiring.
+       :rtype: A boolean.
+    """
+    remaining = expires_in(token, now)
+    return bool(
+        remaining is not None and remaining <= margin and token.get(REFRESH_TOKEN)
+    )
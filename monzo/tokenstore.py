@@ -0,0 +1,246 @@
+"""Pluggable storage for OAuth tokens.
+
+This module contains the `TokenStore` interface and three backends:
+
+* `MemoryTokenStore` keeps a token in memory.
+* `JSONFileTokenStore` keeps a token in a JSON file (`monzo.json` by default),
+  written atomically and locked against other processes.
+* `SQLiteTokenStore` keeps the tokens of many users in one SQLite database.
+
+Pass a store to `MonzoOAuth2Client(token_store=...)`. The client saves every
+refreshed token to it, and refreshes inside `store.lock()` after re-reading the
+stored token, so that when several processes share a store only one of them
+refreshes and the others pick up its result.
+"""
+
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+from monzo import codec
+from monzo.const import MONZO_CACHE_FILE, MONZO_STORE_FILE
+from monzo.utils import atomic_write_json
+
+
+class TokenStore(object):
+    """The interface of a token store. A store is also callable with a token,
+       so it can be used directly as a `refresh_callback`."""
+
+    def load(self):
+        """Loads the stored token.
+
+           :rtype: A Dictionary representation of the token, or None if none is stored.
+        """
+        raise NotImplementedError
+
+    def save(self, token):
+        """Stores a token.
+
+           :param token: A Dictionary representation of the token.
+        """
+        raise NotImplementedError
+
+    def lock(self):
+        """A context manager held while refreshing, so that only one thread
+           (or process, where the backend supports it) refreshes at a time."""
+        raise NotImplementedError
+
+    def __call__(self, token):
+        self.save(token)
+
+
+class MemoryTokenStore(TokenStore):
+    """Keeps a token in memory, shared between the threads of one process.
+
+       :param token: An optional initial token.
+    """
+
+    def __init__(self, token=None):
+        self.token = dict(token) if token else None
+        self._lock = threading.RLock()
+
+    def load(self):
+        with self._lock:
+            return dict(self.token) if self.token else None
+
+    def save(self, token):
+        with self._lock:
+            self.token = dict(token)
+
+    def lock(self):
+        return self._lock
+
+
+class JSONFileTokenStore(TokenStore):
+    """Keeps a token in a JSON file.
+
+       The file is replaced atomically on every save, so readers never see a
+       partial write, and `lock()` takes an exclusive `flock` on a sibling
+       ".lock" file to coordinate refreshes between processes. Loads are served
+       from memory until the file's inode, modification time or size changes;
+       an atomic replace always changes the inode, even within one mtime tick.
+
+       :param filename: Path to the JSON file.
+    """
+
+    def __init__(self, filename=MONZO_CACHE_FILE):
+        self.filename = filename
+        self._token = None
+        self._version = None
+        self._lock = threading.RLock()
+
+    def load(self):
+        with self._lock:
+            try:
+                version = self._file_version()
+            except FileNotFoundError:
+                return None
+            if version != self._version:
+                with open(self.filename, "r") as fp:
+                    self._token = codec.loads(fp.read())
+                self._version = version
+            return dict(self._token)
+
+    def save(self, token):
+        with self._lock:
+            atomic_write_json(self.filename, token)
+            self._token = dict(token)
+            self._version = self._file_version()
+
+    def _file_version(self):
+        stat = os.stat(self.filename)
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    @contextlib.contextmanager
+    def lock(self):
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.filename + ".lock", "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class SQLiteTokenStore(TokenStore):
+    """Keeps the tokens of many users in one SQLite database.
+
+       `lock()` takes a short per-user lease recorded in the database, so
+       processes sharing the database file coordinate refreshes of the same
+       user without blocking refreshes of other users. Use `for_user()` to get
+       the store of another user sharing this store's connection.
+
+       :param path: Path to the SQLite database file.
+       :param user_id: The user whose token this store loads and saves.
+       :param timeout: Seconds to wait for another process's lease before giving up.
+       :param lease: Seconds after which a lease held by a crashed process expires.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tokens (
+            user_id TEXT PRIMARY KEY,
+            token TEXT NOT NULL,
+            updated REAL NOT NULL,
+            locked_until REAL NOT NULL DEFAULT 0
+        );
+    """
+
+    def __init__(
+        self, path=MONZO_STORE_FILE, user_id=None, timeout=30, lease=30, _shared=None
+    ):
+        self.path, self.user_id = path, user_id
+        self.timeout, self.lease = timeout, lease
+        if _shared is None:
+            connection = sqlite3.connect(
+                path, timeout=timeout, isolation_level=None, check_same_thread=False
+            )
+            connection.executescript(self.SCHEMA)
+            _shared = (connection, threading.RLock())
+        self.connection, self._lock = _shared
+
+    def for_user(self, user_id):
+        """Gets the store of another user, sharing this store's connection.
+
+           :param user_id: The user whose token the new store loads and saves.
+           :rtype: A SQLiteTokenStore
+        """
+        return SQLiteTokenStore(
+            self.path,
+            user_id,
+            timeout=self.timeout,
+            lease=self.lease,
+            _shared=(self.connection, self._lock),
+        )
+
+    def users(self):
+        """Lists the users with a stored token.
+
+           :rtype: A list of user ids.
+        """
+        with self._lock:
+            rows = self.connection.execute(
+                "SELECT user_id FROM tokens WHERE token != 'null' ORDER BY user_id"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def load(self):
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT token FROM tokens WHERE user_id = ?", (self.user_id,)
+            ).fetchone()
+        return codec.loads(row[0]) if row else None
+
+    def save(self, token):
+        with self._lock:
+            self.connection.execute(
+                "INSERT INTO tokens (user_id, token, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (user_id) DO UPDATE "
+                "SET token = excluded.token, updated = excluded.updated",
+                (self.user_id, codec.dumps(token), time.time()),
+            )
+
+    def _acquire_lease(self):
+        now = time.time()
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO tokens (user_id, token, updated) "
+                "VALUES (?, 'null', ?)",
+                (self.user_id, now),
+            )
+            return self.connection.execute(
+                "UPDATE tokens SET locked_until = ? "
+                "WHERE user_id = ? AND locked_until <= ?",
+                (now + self.lease, self.user_id, now),
+            ).rowcount
+
+    @contextlib.contextmanager
+    def lock(self):
+        deadline = time.time() + self.timeout
+        while not self._acquire_lease():
+            if time.time() > deadline:
+                raise TimeoutError(
+                    "Timed out waiting to refresh the token of {0}".format(self.user_id)
+                )
+            time.sleep(0.05)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.connection.execute(
+                    "UPDATE tokens SET locked_until = 0 WHERE user_id = ?",
+                    (self.user_id,),
+                )
+
+    def close(self):
+        """Closes the underlying database connection."""
+        self.connection.close()
@@ -1,15 +1,83 @@
-import json
+import os
+import random
+import string
+import tempfile
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+from monzo import codec
 from monzo.const import MONZO_CACHE_FILE
 
 
+def atomic_write_json(filename, data):
+    """Writes data to a json file by writing a temporary file alongside it and
+    renaming it into place, so readers never see a partially written file."""
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, temporary = tempfile.mkstemp(dir=directory, prefix=".monzo-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as fp:
+            fp.write(codec.dumps(data, pretty=True))
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(temporary, filename)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
 def save_token_to_file(token, filename=MONZO_CACHE_FILE):
     """Saves a token dictionary to a json file"""
-    with open(filename, "w") as fp:
-        json.dump(token, fp, sort_keys=True, indent=4)
+    atomic_write_json(filename, token)
 
 
 def load_token_from_file(filename=MONZO_CACHE_FILE):
     """Loads a json file and returns a dictionary of its contents"""
     with open(filename, "r") as fp:
-        data = json.load(fp)
+        data = codec.loads(fp.read())
         return data
+
+
+def generate_dedupe_id(length=15):
+    """Generates a random string of ascii letters to use as a `dedupe_id`"""
+    return "".join(random.choice(string.ascii_letters) for i in range(length))
+
+
+def to_utc(value):
+    """Converts a datetime to a naive datetime in UTC. Naive datetimes are taken
+       to be in UTC already and are returned unchanged."""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def format_timestamp(value):
+    """Formats a datetime as an RFC 3339 string for the Monzo API.
+       Any other value (e.g. a transaction id or None) is returned unchanged."""
+    if isinstance(value, datetime):
+        return to_utc(value).isoformat() + "Z"
+    return value
+
+
+def split_time_windows(since, before, window):
+    """Splits the time range `[since, before)` into consecutive windows.
+
+       :param since: A datetime at which the first window starts.
+       :param before: A datetime at which the last window ends.
+       :param window: A timedelta giving the length of each window.
+       :rtype: A list of `(start, end)` datetime tuples.
+    """
+    windows = []
+    start = since
+    while start < before:
+        end = min(start + window, before)
+        windows.append((start, end))
+        start = end
+    return windows
+
+
+def endpoint_path(url):
+    """Normalises the path of a Monzo API url, e.g. "https://api.monzo.com//pots"
+       becomes "/pots"."""
+    return "/" + "/".join(
+        segment for segment in urlparse(url).path.split("/") if segment
+    )
@@ -0,0 +1,257 @@
+"""A lightweight receiver for Monzo webhook events.
+
+This module contains the class `WebhookReceiver`, an asyncio HTTP server for
+the events Monzo posts to URLs registered with `Monzo.register_webhook`
+(https://docs.monzo.com/#webhooks). Events are validated, put on a bounded
+queue and handed to a handler in batches, with a limit on how many batches
+are handled at the same time. When the queue is full, requests wait for
+space (and are eventually answered with a 503, which Monzo retries), so a
+slow handler pushes back on the sender rather than exhausting memory.
+
+With a `store`, transactions are written to it before the request is answered,
+so a failed write gets a 500 and Monzo delivers the event again. Handlers see
+events at most once: an event whose handler fails is only logged, and events
+still queued when the process dies are lost.
+"""
+
+import asyncio
+import logging
+from collections import namedtuple
+from functools import partial
+
+from monzo import codec
+
+logger = logging.getLogger(__name__)
+
+WebhookEvent = namedtuple("WebhookEvent", ["type", "data"])
+
+MAX_BODY_SIZE = 1024 * 1024  #: (int): The largest request body accepted, in bytes.
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+def parse_event(body, event_types=("transaction.created",)):
+    """Parses and validates the body of a webhook request.
+
+       :param body: The raw request body.
+       :param event_types: The event types to accept.
+       :rtype: A WebhookEvent
+    """
+    try:
+        payload = codec.loads(body)
+    except ValueError:
+        raise ValueError("The webhook body is not valid JSON.")
+    if not isinstance(payload, dict) or not isinstance(payload.get("data"), dict):
+        raise ValueError("The webhook body has no data object.")
+    if payload.get("type") not in event_types:
+        raise ValueError("Unexpected webhook type {0!r}.".format(payload.get("type")))
+    if payload["type"].startswith("transaction.") and not all(
+        key in payload["data"] for key in ("id", "account_id", "created")
+    ):
+        raise ValueError(
+            "The webhook transaction is missing id, account_id or created."
+        )
+    return WebhookEvent(payload["type"], payload["data"])
+
+
+class WebhookReceiver(object):
+    """An asyncio HTTP server which receives webhook events and dispatches them
+       to `handler` in batches.
+
+       :param handler: A callable (or coroutine function) taking a list of WebhookEvents.
+                       Plain callables are run in the default executor.
+       :param host: The interface to listen on.
+       :param port: The port to listen on (0 picks a free port).
+       :param path: The URL path events are posted to.
+       :param queue_size: The maximum number of events waiting to be handled.
+       :param batch_size: The maximum number of events handed to one handler call.
+       :param batch_timeout: Seconds to wait for a batch to fill before handling it anyway.
+       :param concurrency: The maximum number of handler calls running at the same time.
+       :param enqueue_timeout: Seconds a request waits for queue space before a 503.
+       :param store: An optional monzo.store.TransactionStore transactions are written to
+                     before the request is answered.
+       :param event_types: The event types to accept.
+       :param idle_timeout: Seconds a keep-alive connection may wait for its next request.
+    """
+
+    def __init__(
+        self,
+        handler,
+        host="127.0.0.1",
+        port=8080,
+        path="/",
+        queue_size=1000,
+        batch_size=50,
+        batch_timeout=0.5,
+        concurrency=4,
+        enqueue_timeout=5,
+        store=None,
+        event_types=("transaction.created",),
+        idle_timeout=30,
+    ):
+        self.handler = handler
+        self.host, self.port, self.path = host, port, path
+        self.queue_size = queue_size
+        self.batch_size, self.batch_timeout = batch_size, batch_timeout
+        self.concurrency = concurrency
+        self.enqueue_timeout = enqueue_timeout
+        self.store = store
+        self.event_types = tuple(event_types)
+        self.idle_timeout = idle_timeout
+        self.received = self.rejected = self.handled = self.failed = 0
+        self.server = None
+        self._queue = self._dispatcher = self._semaphore = None
+        self._handlers = set()
+        self._idle = set()
+        self._closing = False
+
+    async def start(self):
+        """Starts listening and dispatching events."""
+        self._closing = False
+        self._queue = asyncio.Queue(self.queue_size)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._dispatcher = asyncio.ensure_future(self._dispatch())
+        self.server = await asyncio.start_server(
+            self._handle_connection, self.host, self.port
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """Stops listening, then waits for every queued event to be handled."""
+        self._closing = True
+        self.server.close()
+        # Since Python 3.12 wait_closed() also waits for open connections, so
+        # idle keep-alive connections are closed; busy ones close once answered
+        for writer in list(self._idle):
+            writer.close()
+        await self.server.wait_closed()
+        await self._queue.join()
+        self._dispatcher.cancel()
+        await asyncio.gather(self._dispatcher, return_exceptions=True)
+
+    async def serve_forever(self):
+        """Starts the receiver and serves until cancelled."""
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            keep_alive = True
+            while keep_alive and not self._closing:
+                self._idle.add(writer)
+                try:
+                    request_line = await asyncio.wait_for(
+                        reader.readline(), self.idle_timeout
+                    )
+                finally:
+                    self._idle.discard(writer)
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close"
+
+                length = int(headers.get("content-length", 0))
+                if length > MAX_BODY_SIZE:
+                    status, keep_alive = 413, False
+                else:
+                    body = await reader.readexactly(length)
+                    status = await self._receive(method, path, body)
+                keep_alive = keep_alive and not self._closing
+                writer.write(
+                    "HTTP/1.1 {0} {1}\r\nContent-Length: 0\r\n"
+                    "Connection: {2}\r\n\r\n".format(
+                        status,
+                        _REASONS[status],
+                        "keep-alive" if keep_alive else "close",
+                    ).encode("latin-1")
+                )
+                await writer.drain()
+        except (
+            ValueError,
+            asyncio.IncompleteReadError,
+            asyncio.TimeoutError,
+            ConnectionError,
+        ):
+            pass
+        finally:
+            writer.close()
+
+    async def _receive(self, method, path, body):
+        if path.split("?")[0] != self.path:
+            return 404
+        if method != "POST":
+            return 405
+        try:
+            event = parse_event(body, self.event_types)
+        except ValueError:
+            self.rejected += 1
+            return 400
+        if self.store is not None and event.type.startswith("transaction."):
+            loop = asyncio.get_event_loop()
+            try:
+                await loop.run_in_executor(None, self._write_through, event)
+            except Exception:
+                logger.exception("Failed to store webhook event")
+                return 500
+        try:
+            await asyncio.wait_for(self._queue.put(event), self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            return 503
+        self.received += 1
+        return 200
+
+    async def _dispatch(self):
+        loop = asyncio.get_event_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_timeout
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._semaphore.acquire()
+            task = asyncio.ensure_future(self._handle_batch(batch))
+            self._handlers.add(task)
+            task.add_done_callback(self._handlers.discard)
+
+    async def _handle_batch(self, batch):
+        loop = asyncio.get_event_loop()
+        try:
+            if asyncio.iscoroutinefunction(self.handler):
+                await self.handler(batch)
+            else:
+                await loop.run_in_executor(None, partial(self.handler, batch))
+            self.handled += len(batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Failed to handle %d webhook events", len(batch))
+        finally:
+            self._semaphore.release()
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write_through(self, event):
+        self.store.upsert(event.data["account_id"], [event.data])
@@ -13,4 +13,9 @@ setup(name='monzo',
           'requests-oauthlib==1.0.0',
           'python-dotenv==0.5.1'
       ],
+      extras_require={
+          'async': ['aiohttp>=3.5'],
+          'columnar': ['numpy>=1.16'],
+          'fast': ['orjson>=3'],
+      },
       )
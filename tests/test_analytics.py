@@ -0,0 +1,130 @@
+import pytest
+
+from doubles.server import ACCOUNT_ID, FakeMonzoServer
+from monzo.analytics import SpendAnalytics
+from monzo.store import TransactionStore
+
+
+def transaction(id, created, amount, category="groceries", merchant=None, **fields):
+    return dict(
+        id=id,
+        account_id="acc_1",
+        created=created,
+        amount=amount,
+        currency="GBP",
+        category=category,
+        merchant=merchant,
+        **fields,
+    )
+
+
+def naive_totals(transactions, key):
+    totals = {}
+    for t in transactions:
+        if t.get("decline_reason"):
+            continue
+        totals[key(t)] = totals.get(key(t), 0) + t["amount"]
+    return totals
+
+
+@pytest.fixture
+def store():
+    store = TransactionStore(":memory:")
+    yield store
+    store.close()
+
+
+class TestSpendAnalytics:
+    def test_aggregates_follow_upserts(self, store):
+        analytics = SpendAnalytics(store)
+        store.upsert(
+            "acc_1",
+            [
+                transaction("tx_1", "2019-01-01T10:00:00Z", -500),
+                transaction("tx_2", "2019-01-01T11:00:00Z", -250, "eating_out"),
+                transaction("tx_3", "2019-01-02T09:00:00Z", 10000, "income"),
+                transaction(
+                    "tx_4", "2019-01-02T09:00:00Z", -99, decline_reason="INSUFFICIENT"
+                ),
+            ],
+        )
+        assert analytics.daily("acc_1") == [
+            {
+                "bucket": "2019-01-01",
+                "currency": "GBP",
+                "label": None,
+                "count": 2,
+                "total": -750,
+                "spend": 750,
+                "income": 0,
+            },
+            {
+                "bucket": "2019-01-02",
+                "currency": "GBP",
+                "label": None,
+                "count": 1,
+                "total": 10000,
+                "spend": 0,
+                "income": 10000,
+            },
+        ]
+        assert [row["bucket"] for row in analytics.top("acc_1", "category", 1)] == [
+            "groceries"
+        ]
+
+    def test_updated_transactions_replace_their_contribution(self, store):
+        analytics = SpendAnalytics(store)
+        store.upsert("acc_1", [transaction("tx_1", "2019-01-01T10:00:00Z", -500)])
+        store.upsert(
+            "acc_1",
+            [transaction("tx_1", "2019-01-01T10:00:00Z", -700, category="shopping")],
+        )
+        categories = analytics.by_category("acc_1")
+        assert [(row["bucket"], row["total"]) for row in categories] == [
+            ("shopping", -700)
+        ]
+        assert analytics.monthly("acc_1")[0]["count"] == 1
+
+    def test_merchants_are_labelled(self, store):
+        analytics = SpendAnalytics(store)
+        merchant = {"id": "merch_1", "name": "Tesco"}
+        store.upsert(
+            "acc_1",
+            [
+                transaction("tx_1", "2019-01-01T10:00:00Z", -500, merchant=merchant),
+                transaction("tx_2", "2019-01-02T10:00:00Z", -100, merchant="merch_1"),
+            ],
+        )
+        assert analytics.by_merchant("acc_1") == [
+            {
+                "bucket": "merch_1",
+                "currency": "GBP",
+                "label": "Tesco",
+                "count": 2,
+                "total": -600,
+                "spend": 600,
+                "income": 0,
+            }
+        ]
+
+    def test_existing_transactions_are_indexed(self, store):
+        store.upsert("acc_1", [transaction("tx_1", "2019-02-01T10:00:00Z", -500)])
+        analytics = SpendAnalytics(store)
+        assert analytics.monthly("acc_1", since="2019-02")[0]["total"] == -500
+        assert analytics.monthly("acc_1", before="2019-02") == []
+
+    def test_unknown_dimensions_are_rejected(self, store):
+        with pytest.raises(ValueError):
+            SpendAnalytics(store).totals("acc_1", "week")
+
+    def test_matches_naive_totals_after_sync(self, store):
+        analytics = SpendAnalytics(store)
+        with FakeMonzoServer(transactions=3000) as server:
+            server.client().sync_transactions(ACCOUNT_ID, store)
+            transactions = server.transactions
+        daily = naive_totals(transactions, lambda t: t["created"][:10])
+        merchants = naive_totals(transactions, lambda t: t["merchant"]["id"])
+        assert {r["bucket"]: r["total"] for r in analytics.daily(ACCOUNT_ID)} == daily
+        assert {
+            r["bucket"]: r["total"] for r in analytics.by_merchant(ACCOUNT_ID)
+        } == merchants
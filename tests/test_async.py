@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+web = pytest.importorskip("aiohttp.web")
+
+from monzo.aio import AsyncMonzo, AsyncMonzoOAuth2Client
+from monzo.errors import PageNotFoundError
+
+
+def run_against_app(app, scenario):
+    async def main():
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        client = AsyncMonzo("stubbed")
+        client.API_URL = "http://127.0.0.1:{0}".format(port)
+        try:
+            async with client:
+                return await scenario(client)
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+class TestAsyncMonzo:
+    @pytest.fixture
+    def seen(self):
+        return []
+
+    @pytest.fixture
+    def app(self, seen):
+        app = web.Application()
+
+        async def balance(request):
+            seen.append(request)
+            return web.json_response(
+                {"balance": 5000, "account": request.query["account_id"]}
+            )
+
+        async def deposit(request):
+            seen.append(request)
+            data = await request.post()
+            return web.json_response({"id": request.match_info["pot_id"], **data})
+
+        async def missing(request):
+            return web.json_response({"message": "nope"}, status=404)
+
+        app.router.add_get("/balance", balance)
+        app.router.add_put("/pots/{pot_id}/deposit", deposit)
+        app.router.add_get("/pots", missing)
+        return app
+
+    def test_concurrent_requests_share_one_client(self, app, seen):
+        async def scenario(client):
+            return await asyncio.gather(
+                *(client.get_balance("acc_{0}".format(i)) for i in range(20))
+            )
+
+        balances = run_against_app(app, scenario)
+        assert [b["account"] for b in balances] == [
+            "acc_{0}".format(i) for i in range(20)
+        ]
+        assert all(r.headers["Authorization"] == "Bearer stubbed" for r in seen)
+
+    def test_deposit_into_pot(self, app):
+        async def scenario(client):
+            return await client.deposit_into_pot("pot_1", "acc_1", 1000)
+
+        pot = run_against_app(app, scenario)
+        assert pot["id"] == "pot_1"
+        assert pot["amount"] == "1000"
+        assert len(pot["dedupe_id"]) == 15
+
+    def test_deposit_into_pot_with_a_dedupe_id(self, app):
+        async def scenario(client):
+            return await client.deposit_into_pot(
+                "pot_1", "acc_1", 1000, dedupe_id="deposit-1"
+            )
+
+        assert run_against_app(app, scenario)["dedupe_id"] == "deposit-1"
+
+    def test_errors_are_raised(self, app):
+        async def scenario(client):
+            return await client.get_pots()
+
+        with pytest.raises(PageNotFoundError):
+            run_against_app(app, scenario)
+
+    def test_page_size_is_bounded(self, app):
+        async def scenario(client):
+            return [t async for t in client.iter_transactions("acc_1", page_size=200)]
+
+        with pytest.raises(ValueError):
+            run_against_app(app, scenario)
+
+    def test_owned_session_is_closed(self):
+        async def main():
+            client = AsyncMonzoOAuth2Client(None, None, access_token="stubbed")
+            async with client:
+                session = client.session
+            return session.closed
+
+        assert asyncio.run(main()) is True
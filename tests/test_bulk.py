@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+from doubles.oauth import MonzoOAuth2Client
+from monzo.bulk import run_concurrently
+from monzo.errors import PageNotFoundError
+from monzo.monzo import Monzo
+
+
+class TestRunConcurrently:
+    def test_collects_results_and_errors_in_order(self):
+        def invert(value):
+            return 1 / value
+
+        results = run_concurrently(invert, [1, 0, 4], concurrency=3)
+        assert [r.item for r in results] == [1, 0, 4]
+        assert [r.result for r in results] == [1, None, 0.25]
+        assert isinstance(results[1].error, ZeroDivisionError)
+
+    def test_limits_concurrency(self):
+        in_flight, peak, lock = [0], [0], threading.Lock()
+
+        def work(item):
+            with lock:
+                in_flight[0] += 1
+                peak[0] = max(peak[0], in_flight[0])
+            time.sleep(0.01)
+            with lock:
+                in_flight[0] -= 1
+
+        run_concurrently(work, range(20), concurrency=4)
+        assert 1 < peak[0] <= 4
+
+
+class TestBulkEndpoints:
+    @pytest.fixture
+    def client(self):
+        def delete_webhook(method, params, data):
+            return {}
+
+        def deregister(method, params, data):
+            if data["id"] == "attach_missing":
+                raise PageNotFoundError("No such attachment")
+            return {}
+
+        oauth = MonzoOAuth2Client(
+            {
+                "/webhooks": lambda method, params, data: {
+                    "webhooks": [{"id": "webhook_1"}, {"id": "webhook_2"}]
+                },
+                "/webhooks/webhook_1": delete_webhook,
+                "/webhooks/webhook_2": delete_webhook,
+                "/attachment/deregister": deregister,
+                "/balance": lambda method, params, data: {
+                    "balance": len(params["account_id"])
+                },
+            }
+        )
+        return Monzo.from_oauth_session(oauth)
+
+    def test_delete_all_webhooks(self, client):
+        results = client.delete_all_webhooks("acc_1")
+        assert [(r.item, r.error) for r in results] == [
+            ("webhook_1", None),
+            ("webhook_2", None),
+        ]
+
+    def test_deregister_attachments_reports_failures(self, client):
+        results = client.deregister_attachments(
+            ["attach_1", "attach_missing", "attach_2"]
+        )
+        assert [r.error is None for r in results] == [True, False, True]
+        assert isinstance(results[1].error, PageNotFoundError)
+
+    def test_get_balances(self, client):
+        results = client.get_balances(["acc_1", "acc_22"])
+        assert [r.result["balance"] for r in results] == [5, 6]
@@ -0,0 +1,79 @@
+import pytest
+
+from doubles.session import OAuth2Session, Response
+from monzo.auth import MonzoOAuth2Client
+from monzo.cache import ResponseCache
+from monzo.monzo import Monzo
+
+
+class TestResponseCache:
+    def test_only_endpoints_with_a_ttl_are_cached(self):
+        cache = ResponseCache(ttls={"/pots": 60})
+        cache.store("https://api.monzo.com//pots", None, {"pots": []})
+        cache.store("https://api.monzo.com//balance", {"account_id": "a"}, {})
+        assert cache.lookup("https://api.monzo.com/pots") == ({"pots": []}, None)
+        assert cache.lookup("https://api.monzo.com/balance", {"account_id": "a"}) == (
+            None,
+            None,
+        )
+
+    def test_least_recently_used_is_evicted(self):
+        cache = ResponseCache(default_ttl=60, max_size=2)
+        for path in ("/a", "/b"):
+            cache.store(path, None, {"path": path})
+        cache.lookup("/a")
+        cache.store("/c", None, {"path": "/c"})
+        assert cache.lookup("/a")[0] == {"path": "/a"}
+        assert cache.lookup("/b")[0] is None
+
+    def test_expired_entries_keep_their_etag(self, monkeypatch):
+        cache = ResponseCache(default_ttl=60)
+        cache.store("/accounts", None, {"accounts": []}, etag='"v1"')
+        monkeypatch.setattr("monzo.cache.time.monotonic", lambda: float("inf"))
+        assert cache.lookup("/accounts") == (None, '"v1"')
+
+    def test_writes_invalidate_related_resources(self):
+        cache = ResponseCache(default_ttl=60)
+        cache.store("/pots", None, {})
+        cache.store("/balance", {"account_id": "a"}, {})
+        cache.store("/webhooks", {"account_id": "a"}, {})
+        cache.invalidate("https://api.monzo.com//pots/pot_1/deposit")
+        assert len(cache) == 1
+
+
+class TestCachedRequests:
+    def make_client(self, responses):
+        oauth = MonzoOAuth2Client(None, None, access_token="stubbed", cache=True)
+        oauth.session = OAuth2Session(responses)
+        return Monzo.from_oauth_session(oauth)
+
+    def test_repeated_reads_hit_the_cache(self):
+        client = self.make_client([Response(200, {"accounts": [{"id": "acc_1"}]})])
+        assert client.get_first_account() == {"id": "acc_1"}
+        client.get_accounts()["accounts"].append("mutated")
+        assert client.get_accounts() == {"accounts": [{"id": "acc_1"}]}
+        assert len(client.oauth_session.session.requests) == 1
+
+    def test_stale_responses_are_revalidated(self, monkeypatch):
+        client = self.make_client(
+            [
+                Response(200, {"pots": ["pot_1"]}, {"ETag": '"v1"'}),
+                Response(304, headers={"ETag": '"v1"'}),
+            ]
+        )
+        client.get_pots()
+        monkeypatch.setattr("monzo.cache.time.monotonic", lambda: 10.0 ** 9)
+        assert client.get_pots() == {"pots": ["pot_1"]}
+        method, url, kwargs = client.oauth_session.session.requests[1]
+        assert kwargs["headers"] == {"If-None-Match": '"v1"'}
+
+    def test_deposit_invalidates_pots(self):
+        client = self.make_client([Response(200, {"pots": []})])
+        client.get_pots()
+        client.deposit_into_pot("pot_1", "acc_1", 100)
+        client.get_pots()
+        assert [r[0] for r in client.oauth_session.session.requests] == [
+            "GET",
+            "PUT",
+            "GET",
+        ]
@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from doubles.server import ACCOUNT_ID, FakeMonzoServer
+from monzo.changes import CREATED, SETTLED, UPDATED, ChangeTracker, content_hash
+from monzo.store import TransactionStore
+
+# The fake server creates one transaction a minute from 2019-01-01
+NOW = datetime(2019, 1, 1, 1, 0)
+
+
+@pytest.fixture
+def server():
+    with FakeMonzoServer(transactions=60) as server:
+        server.transactions[5]["settled"] = ""
+        yield server
+
+
+@pytest.fixture
+def store():
+    store = TransactionStore(":memory:")
+    yield store
+    store.close()
+
+
+def tracker_for(store):
+    return ChangeTracker(
+        store, window=timedelta(minutes=10), pending_window=timedelta(hours=1)
+    )
+
+
+def kinds(changes):
+    return [(change.kind, change.transaction["id"]) for change in changes]
+
+
+class TestChangeTracker:
+    def test_the_first_sync_creates_everything(self, server, store):
+        changes = tracker_for(store).sync(server.client(), ACCOUNT_ID, now=NOW)
+        assert {change.kind for change in changes} == {CREATED}
+        assert len(changes) == store.count() == 60
+
+    def test_only_the_window_is_refetched(self, server, store):
+        tracker, client = tracker_for(store), server.client()
+        tracker.sync(client, ACCOUNT_ID, now=NOW)
+        assert tracker.window_start(ACCOUNT_ID, now=NOW) == "2019-01-01T00:05:00.000Z"
+        server.reset_stats()
+        assert tracker.sync(client, ACCOUNT_ID, now=NOW) == []
+        assert server.requests_by_path["/transactions"] == 1
+
+    def test_updates_and_settlements_are_detected(self, server, store):
+        tracker, client = tracker_for(store), server.client()
+        tracker.sync(client, ACCOUNT_ID, now=NOW)
+        server.transactions[55]["notes"] = "Lunch"
+        server.transactions[5]["settled"] = "2019-01-01T00:30:00.000Z"
+        server.transactions[60:] = [dict(server.transactions[59], id="tx_new")]
+        server.transactions[2]["notes"] = "Too old to notice"
+        changes = tracker.sync(client, ACCOUNT_ID, now=NOW)
+        assert kinds(changes) == [
+            (SETTLED, server.transactions[5]["id"]),
+            (UPDATED, server.transactions[55]["id"]),
+            (CREATED, "tx_new"),
+        ]
+        assert changes[1].previous["notes"] == ""
+        assert store.get_transaction(server.transactions[55]["id"])["notes"] == "Lunch"
+        assert store.get_transaction(server.transactions[2]["id"])["notes"] == ""
+
+    def test_aware_times_are_normalised_to_utc(self, server, store):
+        tracker = tracker_for(store)
+        tracker.sync(server.client(), ACCOUNT_ID, now=NOW)
+        aware = NOW.replace(tzinfo=timezone.utc).astimezone(
+            timezone(timedelta(hours=2))
+        )
+        assert tracker.window_start(ACCOUNT_ID, now=aware) == "2019-01-01T00:05:00.000Z"
+
+    def test_settled_transactions_leave_the_window(self, server, store):
+        tracker, client = tracker_for(store), server.client()
+        tracker.sync(client, ACCOUNT_ID, now=NOW)
+        server.transactions[5]["settled"] = "2019-01-01T00:30:00.000Z"
+        tracker.sync(client, ACCOUNT_ID, now=NOW)
+        assert tracker.window_start(ACCOUNT_ID, now=NOW) == "2019-01-01T00:50:00Z"
+
+    def test_subscribers_see_every_upsert(self, store):
+        tracker, seen = tracker_for(store), []
+        tracker.subscribe(seen.append)
+        transaction = {"id": "tx_1", "created": "2019-01-01T00:00:00Z", "notes": ""}
+        store.upsert(ACCOUNT_ID, [transaction])
+        store.upsert(ACCOUNT_ID, [transaction])
+        store.upsert(ACCOUNT_ID, [dict(transaction, notes="Updated")])
+        assert [change.kind for change in seen] == [CREATED, UPDATED]
+
+    def test_hashes_are_built_for_stored_transactions(self, server, store):
+        server.client().sync_transactions(ACCOUNT_ID, store=store)
+        tracker = tracker_for(store)
+        assert tracker.sync(server.client(), ACCOUNT_ID, now=NOW) == []
+
+    def test_content_hash_ignores_key_order(self):
+        assert content_hash({"a": 1, "b": 2}) == content_hash({"b": 2, "a": 1})
+        assert content_hash({"a": 1}) != content_hash({"a": 2})
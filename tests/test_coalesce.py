@@ -0,0 +1,120 @@
+import threading
+import time
+
+import pytest
+
+from doubles.server import ACCOUNT_ID, POT_ID, FakeMonzoServer
+from monzo.coalesce import RequestCoalescer
+
+
+def run_threads(count, target):
+    results, errors = [], []
+
+    def run():
+        try:
+            results.append(target())
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, results, errors
+
+
+class TestRequestCoalescer:
+    def test_concurrent_identical_calls_share_one_call(self):
+        coalescer, release, calls = RequestCoalescer(), threading.Event(), []
+
+        def fetch():
+            calls.append(1)
+            release.wait()
+            return {"balance": 100}
+
+        url = "https://api.monzo.com//balance"
+        threads, results, _ = run_threads(
+            10, lambda: coalescer.call(url, {"account_id": "acc_1"}, fetch)
+        )
+        while len(calls) < 1 or coalescer.stats()["/balance"]["calls"] < 10:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == [{"balance": 100}] * 10
+        assert len({id(result) for result in results}) == 10
+        assert coalescer.stats() == {
+            "/balance": {"calls": 10, "upstream": 1, "saved": 9}
+        }
+        assert coalescer.saved == 9
+
+    def test_different_params_are_not_coalesced(self):
+        coalescer = RequestCoalescer()
+        coalescer.call("/balance", {"account_id": "a"}, lambda: 1)
+        coalescer.call("/balance", {"account_id": "b"}, lambda: 2)
+        coalescer.call("/balance", {"account_id": "a"}, lambda: 3)
+        assert coalescer.stats()["/balance"]["upstream"] == 3
+
+    def test_errors_are_shared(self):
+        coalescer, release = RequestCoalescer(), threading.Event()
+
+        def fetch():
+            release.wait()
+            raise ValueError("boom")
+
+        threads, results, errors = run_threads(
+            4, lambda: coalescer.call("/pots", None, fetch)
+        )
+        while coalescer.stats()["/pots"]["calls"] < 4:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert results == []
+        assert len(errors) == 4
+        assert coalescer.stats()["/pots"]["upstream"] == 1
+
+
+class TestCoalescedRequests:
+    @pytest.fixture
+    def server(self):
+        with FakeMonzoServer(transactions=10, latency=0.1) as server:
+            yield server
+
+    def test_concurrent_reads_make_one_request(self, server):
+        client = server.client(coalesce=True, pool_maxsize=10)
+        threads, results, errors = run_threads(
+            10, lambda: client.get_balance(ACCOUNT_ID)
+        )
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert len(results) == 10
+        assert server.requests == 1
+        assert client.oauth_session.coalescer.stats()["/balance"]["saved"] == 9
+
+    def test_responses_extended_by_callers_are_shared(self, server):
+        # get_transactions adds a `next_page` partial bound to the client to
+        # its response, which followers must not have to copy
+        client = server.client(coalesce=True, pool_maxsize=8)
+        threads, results, errors = run_threads(
+            8, lambda: client.get_transactions(ACCOUNT_ID, limit=5)
+        )
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert server.requests == 1
+        assert all(len(result["transactions"]) == 5 for result in results)
+        assert all(callable(result["next_page"]) for result in results)
+        assert len({id(result["transactions"]) for result in results}) == 8
+
+    def test_writes_are_not_coalesced(self, server):
+        client = server.client(coalesce=True, pool_maxsize=4)
+        threads, _, errors = run_threads(
+            4, lambda: client.deposit_into_pot(POT_ID, ACCOUNT_ID, 100)
+        )
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert server.pots[POT_ID]["balance"] == 400
@@ -0,0 +1,44 @@
+import pytest
+
+from monzo import codec
+from monzo.auth import MonzoOAuth2Client
+from doubles.session import OAuth2Session, Response
+
+
+@pytest.fixture(params=codec.available_backends())
+def backend(request):
+    previous = codec.get_backend().name
+    yield codec.set_backend(request.param)
+    codec.set_backend(previous)
+
+
+class TestCodec:
+    def test_fastest_backend_is_selected(self):
+        assert codec.get_backend().name == codec.available_backends()[0]
+        assert codec.available_backends()[-1] == "json"
+
+    def test_round_trips(self, backend):
+        data = {"id": "tx_1", "amount": -120, "merchant": None, "notes": "Café"}
+        assert codec.loads(codec.dumps(data)) == data
+        assert codec.loads(codec.dumps(data).encode("utf-8")) == data
+
+    def test_pretty_output_is_sorted_and_indented(self, backend):
+        dumped = codec.dumps({"b": 1, "a": [1]}, pretty=True)
+        assert dumped.index('"a"') < dumped.index('"b"')
+        assert "\n" in dumped
+        assert codec.dumps({200: 1}) == codec.dumps({"200": 1})
+
+    def test_invalid_json_raises_value_error(self, backend):
+        with pytest.raises(ValueError):
+            codec.loads(b'{"transactions": [')
+
+    def test_unknown_backends_are_rejected(self):
+        with pytest.raises(ValueError):
+            codec.set_backend("yaml")
+
+    def test_responses_are_decoded_with_the_backend(self, backend):
+        oauth = MonzoOAuth2Client(None, None, access_token="stubbed")
+        oauth.session = OAuth2Session([Response(200, {"accounts": [{"id": "a"}]})])
+        assert oauth.make_request("https://api.monzo.com//accounts") == {
+            "accounts": [{"id": "a"}]
+        }
@@ -0,0 +1,77 @@
+import pytest
+
+numpy = pytest.importorskip("numpy")
+
+from monzo.columnar import to_columns
+from monzo.models import Transaction
+from monzo.store import TransactionStore
+
+
+@pytest.fixture
+def transactions():
+    return [
+        {
+            "id": "tx_1",
+            "amount": -510,
+            "account_balance": 13013,
+            "created": "2015-08-22T12:20:18Z",
+            "settled": "2015-08-23T12:20:18Z",
+            "currency": "GBP",
+            "category": "eating_out",
+            "merchant": {"id": "merch_1", "name": "Deli"},
+        },
+        {
+            "id": "tx_2",
+            "amount": 2000,
+            "account_balance": 15013,
+            "created": "2015-08-23T09:00:00.123Z",
+            "settled": "",
+            "currency": "GBP",
+            "category": "general",
+            "merchant": None,
+        },
+        {
+            "id": "tx_3",
+            "amount": -679,
+            "account_balance": 14334,
+            "created": "2015-08-23T16:15:03Z",
+            "settled": "2015-08-24T16:15:03Z",
+            "currency": "EUR",
+            "category": "eating_out",
+            "merchant": "merch_1",
+        },
+    ]
+
+
+class TestToColumns:
+    def test_numeric_and_timestamp_columns(self, transactions):
+        columns = to_columns(transactions)
+        assert columns["amount"].dtype == numpy.int64
+        assert columns["amount"].sum() == 811
+        assert columns["created"].dtype == numpy.dtype("datetime64[ms]")
+        assert columns["created"][1] == numpy.datetime64("2015-08-23T09:00:00.123")
+        assert numpy.isnat(columns["settled"][1])
+
+    def test_dictionary_columns(self, transactions):
+        columns = to_columns(transactions)
+        category = columns["category"]
+        assert list(category.categories) == ["eating_out", "general"]
+        assert list(category.codes) == [0, 1, 0]
+        assert list(columns["merchant"].decode()) == ["merch_1", None, "merch_1"]
+        spend = numpy.bincount(
+            category.codes,
+            weights=columns["amount"],
+            minlength=len(category.categories),
+        )
+        assert list(spend) == [-1189, 2000]
+
+    def test_models_and_dicts_agree(self, transactions):
+        models = [Transaction.from_dict(t) for t in transactions]
+        from_models, from_dicts = to_columns(models), to_columns(transactions)
+        assert (from_models["created"] == from_dicts["created"]).all()
+        assert list(from_models["merchant"].codes) == list(from_dicts["merchant"].codes)
+
+    def test_store_export(self, transactions):
+        store = TransactionStore(":memory:")
+        store.upsert("acc_1", transactions)
+        assert list(store.to_columns("acc_1")["id"]) == ["tx_1", "tx_2", "tx_3"]
@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+from doubles.server import ACCOUNT_ID, POT_ID, FakeMonzoServer
+from monzo.errors import TooManyRequestsError
+
+
+@pytest.fixture
+def server():
+    with FakeMonzoServer(transactions=250, page_size=100) as server:
+        yield server
+
+
+class TestFakeServer:
+    def test_paginates_over_http(self, server):
+        client = server.client()
+        ids = [t["id"] for t in client.iter_transactions(ACCOUNT_ID)]
+        assert ids == [t["id"] for t in server.transactions]
+        assert server.requests_by_path["/transactions"] == 3
+
+    def test_refreshes_expired_tokens_once(self, server):
+        server.token_lifetime = 2
+        client = server.client(max_refresh_attempts=1)
+        for _ in range(5):
+            client.whoami()
+        assert server.unauthorized == 2
+        assert server.refreshes == 2
+        assert client.oauth_session.session.access_token == "access_2"
+
+    def test_refresh_storm_refreshes_once(self, server):
+        client = server.client()
+        client.whoami()
+        server.expire_token()
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(client.whoami()))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(results) == 8
+        assert server.refreshes == 1
+
+    def test_retries_rate_limited_requests(self, server):
+        server.rate_limit_every = 2
+        client = server.client(rate_limit_retries=1)
+        for _ in range(3):
+            assert client.get_accounts()["accounts"][0]["id"] == ACCOUNT_ID
+        assert server.rate_limited == 2
+        assert server.requests == 5
+
+    def test_gives_up_on_rate_limits(self, server):
+        server.rate_limit_every = 1
+        client = server.client(rate_limit_retries=1)
+        with pytest.raises(TooManyRequestsError):
+            client.whoami()
+
+    def test_revalidates_cached_responses(self, server, monkeypatch):
+        client = server.client(cache=True)
+        client.get_pots()
+        client.get_pots()
+        assert server.requests == 1
+        client.oauth_session.cache.ttls["/pots"] = 0
+        monkeypatch.setattr("monzo.cache.time.monotonic", lambda: float("inf"))
+        assert client.get_pots()["pots"][0]["id"] == POT_ID
+        assert server.requests == 2
+
+    def test_deposits_are_deduplicated(self, server):
+        client = server.client()
+        client.deposit_into_pot(POT_ID, ACCOUNT_ID, 500)
+        client.withdraw_from_pot(ACCOUNT_ID, POT_ID, 200)
+        assert server.pots[POT_ID]["balance"] == 300
+        assert client.get_balance(ACCOUNT_ID)["balance"] == 100000 - 300
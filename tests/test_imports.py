@@ -0,0 +1,64 @@
+import subprocess
+import sys
+
+import pytest
+
+from monzo import tokens
+from monzo.auth import MonzoOAuth2Client
+
+HEAVY = ("requests", "requests_oauthlib", "oauthlib", "urllib3", "concurrent.futures")
+
+
+def loaded_after(statement):
+    code = "import sys; {0}; print(' '.join(sorted(sys.modules)))".format(statement)
+    output = subprocess.check_output([sys.executable, "-c", code])
+    return set(output.decode().split())
+
+
+class TestLazyImports:
+    @pytest.mark.parametrize(
+        "statement", ["import monzo", "import monzo.tokens", "from monzo import Monzo"],
+    )
+    def test_transport_is_not_imported(self, statement):
+        assert loaded_after(statement).isdisjoint(HEAVY)
+
+    def test_transport_is_imported_with_the_first_session(self):
+        modules = loaded_after(
+            "from monzo import MonzoOAuth2Client; "
+            "MonzoOAuth2Client(None, None, access_token='a').session"
+        )
+        assert "requests_oauthlib" in modules
+
+    def test_lazy_attributes(self):
+        import monzo
+
+        assert monzo.MonzoOAuth2Client is MonzoOAuth2Client
+        with pytest.raises(AttributeError):
+            monzo.Missing
+
+
+class TestTokens:
+    def test_authorization_url_matches_the_client(self):
+        client = MonzoOAuth2Client("client_id", "secret")
+        expected = client.authorize_token_url(
+            redirect_uri="http://localhost/callback", state="abc"
+        )
+        assert (
+            tokens.authorization_url("client_id", "http://localhost/callback", "abc")
+            == expected
+        )
+
+    def test_parse_redirect(self):
+        url = "http://localhost/callback?code=the_code&state=abc"
+        assert tokens.parse_redirect(url, state="abc") == "the_code"
+        with pytest.raises(ValueError):
+            tokens.parse_redirect(url, state="other")
+        with pytest.raises(ValueError):
+            tokens.parse_redirect("http://localhost/callback?error=access_denied")
+
+    def test_is_expiring(self):
+        token = {"access_token": "a", "refresh_token": "r", "expires_at": 1000}
+        assert tokens.is_expiring(token, margin=60, now=950)
+        assert not tokens.is_expiring(token, margin=60, now=900)
+        assert not tokens.is_expiring(dict(token, refresh_token=None), now=2000)
+        assert tokens.expires_in({"access_token": "a"}) is None
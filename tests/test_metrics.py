@@ -0,0 +1,93 @@
+import json
+
+import pytest
+
+from doubles.session import OAuth2Session, Response
+from monzo.auth import MonzoOAuth2Client
+from monzo.errors import PageNotFoundError
+from monzo.metrics import Histogram, Hooks, MetricsCollector, endpoint_template
+
+
+class RecordingHooks(Hooks):
+    def __init__(self):
+        self.events = []
+
+    def request_started(self, method, endpoint):
+        self.events.append(("started", endpoint))
+
+    def request_finished(self, method, endpoint, status_code, duration, error=None):
+        self.events.append(("finished", status_code, type(error).__name__))
+
+    def request_retried(self, method, endpoint, attempt, error):
+        self.events.append(("retried", attempt))
+
+    def token_refreshed(self, duration):
+        self.events.append(("refreshed",))
+
+
+class TestMetrics:
+    def test_endpoint_template(self):
+        assert (
+            endpoint_template("https://api.monzo.com//pots/pot_00009/deposit")
+            == "/pots/{id}/deposit"
+        )
+        assert endpoint_template("https://api.monzo.com/ping/whoami") == "/ping/whoami"
+
+    def test_histogram_quantiles(self):
+        histogram = Histogram(buckets=(0.1, 1))
+        for value in (0.05, 0.05, 0.5, 5):
+            histogram.observe(value)
+        assert histogram.counts == [2, 1, 1]
+        assert histogram.quantile(0.5) == 0.1
+        assert histogram.quantile(0.99) == float("inf")
+
+    def make_client(self, responses, hooks):
+        client = MonzoOAuth2Client(
+            "client_id", "secret", refresh_callback=None, hooks=hooks
+        )
+        client.session = OAuth2Session(responses)
+        return client
+
+    def test_hooks_see_retries_and_refreshes(self, monkeypatch):
+        monkeypatch.setattr("monzo.auth.time.sleep", lambda seconds: None)
+        hooks = RecordingHooks()
+        client = self.make_client(
+            [
+                Response(429, {"message": "slow down"}),
+                Response(401, {"message": "expired"}),
+                Response(200, {}),
+            ],
+            hooks,
+        )
+        client.make_request("https://api.monzo.com//pots/pot_1/deposit", method="PUT")
+        assert hooks.events == [
+            ("started", "/pots/{id}/deposit"),
+            ("finished", 429, "TooManyRequestsError"),
+            ("retried", 1),
+            ("started", "/pots/{id}/deposit"),
+            ("finished", 401, "UnauthorizedError"),
+            ("retried", 1),
+            ("refreshed",),
+            ("started", "/pots/{id}/deposit"),
+            ("finished", 200, "NoneType"),
+        ]
+
+    def test_collector(self):
+        collector = MetricsCollector()
+        client = self.make_client(
+            [Response(200, {}), Response(404, {"message": "missing"})], collector
+        )
+        client.make_request("https://api.monzo.com/accounts")
+        with pytest.raises(PageNotFoundError):
+            client.make_request("https://api.monzo.com/accounts")
+
+        snapshot = json.loads(collector.dump())
+        accounts = snapshot["endpoints"]["GET /accounts"]
+        assert accounts["requests"] == 2
+        assert accounts["statuses"] == {"200": 1, "404": 1}
+        assert accounts["errors"] == {"PageNotFoundError": 1}
+        assert snapshot["in_flight"] == 0
+        assert (
+            'monzo_errors_total{method="GET",endpoint="/accounts",error="PageNotFoundError"} 1'
+            in (collector.prometheus())
+        )
@@ -0,0 +1,75 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from doubles.oauth import MonzoOAuth2Client, paginated_transactions
+from monzo.models import Balance, Pot, Transaction
+from monzo.monzo import Monzo
+
+
+@pytest.fixture
+def transaction():
+    return {
+        "account_balance": 13013,
+        "amount": -510,
+        "created": "2015-08-22T12:20:18Z",
+        "currency": "GBP",
+        "description": "THE DE BEAUVOIR DELI C LONDON        GBR",
+        "id": "tx_00008zIcpb1TB4yeIFXMzx",
+        "merchant": {
+            "id": "merch_00008zIcpbAKe8shBxXUtl",
+            "group_id": "grp_00008zIcpbBOaAr7TTP3sv",
+            "name": "The De Beauvoir Deli Co.",
+            "category": "eating_out",
+            "created": "2015-08-22T12:20:18Z",
+        },
+        "metadata": {},
+        "notes": "Salmon sandwich",
+        "is_load": False,
+        "settled": "",
+        "category": "eating_out",
+    }
+
+
+class TestModels:
+    def test_transaction_fields(self, transaction):
+        model = Transaction.from_dict(transaction)
+        assert model.amount == -510
+        assert model.merchant.name == "The De Beauvoir Deli Co."
+        assert model.created == datetime(2015, 8, 22, 12, 20, 18, tzinfo=timezone.utc)
+        assert model.settled is None
+        assert not hasattr(model, "__dict__")
+
+    def test_timestamps_are_parsed_lazily(self, transaction):
+        model = Transaction.from_dict(transaction)
+        assert model._created_at is None
+        assert model.created is model.created
+
+    def test_repeated_values_are_shared(self, transaction):
+        merchants = {}
+        first = Transaction.from_dict(transaction, merchants)
+        second = Transaction.from_dict(
+            dict(transaction, id="tx_2", currency="".join("GBP")), merchants
+        )
+        assert first.merchant is second.merchant
+        assert first.currency is second.currency
+
+    def test_round_trip(self, transaction):
+        model = Transaction.from_dict(transaction)
+        assert Transaction.from_dict(model.to_dict()) == model
+        assert model.to_dict()["created"] == "2015-08-22T12:20:18Z"
+
+    def test_pot_and_balance(self):
+        pot = Pot.from_dict(
+            {"id": "pot_1", "balance": 100, "updated": "2018-02-11T18:38:56.624Z"}
+        )
+        assert pot.updated.microsecond == 624000
+        assert Balance.from_dict({"balance": 5000, "currency": "GBP"}).balance == 5000
+
+    def test_iter_transactions_as_models(self, transaction):
+        oauth = MonzoOAuth2Client(
+            {"/transactions": paginated_transactions([transaction])}
+        )
+        client = Monzo.from_oauth_session(oauth)
+        models = list(client.iter_transactions("acc_1", as_models=True))
+        assert [m.id for m in models] == [transaction["id"]]
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from doubles.oauth import MonzoOAuth2Client, paginated_transactions
+from monzo.monzo import Monzo
+
+
+def make_transactions(count):
+    return [
+        {"id": "tx_{0:05d}".format(i), "created": "2019-01-01T00:00:00Z", "amount": -i}
+        for i in range(count)
+    ]
+
+
+class TestIterTransactions:
+    @pytest.fixture
+    def oauth(self):
+        routes = {"/transactions": paginated_transactions(make_transactions(250))}
+        return MonzoOAuth2Client(routes)
+
+    @pytest.fixture
+    def client(self, oauth):
+        return Monzo.from_oauth_session(oauth)
+
+    def test_yields_every_transaction_in_order(self, client):
+        ids = [t["id"] for t in client.iter_transactions("acc_1")]
+        assert ids == [t["id"] for t in make_transactions(250)]
+
+    def test_fetches_pages_lazily(self, client, oauth):
+        transactions = client.iter_transactions("acc_1", page_size=50)
+        assert oauth.requests == []
+        next(transactions)
+        assert len(oauth.requests) == 1
+        for _ in range(50):
+            next(transactions)
+        assert len(oauth.requests) == 2
+        assert oauth.requests[1][2]["since"] == "tx_00049"
+
+    def test_stops_on_empty_page(self, client, oauth):
+        assert len(list(client.iter_transactions("acc_1", page_size=50))) == 250
+        assert len(oauth.requests) == 6
+
+    @pytest.mark.parametrize("page_size", [0, 101])
+    def test_page_size_is_bounded(self, client, oauth, page_size):
+        with pytest.raises(ValueError):
+            next(client.iter_transactions("acc_1", page_size=page_size))
+        assert oauth.requests == []
+
+    def test_get_transactions_with_empty_page(self):
+        oauth = MonzoOAuth2Client({"/transactions": paginated_transactions([])})
+        response = Monzo.from_oauth_session(oauth).get_transactions("acc_1", limit=10)
+        assert response["transactions"] == []
+        assert "next_page" not in response
+
+
+class TestBackfillTransactions:
+    @pytest.fixture
+    def transactions(self):
+        start = datetime(2019, 1, 1)
+        return [
+            {
+                "id": "tx_{0:05d}".format(i),
+                "created": (start + timedelta(hours=7 * i)).isoformat() + "Z",
+                "amount": -i,
+            }
+            for i in range(400)
+        ]
+
+    @pytest.fixture
+    def client(self, transactions):
+        oauth = MonzoOAuth2Client(
+            {"/transactions": paginated_transactions(transactions)}
+        )
+        return Monzo.from_oauth_session(oauth)
+
+    def test_merges_windows_in_created_order(self, client, transactions):
+        backfilled = client.backfill_transactions(
+            "acc_1",
+            since=datetime(2019, 1, 1),
+            before=datetime(2019, 6, 1),
+            window=timedelta(days=10),
+            workers=4,
+        )
+        assert [t["id"] for t in backfilled] == [t["id"] for t in transactions]
+
+    def test_accepts_timezone_aware_datetimes(self, client, transactions):
+        backfilled = client.backfill_transactions(
+            "acc_1",
+            since=datetime(2019, 1, 1, 1, tzinfo=timezone(timedelta(hours=1))),
+            window=timedelta(days=365),
+        )
+        assert [t["id"] for t in backfilled] == [t["id"] for t in transactions]
+
+    def test_reports_progress(self, client):
+        calls = []
+        list(
+            client.backfill_transactions(
+                "acc_1",
+                since=datetime(2019, 1, 1),
+                before=datetime(2019, 2, 1),
+                window=timedelta(days=7),
+                progress=lambda completed, total: calls.append((completed, total)),
+            )
+        )
+        assert calls == [(i, 5) for i in range(1, 6)]
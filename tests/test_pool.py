@@ -0,0 +1,133 @@
+import threading
+
+import pytest
+
+from doubles.server import FakeMonzoServer
+from monzo.cache import ResponseCache
+from monzo.coalesce import RequestCoalescer
+from monzo.monzo import Monzo
+from monzo.pool import MonzoClientPool
+from monzo.tokenstore import SQLiteTokenStore
+
+
+@pytest.fixture
+def store():
+    store = SQLiteTokenStore(":memory:")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def server():
+    with FakeMonzoServer(transactions=0) as server:
+        yield server
+
+
+def make_pool(server, store, users=5, **kwargs):
+    pool = MonzoClientPool(store, "client_id", "client_secret", **kwargs)
+    for i in range(users):
+        token = "token_{0}".format(i)
+        server.tokens[token] = 0
+        pool.add_user(
+            "user_{0}".format(i), {"access_token": token, "refresh_token": "refresh"}
+        )
+    return pool
+
+
+def point_at(server):
+    """Points every pooled client at the fake server."""
+
+    def whoami(client):
+        client.API_URL = server.url + "/"
+        client.oauth_session._refresh_token_url = server.url + "/oauth2/token"
+        return client.whoami()
+
+    return whoami
+
+
+class TestMonzoClientPool:
+    def test_clients_share_one_adapter(self, server, store):
+        with make_pool(server, store) as pool:
+            results = pool.map(point_at(server), pool.users())
+            assert all(result["authenticated"] for result in results.values())
+            sessions = [pool.client(user).oauth_session for user in pool.users()]
+            assert {id(s.adapter) for s in sessions} == {id(pool.adapter)}
+            assert {id(s.session.get_adapter(server.url)) for s in sessions} == {
+                id(pool.adapter)
+            }
+
+    def test_least_recently_used_clients_are_evicted(self, server, store):
+        with make_pool(server, store, max_clients=2) as pool:
+            first = pool.client("user_0")
+            pool.client("user_1")
+            assert pool.client("user_0") is first
+            pool.client("user_2")
+            assert len(pool) == 2
+            assert pool.evictions == 1
+            assert pool.client("user_0") is first
+
+    def test_idle_clients_are_evicted(self, server, store, monkeypatch):
+        with make_pool(server, store, idle_timeout=60) as pool:
+            clock = [1000.0]
+            monkeypatch.setattr("monzo.pool.time.monotonic", lambda: clock[0])
+            pool.client("user_0")
+            clock[0] += 61
+            pool.client("user_1")
+            assert len(pool) == 1
+
+    def test_tokens_are_refreshed_lazily_and_saved(self, server, store):
+        with make_pool(server, store) as pool:
+            del server.tokens["token_3"]
+            results = pool.map(point_at(server), ["user_3", "user_4"])
+            assert all(result["authenticated"] for result in results.values())
+            assert server.refreshes == 1
+            assert store.for_user("user_3").load()["access_token"] == "access_1"
+            assert store.for_user("user_4").load()["access_token"] == "token_4"
+
+    def test_users_get_their_own_cache_and_coalescer(self, server, store):
+        with make_pool(server, store, users=2, cache=True, coalesce=True) as pool:
+            pool.map(point_at(server), pool.users())
+            first, second = (pool.client(user).oauth_session for user in pool.users())
+            assert first.cache is not second.cache
+            assert first.coalescer is not second.coalescer
+            server.reset_stats()
+            for user in pool.users():
+                pool.client(user).get_accounts()
+            assert server.requests == 2
+
+    @pytest.mark.parametrize(
+        "option", [{"cache": ResponseCache()}, {"coalesce": RequestCoalescer()}]
+    )
+    def test_shared_caches_are_rejected(self, store, option):
+        with pytest.raises(ValueError):
+            MonzoClientPool(store, **option)
+
+    def test_users_take_turns(self, store):
+        pool = MonzoClientPool(store, workers=1)
+        release, order = threading.Event(), []
+
+        def task(client, user_id):
+            release.wait()
+            order.append(user_id)
+
+        futures = [pool.submit("a", task, "a")]
+        futures += [pool.submit("a", task, "a") for _ in range(4)]
+        futures += [pool.submit("b", task, "b") for _ in range(2)]
+        release.set()
+        for future in futures:
+            future.result()
+        pool.close()
+        assert order == ["a", "b", "a", "b", "a", "a", "a"]
+
+    def test_errors_are_returned_by_map(self, store):
+        def fail(client):
+            raise ValueError("boom")
+
+        with MonzoClientPool(store) as pool:
+            assert isinstance(pool.map(fail, ["a"])["a"], ValueError)
+
+    def test_submit_after_shutdown_raises(self, store):
+        pool = MonzoClientPool(store)
+        pool.close()
+        with pytest.raises(RuntimeError):
+            pool.submit("a", Monzo.whoami)
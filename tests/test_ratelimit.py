@@ -0,0 +1,77 @@
+import pytest
+
+from doubles.session import OAuth2Session, Response
+from monzo.auth import MonzoOAuth2Client
+from monzo.errors import TooManyRequestsError
+from monzo.ratelimit import TokenBucket, backoff_delay, parse_retry_after
+
+
+class TestTokenBucket:
+    def test_throttle_and_relax(self):
+        bucket = TokenBucket(rate=10)
+        bucket.throttle()
+        bucket.throttle()
+        assert bucket.rate == 2.5
+        for _ in range(100):
+            bucket.relax()
+        assert bucket.rate == 10
+
+    def test_throttle_is_bounded(self):
+        bucket = TokenBucket(rate=10, min_rate=4)
+        for _ in range(10):
+            bucket.throttle()
+        assert bucket.rate == 4
+
+    def test_acquire_spends_burst_capacity(self):
+        bucket = TokenBucket(rate=1000, capacity=5)
+        for _ in range(5):
+            bucket.acquire()
+        assert bucket.tokens < 1
+
+
+class TestBackoff:
+    def test_delay_is_capped(self):
+        assert all(0 <= backoff_delay(attempt, cap=2) <= 2 for attempt in range(20))
+
+    def test_retry_after_is_honoured(self):
+        assert backoff_delay(0, retry_after=7) == 7
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after("3") == 3
+        assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0
+        assert parse_retry_after("soon") is None
+        assert parse_retry_after(None) is None
+
+
+class TestRateLimitedRequests:
+    @pytest.fixture
+    def sleeps(self, monkeypatch):
+        sleeps = []
+        monkeypatch.setattr("monzo.auth.time.sleep", sleeps.append)
+        return sleeps
+
+    def make_client(self, responses, **kwargs):
+        client = MonzoOAuth2Client(None, None, access_token="stubbed", **kwargs)
+        client.session = OAuth2Session(responses)
+        return client
+
+    def test_retries_after_too_many_requests(self, sleeps):
+        limited = Response(429, {"message": "slow down"}, {"Retry-After": "2"})
+        client = self.make_client([limited, limited, Response(200, {"ok": True})])
+        assert client.make_request("https://api.monzo.com/accounts") == {"ok": True}
+        assert len(client.session.requests) == 3
+        assert all(sleep >= 2 for sleep in sleeps)
+
+    def test_gives_up_after_retries(self, sleeps):
+        limited = Response(429, {"message": "slow down"})
+        client = self.make_client([limited], rate_limit_retries=2)
+        with pytest.raises(TooManyRequestsError):
+            client.make_request("https://api.monzo.com/accounts")
+        assert len(client.session.requests) == 3
+
+    def test_rate_limiter_is_throttled(self, sleeps):
+        bucket = TokenBucket(rate=1000)
+        limited = Response(429, {"message": "slow down"})
+        client = self.make_client([limited, Response(200, {})], rate_limiter=bucket)
+        client.make_request("https://api.monzo.com/accounts")
+        assert bucket.rate < 1000
@@ -0,0 +1,140 @@
+import pytest
+
+from doubles.server import ACCOUNT_ID, POT_ID, FakeMonzoServer
+from monzo.rebalance import (
+    DEPOSIT,
+    WITHDRAW,
+    PotRule,
+    Rebalancer,
+    Snapshot,
+    target,
+)
+from monzo.retry import RetryPolicy
+
+BILLS = "pot_bills"
+HOLIDAY = "pot_holiday"
+
+
+def snapshot(balance=1000, **pots):
+    return Snapshot(ACCOUNT_ID, balance, pots)
+
+
+def moves(plan):
+    return [(t.pot_id, t.direction, t.amount) for t in plan.transfers]
+
+
+@pytest.fixture
+def server():
+    with FakeMonzoServer(transactions=0) as server:
+        server.balance = 1000
+        server.pots[POT_ID]["balance"] = 300
+        server.pots[BILLS] = {"id": BILLS, "name": "Bills", "balance": 0}
+        server.pots[HOLIDAY] = {"id": HOLIDAY, "name": "Holiday", "balance": 900}
+        yield server
+
+
+class TestPlan:
+    def test_pots_within_their_rules_are_not_moved(self):
+        plan = Rebalancer([PotRule("a", 100, 200)]).plan(snapshot(a=150))
+        assert plan.transfers == []
+
+    def test_withdrawals_come_first_and_fund_deposits(self):
+        rebalancer = Rebalancer([target("a", 500), PotRule("b", maximum=100)])
+        plan = rebalancer.plan(snapshot(balance=0, a=0, b=600))
+        assert moves(plan) == [("b", WITHDRAW, 500), ("a", DEPOSIT, 500)]
+        assert plan.shortfall == 0
+
+    def test_earlier_rules_are_funded_first(self):
+        rebalancer = Rebalancer([target("a", 800), target("b", 800)], reserve=200)
+        plan = rebalancer.plan(snapshot(balance=1000, a=0, b=0))
+        assert moves(plan) == [("a", DEPOSIT, 800)]
+        assert plan.shortfall == 800
+        assert plan.available == 0
+
+    def test_the_rest_is_swept_in_one_transfer(self):
+        rebalancer = Rebalancer(
+            [target("a", 300), PotRule("b", 0, 500)], reserve=100, sweep_pot_id="b"
+        )
+        plan = rebalancer.plan(snapshot(balance=1000, a=0, b=0))
+        assert moves(plan) == [("a", DEPOSIT, 300), ("b", DEPOSIT, 500)]
+        assert plan.available == 100
+
+    def test_the_sweep_pot_is_kept_within_its_maximum(self):
+        rebalancer = Rebalancer([PotRule("s", None, 100)], sweep_pot_id="s")
+        plan = rebalancer.plan(snapshot(balance=1000, s=150))
+        assert moves(plan) == [("s", WITHDRAW, 50)]
+        assert plan.available == 1050
+
+    def test_the_sweep_stops_at_the_sweep_pots_maximum(self):
+        rebalancer = Rebalancer([PotRule("s", None, 100)], sweep_pot_id="s")
+        plan = rebalancer.plan(snapshot(balance=1000, s=50))
+        assert moves(plan) == [("s", DEPOSIT, 50)]
+        assert plan.available == 950
+
+    def test_dedupe_ids_are_stable_for_a_run(self):
+        rebalancer = Rebalancer([target("a", 300)])
+        first = rebalancer.plan(snapshot(a=0), run_id="2026-10-18")
+        second = rebalancer.plan(snapshot(a=0), run_id="2026-10-18")
+        other = rebalancer.plan(snapshot(a=0), run_id="2026-10-19")
+        assert first.transfers == second.transfers
+        assert first.transfers[0].dedupe_id != other.transfers[0].dedupe_id
+
+    def test_unknown_pots_and_bad_rules_are_rejected(self):
+        with pytest.raises(ValueError):
+            Rebalancer([target("missing", 1)]).plan(snapshot(a=0))
+        with pytest.raises(ValueError):
+            Rebalancer([PotRule("a", 10, 5)])
+
+
+class TestRun:
+    def rebalancer(self):
+        return Rebalancer(
+            [target(BILLS, 700), PotRule(HOLIDAY, maximum=500)],
+            reserve=200,
+            sweep_pot_id=POT_ID,
+        )
+
+    def test_dry_run_moves_nothing(self, server):
+        result = self.rebalancer().run(server.client(), ACCOUNT_ID, dry_run=True)
+        assert moves(result.plan) == [
+            (HOLIDAY, WITHDRAW, 400),
+            (BILLS, DEPOSIT, 700),
+            (POT_ID, DEPOSIT, 500),
+        ]
+        assert result.results == []
+        assert server.balance == 1000
+
+    def test_transfers_are_made(self, server):
+        result = self.rebalancer().run(server.client(), ACCOUNT_ID)
+        assert all(r.error is None for r in result.results)
+        assert server.balance == 200
+        assert server.pots[BILLS]["balance"] == 700
+        assert server.pots[HOLIDAY]["balance"] == 500
+        assert server.pots[POT_ID]["balance"] == 800
+
+    def test_transfers_are_retried_once_applied(self, server):
+        client = server.client(write_retry=RetryPolicy(base=0.001, cap=0.001))
+        rebalancer = self.rebalancer()
+        plan = rebalancer.plan(rebalancer.snapshot(client, ACCOUNT_ID))
+        server.fail_next(2, status=500)
+        rebalancer.execute(client, plan)
+        assert server.balance == 200
+        assert server.pots[POT_ID]["balance"] == 800
+
+    def test_deposits_are_skipped_when_their_funding_fails(self, server):
+        client, rebalancer = server.client(), self.rebalancer()
+        plan = rebalancer.plan(rebalancer.snapshot(client, ACCOUNT_ID))
+        server.fail_next(status=500, apply=False)
+        result = rebalancer.execute(client, plan)
+        assert [r.item.direction for r in result.results if r.error] == [WITHDRAW]
+        assert result.skipped == [plan.transfers[2]]
+        assert server.balance == 300
+        assert server.pots[HOLIDAY]["balance"] == 900
+
+    def test_a_plan_replayed_with_its_run_id_is_applied_once(self, server):
+        rebalancer = self.rebalancer()
+        plan = rebalancer.plan(rebalancer.snapshot(server.client(), ACCOUNT_ID), "x")
+        rebalancer.execute(server.client(), plan)
+        rebalancer.execute(server.client(), plan)
+        assert server.balance == 200
+        assert server.pots[POT_ID]["balance"] == 800
@@ -0,0 +1,124 @@
+import pytest
+from requests.exceptions import ReadTimeout
+
+from doubles.server import ACCOUNT_ID, POT_ID, FakeMonzoServer
+from monzo.errors import BadRequestError, GatewayTimeoutError, InternalServerError
+from monzo.retry import RetryPolicy
+
+
+def fast_policy(**kwargs):
+    kwargs.setdefault("base", 0.001)
+    kwargs.setdefault("cap", 0.001)
+    return RetryPolicy(**kwargs)
+
+
+class Flaky(object):
+    """Raises the given errors in turn, then returns "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture
+def server():
+    with FakeMonzoServer(transactions=0) as server:
+        yield server
+
+
+class TestRetryPolicy:
+    def test_transient_errors_are_retried(self):
+        policy = fast_policy()
+        flaky = Flaky(InternalServerError(), GatewayTimeoutError(), ReadTimeout())
+        assert policy.call(flaky, "PUT", "/pots/{id}/deposit", "key") == "ok"
+        assert flaky.calls == 4
+        assert policy.retries == 3
+        assert policy.succeeded == 1
+        outcome = policy.outcomes[-1]
+        assert (outcome.method, outcome.key, outcome.attempts) == ("PUT", "key", 4)
+        assert outcome.error is None
+
+    def test_attempts_are_bounded(self):
+        outcomes = []
+        policy = fast_policy(max_attempts=3, on_outcome=outcomes.append)
+        flaky = Flaky(*[InternalServerError() for _ in range(5)])
+        with pytest.raises(InternalServerError):
+            policy.call(flaky)
+        assert flaky.calls == 3
+        assert policy.failed == 1
+        assert outcomes[0].attempts == 3
+        assert isinstance(outcomes[0].error, InternalServerError)
+
+    def test_other_errors_are_not_retried(self):
+        policy = fast_policy()
+        flaky = Flaky(BadRequestError())
+        with pytest.raises(BadRequestError):
+            policy.call(flaky)
+        assert flaky.calls == 1
+        assert policy.retries == 0
+
+    def test_no_attempt_starts_after_the_deadline(self, monkeypatch):
+        # Full jitter may pick any delay up to the cap, so pin it
+        monkeypatch.setattr("monzo.retry.backoff_delay", lambda *args, **kwargs: 10)
+        policy = RetryPolicy(deadline=1)
+        flaky = Flaky(InternalServerError())
+        with pytest.raises(InternalServerError):
+            policy.call(flaky)
+        assert flaky.calls == 1
+
+
+class TestIdempotentWrites:
+    def test_lost_responses_are_retried_without_moving_money_twice(self, server):
+        policy = fast_policy()
+        client = server.client(write_retry=policy)
+        server.fail_next(2, status=500)
+        client.deposit_into_pot(POT_ID, ACCOUNT_ID, 1000)
+        assert server.pots[POT_ID]["balance"] == 1000
+        assert server.requests_by_path["/pots/{0}/deposit".format(POT_ID)] == 3
+        outcome = policy.outcomes[-1]
+        assert outcome.attempts == 3
+        assert outcome.endpoint == "/pots/{id}/deposit"
+        assert outcome.key in server.dedupe_ids
+
+    def test_timeouts_are_retried(self, server):
+        policy = fast_policy()
+        client = server.client(write_retry=policy, timeout=0.2)
+        server.fail_next(status=None, delay=0.5)
+        client.withdraw_from_pot(ACCOUNT_ID, POT_ID, 500)
+        assert server.pots[POT_ID]["balance"] == -500
+        assert policy.outcomes[-1].attempts == 2
+
+    def test_exhausted_retries_raise(self, server):
+        client = server.client(write_retry=fast_policy(max_attempts=2))
+        server.fail_next(3, status=504, apply=False)
+        with pytest.raises(GatewayTimeoutError):
+            client.deposit_into_pot(POT_ID, ACCOUNT_ID, 1000)
+        assert server.pots[POT_ID]["balance"] == 0
+
+    def test_writes_are_not_retried_by_default(self, server):
+        client = server.client()
+        server.fail_next(status=500)
+        with pytest.raises(InternalServerError):
+            client.deposit_into_pot(POT_ID, ACCOUNT_ID, 1000)
+        assert server.requests == 1
+
+    def test_non_idempotent_writes_are_not_retried(self, server):
+        client = server.client(write_retry=fast_policy())
+        server.fail_next(status=500, apply=False)
+        with pytest.raises(InternalServerError):
+            client.register_webhook("https://example.com/hook", ACCOUNT_ID)
+        assert server.requests == 1
+
+    def test_callers_can_reuse_a_dedupe_id(self, server):
+        client = server.client()
+        server.fail_next(status=500)
+        with pytest.raises(InternalServerError):
+            client.deposit_into_pot(POT_ID, ACCOUNT_ID, 1000, dedupe_id="deposit-1")
+        client.deposit_into_pot(POT_ID, ACCOUNT_ID, 1000, dedupe_id="deposit-1")
+        assert server.pots[POT_ID]["balance"] == 1000
@@ -0,0 +1,81 @@
+import pytest
+
+from doubles.server import ACCOUNT_ID, generate_transactions
+from monzo.search import TransactionSearch, match_query
+from monzo.store import TransactionStore
+
+
+@pytest.fixture
+def store():
+    store = TransactionStore(":memory:")
+    transactions = generate_transactions(200)
+    transactions[7]["notes"] = "Birthday present for Wendy"
+    transactions[8]["metadata"] = {"trip": "Neverland"}
+    transactions[9]["merchant"] = "merch_unexpanded"
+    store.upsert(ACCOUNT_ID, transactions)
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def search(store):
+    return TransactionSearch(store)
+
+
+def ids(transactions):
+    return [transaction["id"] for transaction in transactions]
+
+
+class TestTransactionSearch:
+    def test_existing_transactions_are_indexed(self, search):
+        assert search.count(ACCOUNT_ID) == 200
+
+    def test_text_matches_notes_metadata_and_merchant(self, search):
+        assert ids(search.search(ACCOUNT_ID, "wend")) == ["tx_{0:022d}".format(7)]
+        assert ids(search.search(ACCOUNT_ID, "neverland")) == ["tx_{0:022d}".format(8)]
+        assert search.count(ACCOUNT_ID, "merchant 12") == 4
+
+    def test_filters_combine_with_text(self, search, store):
+        found = search.search(
+            ACCOUNT_ID, "merchant", category="groceries", min_amount=-1000
+        )
+        assert found
+        for transaction in found:
+            assert transaction["category"] == "groceries"
+            assert -1000 <= transaction["amount"]
+        expected = [
+            t
+            for t in store.transactions(ACCOUNT_ID)
+            if t["category"] == "groceries" and t["amount"] >= -1000
+        ]
+        assert len(found) == len(expected)
+
+    def test_without_text_newest_come_first(self, search):
+        found = search.search(ACCOUNT_ID, limit=3, since="2019-01-01T01:00:00.000Z")
+        assert ids(found) == ["tx_{0:022d}".format(i) for i in (199, 198, 197)]
+        assert ids(search.search(ACCOUNT_ID, limit=1, offset=1)) == [ids(found)[1]]
+
+    def test_facets(self, search):
+        assert search.facets(ACCOUNT_ID, "category", limit=2) == [
+            ("bills", 40),
+            ("eating_out", 40),
+        ]
+        assert search.facets(ACCOUNT_ID, "merchant", text="merchant 3")[0][1] == 4
+        with pytest.raises(ValueError):
+            search.facets(ACCOUNT_ID, "amount")
+
+    def test_upserts_are_indexed_incrementally(self, search, store):
+        transaction = store.get_transaction("tx_{0:022d}".format(3))
+        store.upsert(ACCOUNT_ID, [dict(transaction, notes="Crocodile food")])
+        assert ids(search.search(ACCOUNT_ID, "crocodile")) == [transaction["id"]]
+        store.upsert(ACCOUNT_ID, [dict(transaction, notes="")])
+        assert search.search(ACCOUNT_ID, "crocodile") == []
+        assert search.count(ACCOUNT_ID) == 200
+
+    def test_unexpanded_merchants_are_faceted_by_id(self, search):
+        assert search.count(ACCOUNT_ID, merchant="merch_unexpanded") == 1
+
+    def test_user_input_cannot_inject_query_syntax(self, search):
+        assert match_query('wendy" OR NOT *') == '"wendy"* "OR"* "NOT"*'
+        assert match_query("  ") is None
+        assert search.search(ACCOUNT_ID, 'wendy" OR') == []
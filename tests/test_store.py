@@ -0,0 +1,69 @@
+import pytest
+
+from doubles.oauth import MonzoOAuth2Client, paginated_transactions
+from monzo.monzo import Monzo
+from monzo.store import TransactionStore
+
+
+def make_transactions(start, count):
+    return [
+        {
+            "id": "tx_{0:05d}".format(i),
+            "created": "2019-01-01T00:{0:02d}:{1:02d}Z".format(i // 60, i % 60),
+            "amount": -i,
+            "currency": "GBP",
+            "category": "groceries",
+        }
+        for i in range(start, start + count)
+    ]
+
+
+class TestTransactionStore:
+    @pytest.fixture
+    def store(self):
+        store = TransactionStore(":memory:")
+        yield store
+        store.close()
+
+    def test_upsert_replaces_by_id(self, store):
+        transactions = make_transactions(0, 3)
+        store.upsert("acc_1", transactions)
+        store.upsert("acc_1", [dict(transactions[0], notes="updated")])
+        assert store.count("acc_1") == 3
+        assert store.get_transaction("tx_00000")["notes"] == "updated"
+
+    def test_get_transactions(self, store):
+        store.upsert("acc_1", make_transactions(0, 3))
+        found = store.get_transactions(["tx_00002", "tx_00000", "tx_missing"])
+        assert sorted(found) == ["tx_00000", "tx_00002"]
+        assert found["tx_00002"]["amount"] == -2
+        assert store.get_transactions([]) == {}
+
+    def test_high_water_mark(self, store):
+        assert store.high_water_mark("acc_1") is None
+        store.upsert("acc_1", make_transactions(0, 5))
+        store.upsert("acc_2", make_transactions(10, 1))
+        assert store.high_water_mark("acc_1") == ("2019-01-01T00:00:04Z", "tx_00004")
+
+    def test_transactions_in_range(self, store):
+        store.upsert("acc_1", make_transactions(0, 10))
+        ids = [
+            t["id"]
+            for t in store.transactions(
+                "acc_1", since="2019-01-01T00:00:02Z", before="2019-01-01T00:00:05Z"
+            )
+        ]
+        assert ids == ["tx_00002", "tx_00003", "tx_00004"]
+
+    def test_sync_transactions_fetches_only_new(self, store):
+        history = make_transactions(0, 150)
+        oauth = MonzoOAuth2Client({"/transactions": paginated_transactions(history)})
+        client = Monzo.from_oauth_session(oauth, store=store)
+
+        assert client.sync_transactions("acc_1") == 150
+        history.extend(make_transactions(150, 20))
+        oauth.requests = []
+
+        assert client.sync_transactions("acc_1") == 20
+        assert oauth.requests[0][2]["since"] == "tx_00149"
+        assert store.count("acc_1") == 170
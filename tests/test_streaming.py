@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from doubles.server import ACCOUNT_ID, FakeMonzoServer
+from monzo.errors import PageNotFoundError
+from monzo.streaming import iter_json_array
+
+
+def chunked(body, size):
+    data = body.encode("utf-8")
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+class TestIterJsonArray:
+    body = json.dumps(
+        {
+            "before": {"nested": [1, 2, {"key": "]}"}]},
+            "transactions": [
+                {"id": "tx_1", "amount": -120, "description": 'Café "[1]"'},
+                {"id": "tx_2", "amount": 3.5, "merchant": None},
+                [],
+                12345,
+            ],
+            "after": 7,
+        },
+        indent=2,
+    )
+    expected = json.loads(body)["transactions"]
+
+    @pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100000])
+    def test_decodes_items_across_chunk_boundaries(self, size):
+        assert list(iter_json_array(chunked(self.body, size), "transactions")) == (
+            self.expected
+        )
+
+    def test_yields_items_before_the_body_ends(self):
+        chunks = iter(chunked(self.body, 16))
+        items = iter_json_array(chunks, "transactions")
+        next(items)
+        assert len(list(chunks)) > 0
+
+    @pytest.mark.parametrize(
+        "body", ['{"transactions": []}', "{}", '{"other": [1]}', " { } "]
+    )
+    def test_empty_arrays(self, body):
+        assert list(iter_json_array(chunked(body, 3), "transactions")) == []
+
+    @pytest.mark.parametrize(
+        "body", ['{"transactions": [{"id": 1}', '{"transactions": [1 2]}', "[]"]
+    )
+    def test_malformed_bodies_raise(self, body):
+        with pytest.raises(ValueError):
+            list(iter_json_array(chunked(body, 4), "transactions"))
+
+
+class TestStreamedTransactions:
+    @pytest.fixture
+    def server(self):
+        with FakeMonzoServer(transactions=250) as server:
+            yield server
+
+    def test_streams_every_page(self, server):
+        client = server.client()
+        streamed = list(client.iter_transactions(ACCOUNT_ID, stream=True))
+        assert streamed == server.transactions
+        assert server.requests_by_path["/transactions"] == 3
+
+    def test_streams_models(self, server):
+        client = server.client()
+        models = list(client.iter_transactions(ACCOUNT_ID, stream=True, as_models=True))
+        assert [model.id for model in models] == [t["id"] for t in server.transactions]
+
+    def test_errors_are_raised_before_streaming(self, server):
+        client = server.client()
+        with pytest.raises(PageNotFoundError):
+            list(client.oauth_session.stream_request(server.url + "/nowhere", "items"))
+
+    def test_refreshes_expired_tokens(self, server):
+        client = server.client()
+        server.expire_token()
+        assert len(list(client.iter_transactions(ACCOUNT_ID, stream=True))) == 250
+        assert server.refreshes == 1
@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from doubles.session import OAuth2Session, Response
+from monzo.auth import MonzoOAuth2Client
+from monzo.errors import UnauthorizedError
+
+
+class ExpiringSession(OAuth2Session):
+    """Rejects requests made with the initial access token."""
+
+    def request(self, method, url, **kwargs):
+        rejected = self.access_token == "stubbed"
+        super().request(method, url, **kwargs)
+        if rejected:
+            return Response(401, {"message": "expired"})
+        return Response(200, {"ok": True})
+
+    def refresh_token(self, token_url, **kwargs):
+        time.sleep(0.05)
+        return super().refresh_token(token_url, **kwargs)
+
+
+class TestTokenRefresh:
+    def make_client(self, session, **kwargs):
+        client = MonzoOAuth2Client(
+            "client_id", "client_secret", refresh_callback=None, **kwargs
+        )
+        client.session = session
+        return client
+
+    def test_concurrent_requests_share_one_refresh(self):
+        client = self.make_client(ExpiringSession())
+        results = []
+
+        def call():
+            results.append(client.make_request("https://api.monzo.com/accounts"))
+
+        threads = [threading.Thread(target=call) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [{"ok": True}] * 20
+        assert client.session.refreshes == 1
+
+    def test_refresh_attempts_are_bounded(self):
+        session = OAuth2Session([Response(401, {"message": "revoked"})])
+        client = self.make_client(session, max_refresh_attempts=2)
+        with pytest.raises(UnauthorizedError):
+            client.make_request("https://api.monzo.com/accounts")
+        assert session.refreshes == 2
+        assert len(session.requests) == 3
+
+    def test_token_is_refreshed_before_it_expires(self):
+        session = ExpiringSession(
+            token={
+                "access_token": "stubbed",
+                "refresh_token": "refresh",
+                "expires_at": time.time() + 30,
+            }
+        )
+        client = self.make_client(session, refresh_margin=60)
+        assert client.make_request("https://api.monzo.com/accounts") == {"ok": True}
+        assert session.refreshes == 1
+        assert len(session.requests) == 1
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from doubles.session import OAuth2Session, Response
+from monzo.auth import MonzoOAuth2Client
+from monzo.tokenstore import JSONFileTokenStore, MemoryTokenStore, SQLiteTokenStore
+from monzo.utils import load_token_from_file, save_token_to_file
+
+
+class TestJSONFileTokenStore:
+    def test_round_trip(self, tmpdir):
+        store = JSONFileTokenStore(str(tmpdir.join("monzo.json")))
+        assert store.load() is None
+        store.save({"access_token": "a"})
+        assert JSONFileTokenStore(store.filename).load() == {"access_token": "a"}
+
+    def test_save_is_atomic(self, tmpdir):
+        filename = str(tmpdir.join("monzo.json"))
+        save_token_to_file({"access_token": "a"}, filename)
+        save_token_to_file({"access_token": "b"}, filename)
+        assert load_token_from_file(filename) == {"access_token": "b"}
+        assert os.listdir(str(tmpdir)) == ["monzo.json"]
+
+    def test_loads_are_served_from_memory(self, tmpdir, monkeypatch):
+        store = JSONFileTokenStore(str(tmpdir.join("monzo.json")))
+        store.save({"access_token": "a"})
+        monkeypatch.setattr("builtins.open", None)
+        assert store.load() == {"access_token": "a"}
+
+    def test_replacement_within_one_mtime_is_reloaded(self, tmpdir):
+        store = JSONFileTokenStore(str(tmpdir.join("monzo.json")))
+        store.save({"access_token": "a"})
+        stat = os.stat(store.filename)
+        assert store.load() == {"access_token": "a"}
+        # Same size and mtime, so only the new inode gives the replacement away
+        JSONFileTokenStore(store.filename).save({"access_token": "b"})
+        os.utime(store.filename, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert store.load() == {"access_token": "b"}
+
+
+class TestSQLiteTokenStore:
+    @pytest.fixture
+    def path(self, tmpdir):
+        return str(tmpdir.join("tokens.sqlite3"))
+
+    def test_tokens_for_many_users(self, path):
+        store = SQLiteTokenStore(path, "user_1")
+        store.save({"access_token": "a"})
+        store.for_user("user_2").save({"access_token": "b"})
+        assert store.users() == ["user_1", "user_2"]
+        assert SQLiteTokenStore(path, "user_2").load() == {"access_token": "b"}
+
+    def test_lock_excludes_other_processes(self, path):
+        store = SQLiteTokenStore(path, "user_1")
+        other = SQLiteTokenStore(path, "user_1", timeout=0.1)
+        with store.lock():
+            with pytest.raises(TimeoutError):
+                with other.lock():
+                    pass
+            with other.for_user("user_2").lock():
+                pass
+        with other.lock():
+            pass
+        assert store.users() == []
+
+
+class TestClientTokenStore:
+    def make_client(self, store):
+        client = MonzoOAuth2Client.from_token_store(store, "client_id", "secret")
+        client.session = OAuth2Session(
+            [Response(401, {"message": "expired"}), Response(200, {"ok": True})],
+            token=store.load(),
+        )
+        client.session.token_updater = store.save
+        return client
+
+    def test_token_is_loaded_from_store(self):
+        store = MemoryTokenStore({"access_token": "a", "refresh_token": "r"})
+        client = MonzoOAuth2Client.from_token_store(store, "client_id", "secret")
+        assert client.session.access_token == "a"
+        assert client.session.token_updater == store.save
+
+    def test_refresh_by_another_client_is_reused(self):
+        store = MemoryTokenStore({"access_token": "stubbed", "refresh_token": "r"})
+        first, second = self.make_client(store), self.make_client(store)
+
+        first.make_request("https://api.monzo.com/accounts")
+        assert store.load()["access_token"] == "refreshed_1"
+
+        second.make_request("https://api.monzo.com/accounts")
+        assert second.session.refreshes == 0
+        assert second.session.access_token == "refreshed_1"
@@ -0,0 +1,27 @@
+from monzo.auth import MonzoOAuth2Client, create_adapter
+from monzo.monzo import Monzo
+
+
+class TestTransport:
+    def test_pool_options_create_adapter(self):
+        client = MonzoOAuth2Client(None, None, pool_maxsize=25, max_retries=2)
+        assert client.session.get_adapter("https://api.monzo.com") is client.adapter
+        assert client.adapter._pool_maxsize == 25
+        assert client.adapter.max_retries.total == 2
+
+    def test_clients_share_one_adapter(self):
+        adapter = create_adapter(pool_maxsize=50)
+        first = Monzo("token_a", adapter=adapter)
+        second = Monzo("token_b", adapter=adapter)
+        assert first.oauth_session.session.get_adapter(
+            "https://api.monzo.com"
+        ) is second.oauth_session.session.get_adapter("https://api.monzo.com")
+
+    def test_keep_alive_can_be_disabled(self):
+        client = MonzoOAuth2Client(None, None, keep_alive=False)
+        assert client.session.headers["Connection"] == "close"
+
+    def test_default_transport_is_untouched(self):
+        client = MonzoOAuth2Client(None, None)
+        assert client.adapter is None
+        assert client.session.headers["Connection"] == "keep-alive"
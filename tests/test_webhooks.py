@@ -0,0 +1,157 @@
+import asyncio
+import json
+
+import pytest
+
+from monzo.store import TransactionStore
+from monzo.webhooks import WebhookReceiver, parse_event
+
+
+def transaction_event(i):
+    return {
+        "type": "transaction.created",
+        "data": {
+            "id": "tx_{0}".format(i),
+            "account_id": "acc_1",
+            "created": "2019-01-01T00:00:{0:02d}Z".format(i),
+            "amount": -i,
+        },
+    }
+
+
+async def post(port, payloads):
+    """Posts each payload over one keep-alive connection and returns the statuses."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    statuses = []
+    for payload in payloads:
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        writer.write(
+            b"POST / HTTP/1.1\r\nHost: localhost\r\nContent-Length: %d\r\n\r\n%s"
+            % (len(body), body)
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        while (await reader.readline()) != b"\r\n":
+            pass
+        statuses.append(int(status_line.split()[1]))
+    writer.close()
+    return statuses
+
+
+class TestParseEvent:
+    def test_valid_event(self):
+        event = parse_event(json.dumps(transaction_event(1)))
+        assert event.type == "transaction.created"
+        assert event.data["id"] == "tx_1"
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            "not json",
+            json.dumps({"type": "transaction.created"}),
+            json.dumps({"type": "other", "data": {}}),
+            json.dumps({"type": "transaction.created", "data": {"id": "tx_1"}}),
+        ],
+    )
+    def test_invalid_events(self, body):
+        with pytest.raises(ValueError):
+            parse_event(body)
+
+
+class TestWebhookReceiver:
+    def test_events_are_batched_and_written_through(self):
+        store = TransactionStore(":memory:")
+        batches = []
+
+        async def handler(batch):
+            batches.append([event.data["id"] for event in batch])
+
+        async def main():
+            receiver = WebhookReceiver(
+                handler, port=0, batch_size=4, batch_timeout=0.05, store=store
+            )
+            await receiver.start()
+            statuses = await post(
+                receiver.port, [transaction_event(i) for i in range(10)] + [b"{}"]
+            )
+            await receiver.stop()
+            return receiver, statuses
+
+        receiver, statuses = asyncio.run(main())
+        assert statuses == [200] * 10 + [400]
+        assert sum(batches, []) == ["tx_{0}".format(i) for i in range(10)]
+        assert all(len(batch) <= 4 for batch in batches)
+        assert (receiver.received, receiver.rejected, receiver.handled) == (10, 1, 10)
+        assert store.count("acc_1") == 10
+
+    def test_full_queue_pushes_back(self):
+        def handler(batch):
+            pass
+
+        async def main():
+            receiver = WebhookReceiver(
+                handler,
+                port=0,
+                queue_size=1,
+                batch_size=1,
+                concurrency=1,
+                enqueue_timeout=0.05,
+            )
+            await receiver.start()
+            await receiver._semaphore.acquire()
+            statuses = await post(
+                receiver.port, [transaction_event(i) for i in range(4)]
+            )
+            receiver._semaphore.release()
+            await receiver.stop()
+            return statuses
+
+        statuses = asyncio.run(main())
+        assert statuses[:2] == [200, 200]
+        assert statuses[2:] == [503, 503]
+
+    def test_stop_closes_idle_keep_alive_connections(self):
+        async def main():
+            receiver = WebhookReceiver(lambda batch: None, port=0)
+            await receiver.start()
+            reader, writer = await asyncio.open_connection("127.0.0.1", receiver.port)
+            body = json.dumps(transaction_event(1)).encode()
+            writer.write(
+                b"POST / HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body)
+            )
+            while (await reader.readline()) != b"\r\n":
+                pass
+            await asyncio.wait_for(receiver.stop(), 1)
+            closed = await asyncio.wait_for(reader.read(), 1)
+            writer.close()
+            return closed
+
+        assert asyncio.run(main()) == b""
+
+    def test_idle_connections_time_out(self):
+        async def main():
+            receiver = WebhookReceiver(lambda batch: None, port=0, idle_timeout=0.05)
+            await receiver.start()
+            reader, writer = await asyncio.open_connection("127.0.0.1", receiver.port)
+            closed = await asyncio.wait_for(reader.read(), 1)
+            writer.close()
+            await receiver.stop()
+            return closed
+
+        assert asyncio.run(main()) == b""
+
+    def test_events_are_stored_before_they_are_acknowledged(self):
+        class FailingStore(object):
+            def upsert(self, account_id, transactions):
+                raise RuntimeError("disk full")
+
+        async def main():
+            receiver = WebhookReceiver(lambda batch: None, port=0, store=FailingStore())
+            await receiver.start()
+            statuses = await post(receiver.port, [transaction_event(1)])
+            await receiver.stop()
+            return receiver, statuses
+
+        receiver, statuses = asyncio.run(main())
+        assert statuses == [500]
+        assert receiver.received == 0